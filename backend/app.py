@@ -2,7 +2,7 @@
 """
 Quiz Master V2 - Main Flask Application
 """
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, abort, g
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from flask_cors import CORS
@@ -16,11 +16,28 @@ from celery import Celery
 import redis
 import json
 import time
+import base64
+import operator
+from functools import wraps
 
 # Import search blueprints
 from routes.admin_search import admin_search_bp
 from routes.user_search import user_search_bp
 from routes.export import export_bp
+from models.quiz_cache import QuizContentVersions, AnswerKeyCache, QuestionPayloadCache, AttemptDetailCache
+from models.submission_pipeline import SubmissionPipeline
+from models.quiz_schedule import QuizScheduleIndex
+from models.attempt_store import AttemptStore
+from models.admission import AdmissionGate
+from models.leaderboard import LeaderboardService
+from models.rollups import AnalyticsRollups
+from models.analytics import SQLAttemptAnalytics, ColumnarAttemptAnalytics
+from models.fanout import QueryFanout, server_timing_header
+from models.swr_cache import StaleWhileRevalidateCache
+from models.tagged_cache import TaggedCache
+from models.community_stats import CommunityStats
+from models.streaks import current_streak, local_today, streak_zone
+from models.achievements import ACHIEVEMENTS, AchievementService, metrics_from_stats
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -49,17 +66,119 @@ limiter = Limiter(
 )
 limiter.init_app(app)
 
+# Versioned per-quiz content caches (answer keys, answer-free question payloads, attempt details)
+quiz_versions = QuizContentVersions(redis_client)
+answer_keys = AnswerKeyCache(db, redis_client, quiz_versions)
+question_payloads = QuestionPayloadCache(db, redis_client, quiz_versions)
+attempt_details = AttemptDetailCache(redis_client, quiz_versions)
+
+# In-memory quiz schedule timeline (status lookups and transition-aware cache TTLs)
+quiz_schedule = QuizScheduleIndex(db, redis_client)
+
+# Listings and lookups cached until a write bumps one of the tags they depend on
+tagged_cache = TaggedCache(redis_client)
+AVAILABLE_QUIZZES_CACHE_KEY = 'available_quizzes'
+QUIZ_HIERARCHY_CACHE_KEY = 'quiz_hierarchy'
+QUIZ_LISTING_TAGS = ('quizzes', 'subjects')
+
+# In-progress attempts and their autosaved answers
+attempt_store = AttemptStore(redis_client)
+
+# Waiting room for the burst of starts at a scheduled quiz's start_time
+admission_gate = AdmissionGate(
+    redis_client,
+    max_concurrent=app.config['ADMISSION_MAX_CONCURRENT'],
+    admit_rate=app.config['ADMISSION_RATE'],
+    max_wait=app.config['ADMISSION_MAX_WAIT']
+)
+
+# Incrementally maintained leaderboards in Redis sorted sets
+leaderboard_service = LeaderboardService(db, redis_client)
+
+# Live community statistics (counters, HyperLogLogs, subject popularity) in Redis
+community_stats = CommunityStats(db, redis_client)
+
+# Analytics rollup tables, updated in the transaction that completes an attempt
+analytics_rollups = AnalyticsRollups(db)
+
+# Achievement unlocks, evaluated against the statistics records as attempts complete
+achievement_service = AchievementService(db)
+
+# Aggregates for the analytics views: rollup tables, or a columnar snapshot of attempts
+if app.config['ANALYTICS_BACKEND'] == 'columnar':
+    attempt_analytics = ColumnarAttemptAnalytics(db, redis_client)
+else:
+    attempt_analytics = SQLAttemptAnalytics(db)
+
+# Bounded pool for running the independent sections of the analytics views side by side
+analytics_fanout = QueryFanout(
+    app, db,
+    max_workers=app.config['ANALYTICS_FANOUT_WORKERS'],
+    default_timeout=app.config['ANALYTICS_SECTION_TIMEOUT']
+)
+
+# Expensive payloads served stale while one background refresh recomputes them
+swr_cache = StaleWhileRevalidateCache(app, redis_client)
+ADMIN_CHAPTERS_CACHE = 'admin_chapters'
+ANALYTICS_OVERVIEW_CACHE = 'analytics_overview'
+
+# Write-behind queue for quiz submissions (used when SUBMIT_WRITE_BEHIND is enabled)
+submission_pipeline = SubmissionPipeline(redis_client)
+
 # Cache invalidation helper functions
-def invalidate_quiz_caches():
+def invalidate_quiz_caches(quiz_id=None):
     """Invalidate caches related to quiz data"""
-    cache.delete_memoized(get_available_quizzes)
-    cache.delete_memoized(get_leaderboard)
-    cache.delete_memoized(admin_analytics_overview)
-    cache.delete_memoized(get_community_stats)
+    quiz_schedule.invalidate()
+    tagged_cache.bump('quizzes', *([f"quiz:{quiz_id}"] if quiz_id is not None else []))
+    swr_cache.invalidate(ADMIN_CHAPTERS_CACHE, ANALYTICS_OVERVIEW_CACHE)
 
-def invalidate_subject_caches():
+def invalidate_subject_caches(subject_id=None):
     """Invalidate caches related to subject data"""
-    cache.delete_memoized(get_available_quizzes)
+    quiz_schedule.invalidate()
+    tagged_cache.bump('subjects', *([f"subject:{subject_id}"] if subject_id is not None else []))
+    swr_cache.invalidate(ADMIN_CHAPTERS_CACHE)
+
+def invalidate_rankings():
+    """Invalidate cached leaderboards after rankings changed other than through new attempts"""
+    tagged_cache.bump('leaderboard')
+
+def invalidate_user_caches(user_ids):
+    """Invalidate the cached per-user views of users whose attempts started, completed or were regraded"""
+    if user_ids:
+        tagged_cache.bump(*(f"user:{user_id}" for user_id in set(user_ids)))
+
+def on_attempts_completed(attempts):
+    """Feed newly completed attempts into the incrementally maintained structures"""
+    invalidate_user_caches([attempt.user_id for attempt in attempts])
+    try:
+        leaderboard_service.record_attempts(attempts)
+    except Exception as e:
+        print(f"Leaderboard update error: {e}")
+    try:
+        community_stats.record_attempts(attempts)
+    except Exception as e:
+        print(f"Community stats update error: {e}")
+
+def on_users_changed(delta):
+    """Adjust the live count of regular users (reconciled periodically, so failures only lag)"""
+    try:
+        community_stats.record_users(delta)
+    except Exception as e:
+        print(f"Community stats update error: {e}")
+
+def invalidate_quiz_content_caches(quiz_id):
+    """Invalidate caches derived from a quiz and its questions"""
+    question_payloads.forget(quiz_id)
+    answer_keys.invalidate(quiz_id)
+    tagged_cache.bump('quizzes', f"quiz:{quiz_id}")  # Listings show question counts
+
+@app.after_request
+def add_server_timing(response):
+    """Report the per-section timings a view recorded in g.server_timing (never served from cache)"""
+    timings = g.pop('server_timing', None)
+    if timings:
+        response.headers['Server-Timing'] = server_timing_header(timings)
+    return response
 
 # Register search blueprints
 app.register_blueprint(admin_search_bp)
@@ -181,6 +300,63 @@ class QuizAttempt(db.Model):
     started_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime)
     answers = db.Column(db.JSON)  # Store user answers as JSON
+    
+    __table_args__ = (
+        # Keyset pagination of a user's history by completion time
+        db.Index('ix_quiz_attempt_user_completed', 'user_id', 'completed_at', 'id'),
+    )
+
+# Analytics rollups of completed attempts, kept current by models/rollups.py
+class DailyAttemptRollup(db.Model):
+    date = db.Column(db.Date, primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    pct_sum = db.Column(db.Float, nullable=False, default=0)  # sum of attempt percentages
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    questions_sum = db.Column(db.Integer, nullable=False, default=0)
+
+class SubjectAttemptRollup(db.Model):
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    pct_sum = db.Column(db.Float, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    questions_sum = db.Column(db.Integer, nullable=False, default=0)
+
+class QuizAttemptRollup(db.Model):
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    pct_sum = db.Column(db.Float, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    questions_sum = db.Column(db.Integer, nullable=False, default=0)
+
+class UserSubjectRollup(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+
+# Per-user statistics record: everything achievements, score history, reminders and exports need
+class UserStats(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    pct_sum = db.Column(db.Float, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    questions_sum = db.Column(db.Integer, nullable=False, default=0)
+    best_pct = db.Column(db.Float, nullable=False, default=0)
+    perfect_count = db.Column(db.Integer, nullable=False, default=0)
+    time_sum = db.Column(db.Integer, nullable=False, default=0)  # seconds
+    subject_count = db.Column(db.Integer, nullable=False, default=0)  # distinct subjects attempted
+    last_active_date = db.Column(db.Date)  # in STREAK_TIMEZONE
+    streak_days = db.Column(db.Integer, nullable=False, default=0)  # consecutive days ending last_active_date
+    best_streak_days = db.Column(db.Integer, nullable=False, default=0)  # longest run of consecutive days
+    last_completed_at = db.Column(db.DateTime, index=True)
+    
+    def current_streak(self):
+        """Consecutive active days, as long as the user was active today or yesterday"""
+        return current_streak(self.last_active_date, self.streak_days, local_today(streak_zone()))
+
+class UserAchievement(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    achievement_id = db.Column(db.String(50), primary_key=True)
+    unlocked_at = db.Column(db.DateTime, nullable=False)  # completion time of the attempt that earned it
 
 # Authentication Routes
 @app.route('/api/register', methods=['POST'])
@@ -202,6 +378,8 @@ def register():
     
     db.session.add(user)
     db.session.commit()
+    if data.get('role', 'user') == 'user':
+        on_users_changed(1)
     
     return jsonify({'message': 'User registered successfully'}), 201
 
@@ -286,7 +464,7 @@ def create_subject():
     db.session.commit()
     
     # Invalidate subject-related caches
-    invalidate_subject_caches()
+    invalidate_subject_caches(subject.id)
     
     return jsonify({'message': 'Subject created successfully', 'id': subject.id}), 201
 
@@ -326,12 +504,25 @@ def create_chapter(subject_id):
     )
     db.session.add(chapter)
     db.session.commit()
+    invalidate_subject_caches(subject_id)
     return jsonify({'message': 'Chapter created successfully', 'id': chapter.id}), 201
 
 # Get all chapters (for admin)
+@swr_cache.cached(ADMIN_CHAPTERS_CACHE, soft_ttl=600, hard_ttl=1800)
+def build_all_chapters():
+    chapters = Chapter.query.join(Subject).all()
+    return [{
+        'id': c.id,
+        'name': c.name,
+        'description': c.description,
+        'subject_id': c.subject_id,
+        'subject_name': c.subject.name,
+        'quizzes_count': len(c.quizzes),
+        'created_at': c.created_at.isoformat()
+    } for c in chapters]
+
 @app.route('/api/admin/chapters', methods=['GET'])
 @jwt_required()
-@cache.cached(timeout=600)  # Cache for 10 minutes
 def get_all_chapters():
     user_id = int(get_jwt_identity())
     user = User.query.get(user_id)
@@ -339,16 +530,7 @@ def get_all_chapters():
     if user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
     
-    chapters = Chapter.query.join(Subject).all()
-    return jsonify([{
-        'id': c.id,
-        'name': c.name,
-        'description': c.description,
-        'subject_id': c.subject_id,
-        'subject_name': c.subject.name,
-        'quizzes_count': len(c.quizzes),
-        'created_at': c.created_at.isoformat()
-    } for c in chapters])
+    return jsonify(build_all_chapters())
 
 # Quiz Management
 @app.route('/api/admin/chapters/<int:chapter_id>/quizzes', methods=['GET'])
@@ -404,7 +586,7 @@ def create_quiz(chapter_id):
     )
     db.session.add(quiz)
     db.session.commit()
-    invalidate_quiz_caches()
+    invalidate_quiz_caches(quiz.id)
     return jsonify({'message': 'Quiz created successfully', 'id': quiz.id}), 201
 
 # Question Management
@@ -450,14 +632,17 @@ def create_question(quiz_id):
     )
     db.session.add(question)
     db.session.commit()
+    invalidate_quiz_content_caches(quiz_id)
     return jsonify({'message': 'Question created successfully', 'id': question.id}), 201
 
 # User Routes - Quiz Taking
-@app.route('/api/user/available-quizzes', methods=['GET'])
-@app.route('/api/quizzes/available', methods=['GET'])
-@jwt_required()
-@cache.cached(timeout=300)
-def get_available_quizzes():
+def build_available_quizzes(stamp=None):
+    """
+    Build the available-quiz listing and cache it until the next quiz opens or closes (at most
+    an hour); readers refresh the time-dependent fields with with_live_schedule
+    """
+    if stamp is None:
+        stamp = tagged_cache.stamp(QUIZ_LISTING_TAGS)
     quizzes = db.session.query(Quiz, Chapter, Subject).join(Chapter, Quiz.chapter_id == Chapter.id).join(Subject, Chapter.subject_id == Subject.id).filter(Quiz.is_active == True).all()
     # Filter out quizzes with no questions
     available_quizzes = [{
@@ -475,10 +660,108 @@ def get_available_quizzes():
         'remaining_time': quiz.get_remaining_time()
     } for quiz, chapter, subject in quizzes if len(quiz.questions) > 0]
     
-    return jsonify(available_quizzes)
+    tagged_cache.set(AVAILABLE_QUIZZES_CACHE_KEY, available_quizzes, stamp,
+                     timeout=quiz_schedule.ttl_until_next_transition(default=3600))
+    return available_quizzes
+
+def with_live_schedule(quizzes):
+    """Recompute status, is_quiz_active and remaining_time of listed quizzes from the in-process schedule"""
+    now = datetime.utcnow()
+    for quiz in quizzes:
+        schedule = quiz_schedule.get_status(quiz['id'], now)
+        if schedule is not None:
+            quiz.update(status=schedule['status'], is_quiz_active=schedule['is_active'],
+                        remaining_time=schedule['remaining_time'])
+    return quizzes
+
+@app.route('/api/user/available-quizzes', methods=['GET'])
+@app.route('/api/quizzes/available', methods=['GET'])
+@jwt_required()
+def get_available_quizzes():
+    available_quizzes, stamp = tagged_cache.get(AVAILABLE_QUIZZES_CACHE_KEY, QUIZ_LISTING_TAGS)
+    if available_quizzes is None:
+        available_quizzes = build_available_quizzes(stamp)
+    return jsonify(with_live_schedule(available_quizzes))
+
+def get_attempt_deadline(quiz, started_at):
+    """Latest moment an attempt can be submitted: the quiz end time, or the duration for unscheduled quizzes"""
+    if quiz.start_time:
+        return quiz.start_time + timedelta(minutes=quiz.duration_minutes)
+    return started_at + timedelta(minutes=quiz.duration_minutes)
+
+def get_submit_cutoff(quiz, started_at):
+    """Last moment a submit is accepted: the deadline plus SUBMIT_GRACE_SECONDS; the sweeper waits for it"""
+    return get_attempt_deadline(quiz, started_at) + timedelta(seconds=app.config['SUBMIT_GRACE_SECONDS'])
+
+def complete_attempt(attempt, completed_at, answers, score):
+    """
+    Mark an open attempt completed and feed it to the rollups and achievements (caller
+    commits). Returns False, changing nothing, when a concurrent submit or the sweeper
+    completed it since it was loaded, so each attempt is only counted once.
+    """
+    completed = db.session.execute(
+        db.update(QuizAttempt).where(
+            QuizAttempt.id == attempt.id,
+            QuizAttempt.completed_at.is_(None)
+        ).values(
+            completed_at=completed_at,
+            time_taken=(completed_at - attempt.started_at).total_seconds(),
+            answers=answers,
+            score=score
+        )
+    ).rowcount
+    if not completed:
+        return False
+    analytics_rollups.apply([attempt])
+    achievement_service.evaluate([attempt])
+    return True
+
+def finalize_attempt(attempt, completed_at):
+    """Grade an unsubmitted attempt from its autosaved answers (caller commits)"""
+    answers = attempt_store.get_answers(attempt.id)
+    return complete_attempt(attempt, completed_at, answers, answer_keys.grade(attempt.quiz_id, answers))
+
+def admission_controlled(f):
+    """Decorator that admits starts of running scheduled quizzes through the waiting room"""
+    @wraps(f)
+    def decorated_function(quiz_id, *args, **kwargs):
+        if not app.config['ADMISSION_CONTROL_ENABLED']:
+            return f(quiz_id, *args, **kwargs)
+        
+        schedule = quiz_schedule.get_status(quiz_id)
+        if not schedule or not schedule['start_time'] or not schedule['is_active']:
+            return f(quiz_id, *args, **kwargs)
+        
+        try:
+            ticket = admission_gate.try_acquire(quiz_id, int(get_jwt_identity()), schedule['remaining_time'])
+        except Exception as e:
+            # Fail open: never keep users out because Redis is unavailable
+            print(f"Admission gate error: {e}")
+            return f(quiz_id, *args, **kwargs)
+        
+        if not ticket['admitted']:
+            response = jsonify({
+                'status': 'waiting',
+                'message': 'Many students are starting this quiz, you are in the waiting room',
+                'position': ticket['position'],
+                'eta_seconds': ticket['eta_seconds'],
+                'retry_after': ticket['retry_after']
+            })
+            response.headers['Retry-After'] = str(ticket['retry_after'])
+            return response, 429
+        
+        try:
+            return f(quiz_id, *args, **kwargs)
+        finally:
+            try:
+                admission_gate.release(quiz_id)
+            except Exception as e:
+                print(f"Admission gate error: {e}")
+    return decorated_function
 
 @app.route('/api/user/quiz/<int:quiz_id>/start', methods=['POST'])
 @jwt_required()
+@admission_controlled
 def start_quiz(quiz_id):
     user_id = int(get_jwt_identity())
     quiz = Quiz.query.get_or_404(quiz_id)
@@ -502,10 +785,11 @@ def start_quiz(quiz_id):
                 'status': status
             }), 400
     
-    questions = Question.query.filter_by(quiz_id=quiz_id).all()
+    # Answer-free question list, serialized once per quiz content version
+    questions_count, questions_payload = question_payloads.get(quiz_id)
     
     # Validate that quiz has questions
-    if len(questions) == 0:
+    if questions_count == 0:
         return jsonify({'error': 'This quiz has no questions available. Please contact an administrator.'}), 400
     
     # Check if user has already attempted this quiz
@@ -515,88 +799,176 @@ def start_quiz(quiz_id):
         completed_at=None
     ).first()
     
-    if existing_attempt:
-        return jsonify({'error': 'You have an incomplete attempt for this quiz'}), 400
+    if existing_attempt and not submission_pipeline.get_pending(existing_attempt.id):
+        deadline = get_attempt_deadline(quiz, existing_attempt.started_at)
+        if get_submit_cutoff(quiz, existing_attempt.started_at) >= datetime.utcnow():
+            return jsonify({
+                'error': 'You have an incomplete attempt for this quiz',
+                'attempt_id': existing_attempt.id
+            }), 400
+        
+        # Abandoned past its deadline: grade what was autosaved and let the user start again
+        finalize_attempt(existing_attempt, deadline)
+        db.session.commit()
+        attempt_store.close(existing_attempt.id)
+        on_attempts_completed([existing_attempt])
     
     # Create quiz attempt record
     attempt = QuizAttempt(
         user_id=user_id,
         quiz_id=quiz_id,
         score=0,
-        total_questions=len(questions),
+        total_questions=questions_count,
         started_at=datetime.utcnow()
     )
     db.session.add(attempt)
     db.session.commit()
+    attempt_store.open(attempt.id, user_id, quiz_id, get_attempt_deadline(quiz, attempt.started_at))
+    invalidate_user_caches([user_id])  # Performance counts started attempts
     
-    # Return questions without correct answers
-    return jsonify({
-        'attempt_id': attempt.id,
-        'quiz': {
-            'id': quiz.id,
-            'title': quiz.title,
-            'duration': quiz.duration,
-            'duration_minutes': quiz.duration_minutes,
-            'start_time': quiz.start_time.isoformat() if quiz.start_time else None,
-            'status': quiz.get_quiz_status(),
-            'remaining_time': quiz.get_remaining_time()
-        },
-        'questions': [{
-            'id': q.id,
-            'text': q.text,
-            'option_a': q.option_a,
-            'option_b': q.option_b,
-            'option_c': q.option_c,
-            'option_d': q.option_d
-        } for q in questions]
-    })
+    # Splice the per-attempt fields around the pre-encoded questions
+    quiz_payload = json.dumps({
+        'id': quiz.id,
+        'title': quiz.title,
+        'duration': quiz.duration,
+        'duration_minutes': quiz.duration_minutes,
+        'start_time': quiz.start_time.isoformat() if quiz.start_time else None,
+        'status': quiz.get_quiz_status(),
+        'remaining_time': quiz.get_remaining_time()
+    }, separators=(',', ':')).encode('utf-8')
+    
+    body = b'{"attempt_id":%d,"quiz":%s,"questions":%s}' % (attempt.id, quiz_payload, questions_payload)
+    return Response(body, mimetype='application/json')
 
 # New endpoints for quiz scheduling
 @app.route('/api/quiz/<int:quiz_id>/status', methods=['GET'])
 @jwt_required()
 def get_quiz_status(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
+    # Served from the in-memory schedule index, no database access
+    schedule = quiz_schedule.get_status(quiz_id)
+    if schedule is None:
+        abort(404)
     return jsonify({
-        'id': quiz.id,
-        'title': quiz.title,
-        'status': quiz.get_quiz_status(),
-        'is_active': quiz.is_quiz_active(),
-        'start_time': quiz.start_time.isoformat() if quiz.start_time else None,
-        'duration_minutes': quiz.duration_minutes,
-        'remaining_time': quiz.get_remaining_time()
+        'id': schedule['id'],
+        'title': schedule['title'],
+        'status': schedule['status'],
+        'is_active': schedule['is_active'],
+        'start_time': schedule['start_time'].isoformat() if schedule['start_time'] else None,
+        'duration_minutes': schedule['duration_minutes'],
+        'remaining_time': schedule['remaining_time']
     })
 
 @app.route('/api/quiz/<int:quiz_id>/is_active', methods=['GET'])
 @jwt_required()
 def check_quiz_active(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
+    schedule = quiz_schedule.get_status(quiz_id)
+    if schedule is None:
+        abort(404)
     return jsonify({
-        'is_active': quiz.is_quiz_active(),
-        'status': quiz.get_quiz_status()
+        'is_active': schedule['is_active'],
+        'status': schedule['status']
     })
 
+@app.route('/api/user/quiz-attempt/<int:attempt_id>/answers', methods=['POST'])
+@jwt_required()
+def autosave_answers(attempt_id):
+    """Autosave answers of an in-progress attempt to Redis; the database is not touched"""
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    
+    answers = data.get('answers') or {}
+    if not isinstance(answers, dict):
+        return jsonify({'error': 'Answers must map question ids to selected options'}), 400
+    if 'question_id' in data:
+        answers[str(data['question_id'])] = data.get('selected_option')
+    answers = {question_id: option for question_id, option in answers.items() if option}
+    
+    if not answers:
+        return jsonify({'error': 'No answers provided'}), 400
+    
+    try:
+        meta = attempt_store.get_meta(attempt_id)
+        if not meta or meta['user_id'] != user_id:
+            return jsonify({'error': 'Quiz attempt not found or already submitted'}), 404
+        
+        if meta['deadline'] + timedelta(seconds=app.config['SUBMIT_GRACE_SECONDS']) < datetime.utcnow():
+            return jsonify({'error': 'Quiz attempt time is over'}), 400
+        
+        attempt_store.save_answers(attempt_id, answers, meta['deadline'])
+    except Exception as e:
+        print(f"Autosave error: {e}")
+        return jsonify({'error': 'Autosave is temporarily unavailable'}), 503
+    
+    return jsonify({'saved': len(answers)})
+
 @app.route('/api/user/quiz/submit', methods=['POST'])
 @jwt_required()
 @limiter.limit("2 per minute")
 def submit_quiz():
-    data = request.get_json()
-    attempt_id = data['attempt_id']
-    answers = data['answers']  # {question_id: selected_option}
-    
-    attempt = QuizAttempt.query.get_or_404(attempt_id)
-    attempt.completed_at = datetime.utcnow()
-    attempt.time_taken = (attempt.completed_at - attempt.started_at).total_seconds()
-    attempt.answers = answers
-    
-    # Calculate score
-    questions = Question.query.filter_by(quiz_id=attempt.quiz_id).all()
-    score = 0
-    for question in questions:
-        if str(question.id) in answers and answers[str(question.id)] == question.correct_option:
-            score += 1
-    
-    attempt.score = score
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    
+    if not isinstance(data.get('attempt_id'), int):
+        return jsonify({'error': 'attempt_id is required'}), 400
+    submitted = data.get('answers') or {}
+    if not isinstance(submitted, dict):
+        return jsonify({'error': 'Answers must map question ids to selected options'}), 400
+    
+    attempt = db.session.get(QuizAttempt, data['attempt_id'])
+    if not attempt or attempt.user_id != user_id:
+        return jsonify({'error': 'Quiz attempt not found'}), 404
+    if attempt.completed_at is not None:
+        return jsonify({'error': 'Quiz attempt already submitted'}), 409
+    
+    completed_at = datetime.utcnow()
+    quiz = db.session.get(Quiz, attempt.quiz_id)
+    if completed_at > get_submit_cutoff(quiz, attempt.started_at):
+        # Past the grace period the sweeper grades whatever was autosaved
+        return jsonify({'error': 'Quiz attempt time is over'}), 400
+    # A submit in the grace period is graded as if it arrived at the deadline
+    completed_at = min(completed_at, get_attempt_deadline(quiz, attempt.started_at))
+    
+    # Autosaved answers, overridden by anything sent with the submit {question_id: selected_option}
+    answers = attempt_store.get_answers(attempt.id)
+    answers.update(submitted)
+    
+    time_taken = (completed_at - attempt.started_at).total_seconds()
+    
+    # Calculate score from the cached answer key
+    score = answer_keys.grade(attempt.quiz_id, answers)
+    
+    if app.config['SUBMIT_WRITE_BEHIND']:
+        try:
+            # Acknowledge now; the flush_submission_stream task persists the attempt
+            result, _ = submission_pipeline.enqueue({
+                'attempt_id': attempt.id,
+                'user_id': attempt.user_id,
+                'quiz_id': attempt.quiz_id,
+                'score': score,
+                'total_questions': attempt.total_questions,
+                'time_taken': time_taken,
+                'started_at': attempt.started_at.isoformat(),
+                'completed_at': completed_at.isoformat(),
+                'answers': answers
+            })
+            attempt_store.close(attempt.id)
+            return jsonify({
+                'score': result['score'],
+                'total_questions': result['total_questions'],
+                'percentage': round((result['score'] / result['total_questions']) * 100, 2),
+                'time_taken': result['time_taken'],
+                'status': 'accepted'
+            }), 202
+        except Exception as e:
+            # Redis unavailable, fall back to a synchronous write
+            print(f"Submission pipeline error: {e}")
+    
+    if not complete_attempt(attempt, completed_at, answers, score):
+        db.session.rollback()
+        return jsonify({'error': 'Quiz attempt already submitted'}), 409
     db.session.commit()
+    attempt_store.close(attempt.id)
+    on_attempts_completed([attempt])
     
     return jsonify({
         'score': score,
@@ -611,38 +983,97 @@ def submit_quiz():
 @jwt_required()
 def get_user_performance():
     user_id = int(get_jwt_identity())
-    attempts = QuizAttempt.query.filter_by(user_id=user_id).all()
     
-    # Subject-wise performance
-    subject_performance = {}
-    for attempt in attempts:
-        quiz = Quiz.query.get(attempt.quiz_id)
-        chapter = Chapter.query.get(quiz.chapter_id)
-        subject = Subject.query.get(chapter.subject_id)
-        
-        if subject.name not in subject_performance:
-            subject_performance[subject.name] = {'total_score': 0, 'total_attempts': 0, 'total_questions': 0}
-        
-        subject_performance[subject.name]['total_score'] += attempt.score
-        subject_performance[subject.name]['total_attempts'] += 1
-        subject_performance[subject.name]['total_questions'] += attempt.total_questions
+    # Names come from quizzes and subjects; the user tag moves with their attempts
+    cache_key = f"user_performance:{user_id}"
+    performance, stamp = tagged_cache.get(cache_key, QUIZ_LISTING_TAGS + (f"user:{user_id}",))
+    if performance is None:
+        performance = build_user_performance(user_id)
+        tagged_cache.set(cache_key, performance, stamp, timeout=3600)
+    return jsonify(performance)
+
+def build_user_performance(user_id):
+    """Attempt count, per-subject totals and the last 10 attempts of a user"""
+    total_attempts = QuizAttempt.query.filter_by(user_id=user_id).count()
     
-    return jsonify({
-        'total_attempts': len(attempts),
+    # Subject-wise performance, grouped in the database
+    subject_rows = db.session.query(
+        Subject.name,
+        db.func.sum(QuizAttempt.score).label('total_score'),
+        db.func.count(QuizAttempt.id).label('total_attempts'),
+        db.func.sum(QuizAttempt.total_questions).label('total_questions')
+    ).select_from(QuizAttempt).join(
+        Quiz, QuizAttempt.quiz_id == Quiz.id
+    ).join(
+        Chapter, Quiz.chapter_id == Chapter.id
+    ).join(
+        Subject, Chapter.subject_id == Subject.id
+    ).filter(QuizAttempt.user_id == user_id).group_by(Subject.name).all()
+    
+    subject_performance = {row.name: {
+        'total_score': int(row.total_score or 0),
+        'total_attempts': row.total_attempts,
+        'total_questions': int(row.total_questions or 0)
+    } for row in subject_rows}
+    
+    # Last 10 attempts, oldest first
+    recent_attempts = db.session.query(QuizAttempt, Quiz.title).join(
+        Quiz, QuizAttempt.quiz_id == Quiz.id
+    ).filter(QuizAttempt.user_id == user_id).order_by(QuizAttempt.id.desc()).limit(10).all()
+    
+    return {
+        'total_attempts': total_attempts,
         'subject_performance': subject_performance,
         'recent_attempts': [{
-            'quiz_title': Quiz.query.get(a.quiz_id).title,
+            'quiz_title': title,
             'score': a.score,
             'total_questions': a.total_questions,
             'percentage': round((a.score / a.total_questions) * 100, 2),
             'completed_at': a.completed_at.isoformat() if a.completed_at else None
-        } for a in attempts[-10:]]
-    })
+        } for a, title in reversed(recent_attempts)]
+    }
+
+def get_names(model, column, ids):
+    """{id: name} for the given ids of a model, in one query"""
+    if not ids:
+        return {}
+    return dict(db.session.query(model.id, getattr(model, column)).filter(model.id.in_(set(ids))).all())
+
+def build_quiz_hierarchy(stamp=None):
+    """Quiz, chapter and subject ids and names of every quiz, cached until the content changes"""
+    if stamp is None:
+        stamp = tagged_cache.stamp(QUIZ_LISTING_TAGS)
+    rows = db.session.query(
+        Quiz.id.label('quiz_id'),
+        Quiz.title.label('quiz_title'),
+        Quiz.description.label('quiz_description'),
+        Chapter.id.label('chapter_id'),
+        Chapter.name.label('chapter_name'),
+        Subject.id.label('subject_id'),
+        Subject.name.label('subject_name')
+    ).outerjoin(
+        Chapter, Quiz.chapter_id == Chapter.id
+    ).outerjoin(
+        Subject, Chapter.subject_id == Subject.id
+    ).all()
+    hierarchy = [dict(row._mapping) for row in rows]
+    
+    tagged_cache.set(QUIZ_HIERARCHY_CACHE_KEY, hierarchy, stamp, timeout=21600)
+    return hierarchy
+
+def get_quiz_hierarchy(quiz_ids=None):
+    """{quiz_id: quiz, chapter and subject ids and names} for the given quizzes, or all of them"""
+    hierarchy, stamp = tagged_cache.get(QUIZ_HIERARCHY_CACHE_KEY, QUIZ_LISTING_TAGS)
+    if hierarchy is None:
+        hierarchy = build_quiz_hierarchy(stamp)
+    hierarchy = {quiz['quiz_id']: quiz for quiz in hierarchy}
+    if quiz_ids is None:
+        return hierarchy
+    return {quiz_id: hierarchy[quiz_id] for quiz_id in set(quiz_ids) if quiz_id in hierarchy}
 
 # Additional Admin Routes
 @app.route('/api/admin/analytics/overview', methods=['GET'])
 @jwt_required()
-@cache.cached(timeout=300)  # Cache for 5 minutes
 def admin_analytics_overview():
     user_id = int(get_jwt_identity())
     user = User.query.get(user_id)
@@ -650,139 +1081,115 @@ def admin_analytics_overview():
     if user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
     
+    return jsonify(build_analytics_overview())
+
+# Only overviews in which every section succeeded are cached
+@swr_cache.cached(ANALYTICS_OVERVIEW_CACHE, soft_ttl=300, hard_ttl=900,
+                  cache_if=lambda overview: not overview['failed_sections'])
+def build_analytics_overview():
     # Calculate date ranges
     now = datetime.utcnow()
     week_ago = now - timedelta(days=7)
     
     # 1. OVERALL METRICS (Summary Cards)
-    total_users = User.query.filter_by(role='user').count()
-    total_quizzes = Quiz.query.count()
-    total_subjects = Subject.query.count()
-    total_chapters = Chapter.query.count()
-    total_questions = Question.query.count()
-    total_attempts = QuizAttempt.query.count()
+    def summary_section():
+        return {
+            'total_users': User.query.filter_by(role='user').count(),
+            'total_quizzes': Quiz.query.count(),
+            'total_subjects': Subject.query.count(),
+            'total_chapters': Chapter.query.count(),
+            'total_questions': Question.query.count(),
+            'total_attempts': attempt_analytics.totals()['attempts']
+        }
     
     # 2. USER ANALYTICS
-    # Top 5 users by number of attempts
-    top_users_by_attempts = db.session.query(
-        User.username,
-        db.func.count(QuizAttempt.id).label('attempt_count')
-    ).join(QuizAttempt).group_by(User.id).order_by(db.desc('attempt_count')).limit(5).all()
-
-    # Top 5 users by average score
-    top_users_by_score = db.session.query(
-        User.username,
-        db.func.avg(QuizAttempt.score * 100.0 / QuizAttempt.total_questions).label('avg_score')
-    ).join(QuizAttempt).group_by(User.id).order_by(db.desc('avg_score')).limit(5).all()
-    
-    # Active users this week
-    active_users_week = db.session.query(User).join(QuizAttempt, User.id == QuizAttempt.user_id).filter(
-        QuizAttempt.completed_at >= week_ago
-    ).distinct().count()
-    
-    # Inactive users (0 attempts)
-    inactive_users = User.query.filter_by(role='user').filter(
-        ~User.id.in_(db.session.query(QuizAttempt.user_id).distinct())
-    ).count()
-    
-    # 3. SUBJECT-WISE ANALYTICS
-    subject_quiz_distribution = db.session.query(
-        Subject.name,
-        db.func.count(Quiz.id).label('quiz_count')
-    ).join(Chapter, Subject.id == Chapter.subject_id).join(Quiz, Chapter.id == Quiz.chapter_id).group_by(Subject.id).all()
-
-    # Average score per subject
-    subject_avg_scores = db.session.query(
-        Subject.name,
-        db.func.avg(QuizAttempt.score * 100.0 / QuizAttempt.total_questions).label('avg_score')
-    ).join(Chapter, Subject.id == Chapter.subject_id).join(Quiz, Chapter.id == Quiz.chapter_id).join(QuizAttempt, Quiz.id == QuizAttempt.quiz_id).group_by(Subject.id).all()
-
-    # Most attempted subject
-    most_attempted_subject = db.session.query(
-        Subject.name,
-        db.func.count(QuizAttempt.id).label('attempt_count')
-    ).join(Chapter, Subject.id == Chapter.subject_id).join(Quiz, Chapter.id == Quiz.chapter_id).join(QuizAttempt, Quiz.id == QuizAttempt.quiz_id).group_by(Subject.id).order_by(db.desc('attempt_count')).first()
-    
-    # 4. QUIZ-WISE ANALYTICS
-    quiz_attempt_counts = db.session.query(
-        Quiz.title,
-        db.func.count(QuizAttempt.id).label('attempt_count')
-    ).join(QuizAttempt).group_by(Quiz.id).order_by(db.desc('attempt_count')).limit(10).all()
+    def user_section():
+        # Top 5 users by number of attempts
+        top_users_by_attempts = attempt_analytics.top('user', 'attempts', 5)
 
-    quiz_avg_scores = db.session.query(
-        Quiz.title,
-        db.func.avg(QuizAttempt.score * 100.0 / QuizAttempt.total_questions).label('avg_score')
-    ).join(QuizAttempt).group_by(Quiz.id).order_by(db.desc('avg_score')).limit(10).all()
-    
-    # 5. REAL-TIME/RECENT EVENTS
-    recent_attempts = db.session.query(QuizAttempt).join(User, QuizAttempt.user_id == User.id).join(Quiz, QuizAttempt.quiz_id == Quiz.id).join(Chapter, Quiz.chapter_id == Chapter.id).join(Subject, Chapter.subject_id == Subject.id).filter(
-        QuizAttempt.completed_at.isnot(None)
-    ).order_by(QuizAttempt.completed_at.desc()).limit(10).all()
-    
-    recent_quizzes = Quiz.query.filter(Quiz.created_at >= week_ago).order_by(Quiz.created_at.desc()).limit(5).all()
-    
-    new_users_week = User.query.filter(
-        User.created_at >= week_ago,
-        User.role == 'user'
-    ).order_by(User.created_at.desc()).limit(5).all()
-    
-    # 6. TIME-BASED ANALYTICS
-    # Quiz attempts over time (last 30 days)
-    thirty_days_ago = now - timedelta(days=30)
-    daily_attempts = db.session.query(
-        db.func.date(QuizAttempt.completed_at).label('date'),
-        db.func.count(QuizAttempt.id).label('count')
-    ).filter(
-        QuizAttempt.completed_at >= thirty_days_ago,
-        QuizAttempt.completed_at.isnot(None)
-    ).group_by(db.func.date(QuizAttempt.completed_at)).order_by('date').all()
-    
-    return jsonify({
-        'summary': {
-            'total_users': total_users,
-            'total_quizzes': total_quizzes,
-            'total_subjects': total_subjects,
-            'total_chapters': total_chapters,
-            'total_questions': total_questions,
-            'total_attempts': total_attempts
-        },
-        'user_stats': {
+        # Top 5 users by average score
+        top_users_by_score = attempt_analytics.top('user', 'avg_percentage', 5)
+        
+        usernames = get_names(User, 'username', [u['id'] for u in top_users_by_attempts + top_users_by_score])
+        
+        # Inactive users (0 completed attempts)
+        inactive_users = User.query.filter_by(role='user').filter(
+            ~User.id.in_(db.session.query(UserStats.user_id))
+        ).count()
+        
+        return {
             'top_users_by_attempts': [{
-                'username': u.username,
-                'attempt_count': u.attempt_count
+                'username': usernames.get(u['id']),
+                'attempt_count': u['attempts']
             } for u in top_users_by_attempts],
             'top_users_by_score': [{
-                'username': u.username,
-                'avg_score': round(float(u.avg_score), 2) if u.avg_score else 0
+                'username': usernames.get(u['id']),
+                'avg_score': round(u['pct_sum'] / u['attempts'], 2)
             } for u in top_users_by_score],
-            'active_users_week': active_users_week,
+            'active_users_week': attempt_analytics.active_users(week_ago),  # Active users this week
             'inactive_users': inactive_users
-        },
-        'subject_stats': {
+        }
+    
+    # 3. SUBJECT-WISE ANALYTICS
+    def subject_section():
+        subject_quiz_distribution = db.session.query(
+            Subject.name,
+            db.func.count(Quiz.id).label('quiz_count')
+        ).join(Chapter, Subject.id == Chapter.subject_id).join(Quiz, Chapter.id == Quiz.chapter_id).group_by(Subject.id).all()
+
+        # Average score per subject
+        subject_names = dict(db.session.query(Subject.id, Subject.name).all())
+        subject_totals = [s for s in attempt_analytics.group_totals('subject') if s['id'] in subject_names]
+
+        # Most attempted subject
+        most_attempted_subject = max(subject_totals, key=lambda s: s['attempts'], default=None)
+        
+        return {
             'quiz_distribution': [{
                 'subject': s.name,
                 'quiz_count': s.quiz_count
             } for s in subject_quiz_distribution],
             'avg_scores': [{
-                'subject': s.name,
-                'avg_score': round(float(s.avg_score), 2) if s.avg_score else 0
-            } for s in subject_avg_scores],
+                'subject': subject_names[s['id']],
+                'avg_score': round(s['pct_sum'] / s['attempts'], 2)
+            } for s in subject_totals],
             'most_attempted': {
-                'subject': most_attempted_subject.name if most_attempted_subject else 'N/A',
-                'attempt_count': most_attempted_subject.attempt_count if most_attempted_subject else 0
+                'subject': subject_names[most_attempted_subject['id']] if most_attempted_subject else 'N/A',
+                'attempt_count': most_attempted_subject['attempts'] if most_attempted_subject else 0
             }
-        },
-        'quiz_stats': {
+        }
+    
+    # 4. QUIZ-WISE ANALYTICS
+    def quiz_section():
+        quiz_attempt_counts = attempt_analytics.top('quiz', 'attempts', 10)
+        quiz_avg_scores = attempt_analytics.top('quiz', 'avg_percentage', 10)
+        quiz_titles = get_names(Quiz, 'title', [q['id'] for q in quiz_attempt_counts + quiz_avg_scores])
+        
+        return {
             'attempt_counts': [{
-                'quiz': q.title,
-                'attempt_count': q.attempt_count
+                'quiz': quiz_titles.get(q['id']),
+                'attempt_count': q['attempts']
             } for q in quiz_attempt_counts],
             'avg_scores': [{
-                'quiz': q.title,
-                'avg_score': round(float(q.avg_score), 2) if q.avg_score else 0
+                'quiz': quiz_titles.get(q['id']),
+                'avg_score': round(q['pct_sum'] / q['attempts'], 2)
             } for q in quiz_avg_scores]
-        },
-        'recent_activity': {
+        }
+    
+    # 5. REAL-TIME/RECENT EVENTS
+    def recent_section():
+        recent_attempts = db.session.query(QuizAttempt).join(User, QuizAttempt.user_id == User.id).join(Quiz, QuizAttempt.quiz_id == Quiz.id).join(Chapter, Quiz.chapter_id == Chapter.id).join(Subject, Chapter.subject_id == Subject.id).filter(
+            QuizAttempt.completed_at.isnot(None)
+        ).order_by(QuizAttempt.completed_at.desc()).limit(10).all()
+        
+        recent_quizzes = Quiz.query.filter(Quiz.created_at >= week_ago).order_by(Quiz.created_at.desc()).limit(5).all()
+        
+        new_users_week = User.query.filter(
+            User.created_at >= week_ago,
+            User.role == 'user'
+        ).order_by(User.created_at.desc()).limit(5).all()
+        
+        return {
             'recent_attempts': [{
                 'user': a.user.username,
                 'quiz': a.quiz.title,
@@ -802,14 +1209,42 @@ def admin_analytics_overview():
                 'email': u.email,
                 'created_at': u.created_at.isoformat()
             } for u in new_users_week]
-        },
-        'time_analytics': {
+        }
+    
+    # 6. TIME-BASED ANALYTICS
+    def time_section():
+        # Quiz attempts over time (last 30 days)
+        thirty_days_ago = now - timedelta(days=30)
+        return {
             'daily_attempts': [{
-                'date': str(d.date),
-                'count': d.count
-            } for d in daily_attempts]
+                'date': str(date),
+                'count': count
+            } for date, count in attempt_analytics.daily_counts(thirty_days_ago)]
         }
+    
+    # The sections are independent, so run them side by side; a failed or slow
+    # section comes back as null and is listed in failed_sections
+    start = time.perf_counter()
+    sections, failed_sections, timings = analytics_fanout.run({
+        'summary': summary_section,
+        'user_stats': user_section,
+        'subject_stats': subject_section,
+        'quiz_stats': quiz_section,
+        'recent_activity': recent_section,
+        'time_analytics': time_section
     })
+    timings['total'] = ((time.perf_counter() - start) * 1000, None)
+    g.server_timing = timings
+    
+    return {
+        'summary': sections.get('summary'),
+        'user_stats': sections.get('user_stats'),
+        'subject_stats': sections.get('subject_stats'),
+        'quiz_stats': sections.get('quiz_stats'),
+        'recent_activity': sections.get('recent_activity'),
+        'time_analytics': sections.get('time_analytics'),
+        'failed_sections': failed_sections
+    }
 
 # CSV Generation Functions
 def generate_csv_export(export_type='all_attempts'):
@@ -898,7 +1333,8 @@ def generate_analytics_csv_export():
     total_subjects = Subject.query.count()
     total_chapters = Chapter.query.count()
     total_questions = Question.query.count()
-    total_attempts = QuizAttempt.query.count()
+    totals = attempt_analytics.totals()
+    total_attempts = totals['attempts']
     
     writer.writerow(['Total Users', total_users, 'Number of registered users'])
     writer.writerow(['Total Quizzes', total_quizzes, 'Number of available quizzes'])
@@ -909,7 +1345,7 @@ def generate_analytics_csv_export():
     
     # Calculate average scores
     if total_attempts > 0:
-        avg_score = db.session.query(db.func.avg(QuizAttempt.score * 100.0 / QuizAttempt.total_questions)).scalar()
+        avg_score = totals['pct_sum'] / total_attempts
         writer.writerow(['Average Score %', round(avg_score, 2), 'Average percentage score across all attempts'])
     
     # Add empty row for separation
@@ -919,20 +1355,14 @@ def generate_analytics_csv_export():
     writer.writerow(['Subject Performance Analysis'])
     writer.writerow(['Subject', 'Total Attempts', 'Average Score %', 'Total Questions'])
     
-    subjects = Subject.query.all()
-    for subject in subjects:
-        subject_attempts = db.session.query(QuizAttempt).join(Quiz, QuizAttempt.quiz_id == Quiz.id).join(Chapter, Quiz.chapter_id == Chapter.id).filter(Chapter.subject_id == subject.id).all()
-        
-        if subject_attempts:
-            total_subject_attempts = len(subject_attempts)
-            avg_subject_score = sum((attempt.score / attempt.total_questions) * 100 for attempt in subject_attempts) / total_subject_attempts
-            total_subject_questions = sum(attempt.total_questions for attempt in subject_attempts)
-            
+    subject_names = dict(db.session.query(Subject.id, Subject.name).all())
+    for subject_stat in sorted(attempt_analytics.group_totals('subject'), key=lambda s: s['id']):
+        if subject_stat['id'] in subject_names:
             writer.writerow([
-                subject.name,
-                total_subject_attempts,
-                round(avg_subject_score, 2),
-                total_subject_questions
+                subject_names[subject_stat['id']],
+                subject_stat['attempts'],
+                round(subject_stat['pct_sum'] / subject_stat['attempts'], 2),
+                subject_stat['questions_sum']
             ])
     
     # Add empty row for separation
@@ -942,19 +1372,15 @@ def generate_analytics_csv_export():
     writer.writerow(['Top Performing Users'])
     writer.writerow(['Username', 'Total Attempts', 'Average Score %', 'Best Score %'])
     
-    top_users = db.session.query(
-        User.username,
-        db.func.count(QuizAttempt.id).label('attempt_count'),
-        db.func.avg(QuizAttempt.score * 100.0 / QuizAttempt.total_questions).label('avg_score'),
-        db.func.max(QuizAttempt.score * 100.0 / QuizAttempt.total_questions).label('best_score')
-    ).join(QuizAttempt).group_by(User.id).order_by(db.desc('avg_score')).limit(10).all()
+    top_users = attempt_analytics.top('user', 'avg_percentage', 10)
+    usernames = get_names(User, 'username', [u['id'] for u in top_users])
     
     for user_stat in top_users:
         writer.writerow([
-            user_stat.username,
-            user_stat.attempt_count,
-            round(user_stat.avg_score, 2),
-            round(user_stat.best_score, 2)
+            usernames.get(user_stat['id']),
+            user_stat['attempts'],
+            round(user_stat['pct_sum'] / user_stat['attempts'], 2),
+            round(user_stat['best_pct'], 2)
         ])
     
     csv_content = csv_buffer.getvalue()
@@ -1202,7 +1628,7 @@ def update_subject(subject_id):
     subject.description = data.get('description', subject.description)
     
     db.session.commit()
-    invalidate_subject_caches()
+    invalidate_subject_caches(subject_id)
     return jsonify({'message': 'Subject updated successfully'})
 
 @app.route('/api/admin/subjects/<int:subject_id>', methods=['DELETE'])
@@ -1217,7 +1643,8 @@ def delete_subject(subject_id):
     subject = Subject.query.get_or_404(subject_id)
     db.session.delete(subject)
     db.session.commit()
-    invalidate_subject_caches()
+    invalidate_subject_caches(subject_id)
+    invalidate_rankings()
     return jsonify({'message': 'Subject deleted successfully'})
 
 @app.route('/api/admin/chapters/<int:chapter_id>', methods=['PUT'])
@@ -1236,6 +1663,7 @@ def update_chapter(chapter_id):
     chapter.description = data.get('description', chapter.description)
     
     db.session.commit()
+    invalidate_subject_caches(chapter.subject_id)
     return jsonify({'message': 'Chapter updated successfully'})
 
 @app.route('/api/admin/chapters/<int:chapter_id>', methods=['DELETE'])
@@ -1248,8 +1676,12 @@ def delete_chapter(chapter_id):
         return jsonify({'error': 'Admin access required'}), 403
     
     chapter = Chapter.query.get_or_404(chapter_id)
+    subject_id = chapter.subject_id
     db.session.delete(chapter)
     db.session.commit()
+    invalidate_quiz_caches()
+    invalidate_subject_caches(subject_id)
+    invalidate_rankings()
     return jsonify({'message': 'Chapter deleted successfully'})
 
 @app.route('/api/admin/quizzes/<int:quiz_id>', methods=['PUT'])
@@ -1281,7 +1713,8 @@ def update_quiz(quiz_id):
     quiz.is_active = data.get('is_active', quiz.is_active)
     
     db.session.commit()
-    invalidate_quiz_caches()
+    invalidate_quiz_caches(quiz_id)
+    invalidate_quiz_content_caches(quiz_id)
     return jsonify({'message': 'Quiz updated successfully'})
 
 @app.route('/api/admin/quizzes/<int:quiz_id>', methods=['DELETE'])
@@ -1296,7 +1729,9 @@ def delete_quiz(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
     db.session.delete(quiz)
     db.session.commit()
-    invalidate_quiz_caches()
+    invalidate_quiz_caches(quiz_id)
+    invalidate_quiz_content_caches(quiz_id)
+    invalidate_rankings()
     return jsonify({'message': 'Quiz deleted successfully'})
 
 @app.route('/api/admin/questions/<int:question_id>', methods=['PUT'])
@@ -1319,6 +1754,7 @@ def update_question(question_id):
     question.correct_option = data.get('correct_option', question.correct_option)
     
     db.session.commit()
+    invalidate_quiz_content_caches(question.quiz_id)
     return jsonify({'message': 'Question updated successfully'})
 
 @app.route('/api/admin/questions/<int:question_id>', methods=['DELETE'])
@@ -1331,10 +1767,48 @@ def delete_question(question_id):
         return jsonify({'error': 'Admin access required'}), 403
     
     question = Question.query.get_or_404(question_id)
+    quiz_id = question.quiz_id
     db.session.delete(question)
     db.session.commit()
+    invalidate_quiz_content_caches(quiz_id)
     return jsonify({'message': 'Question deleted successfully'})
 
+@app.route('/api/admin/quizzes/<int:quiz_id>/regrade', methods=['POST'])
+@jwt_required()
+def regrade_quiz(quiz_id):
+    """Re-grade stored attempts against the current answer key (dry run previews score deltas)"""
+    user_id = int(get_jwt_identity())
+    user = User.query.get(user_id)
+    
+    if user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    Quiz.query.get_or_404(quiz_id)
+    data = request.get_json(silent=True) or {}
+    # A JSON boolean or the string "true"/"false", so a string "false" is not taken as truthy
+    dry_run = str(data.get('dry_run', request.args.get('dry_run', 'true'))).lower()
+    if dry_run not in ('true', 'false'):
+        return jsonify({'error': 'dry_run must be true or false'}), 400
+    dry_run = dry_run == 'true'
+    
+    try:
+        if dry_run:
+            from models.regrade import RegradeService
+            report, _ = RegradeService(db, answer_keys).regrade(quiz_id, dry_run=True)
+            return jsonify(report), 200
+        
+        # Import tasks here to avoid circular imports
+        from tasks import regrade_quiz_attempts
+        task = regrade_quiz_attempts.delay(quiz_id)
+        
+        return jsonify({
+            'message': 'Quiz re-grade started',
+            'task_id': task.id,
+            'status': 'Task queued for processing'
+        }), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # User Management Routes
 @app.route('/api/admin/users', methods=['GET'])
 @jwt_required()
@@ -1372,10 +1846,24 @@ def update_user(user_id):
     
     user.username = data.get('username', user.username)
     user.email = data.get('email', user.email)
+    was_regular = user.role == 'user'
     user.role = data.get('role', user.role)
     user.is_active = data.get('is_active', user.is_active)
     
     db.session.commit()
+    try:
+        leaderboard_service.record_username(user.id, user.username)
+        if was_regular and user.role != 'user':
+            leaderboard_service.remove_user(user.id, leaderboard_service.quizzes_of_user(user.id))
+        elif not was_regular and user.role == 'user':
+            # Their past attempts were never ranked, so recompute the rankings in the background
+            from tasks import rebuild_leaderboards
+            rebuild_leaderboards.delay()
+    except Exception as e:
+        print(f"Leaderboard update error: {e}")
+    invalidate_rankings()  # Rankings show usernames and only include regular users
+    if was_regular != (user.role == 'user'):
+        on_users_changed(-1 if was_regular else 1)
     return jsonify({'message': 'User updated successfully'})
 
 @app.route('/api/admin/users/<int:user_id>', methods=['DELETE'])
@@ -1392,8 +1880,18 @@ def delete_user(user_id):
     if user.role == 'admin':
         return jsonify({'error': 'Cannot delete admin users'}), 400
     
+    ranked_quiz_ids = leaderboard_service.quizzes_of_user(user.id)
+    # Per-user rollups and unlocks have no relationship to cascade through
+    for model in (UserStats, UserSubjectRollup, UserAchievement):
+        db.session.execute(db.delete(model).where(model.user_id == user.id))
     db.session.delete(user)
     db.session.commit()
+    try:
+        leaderboard_service.remove_user(user.id, ranked_quiz_ids)
+    except Exception as e:
+        print(f"Leaderboard update error: {e}")
+    invalidate_rankings()
+    on_users_changed(-1)
     return jsonify({'message': 'User deleted successfully'})
 
 # Search functionality
@@ -1750,16 +2248,140 @@ def check_task_status(task_id):
         return jsonify({'error': str(e)}), 500
 
 # Leaderboard and Achievements Endpoints
+def filter_leaderboard_scope(query, subject_id=None, quiz_id=None):
+    """Restrict a leaderboard query joined on QuizAttempt to one subject or quiz"""
+    if quiz_id is not None:
+        query = query.filter(QuizAttempt.quiz_id == quiz_id)
+    elif subject_id is not None:
+        query = query.join(Quiz, QuizAttempt.quiz_id == Quiz.id).join(
+            Chapter, Quiz.chapter_id == Chapter.id
+        ).filter(Chapter.subject_id == subject_id)
+    return query
+
+def leaderboard_ranking_query(start_date, subject_id=None, quiz_id=None, *columns):
+    """Per-user ranking aggregates (attempts, average percentage) plus any extra columns"""
+    query = db.session.query(
+        User.id,
+        User.username,
+        db.func.count(QuizAttempt.id).label('total_attempts'),
+        db.func.avg(QuizAttempt.score * 100.0 / QuizAttempt.total_questions).label('avg_percentage'),
+        *columns
+    ).join(
+        QuizAttempt, User.id == QuizAttempt.user_id
+    )
+    return filter_leaderboard_scope(query, subject_id, quiz_id).filter(
+        QuizAttempt.completed_at >= start_date,
+        QuizAttempt.completed_at.isnot(None),
+        User.role == 'user'  # Only include regular users
+    ).group_by(
+        User.id, User.username
+    ).having(
+        db.func.count(QuizAttempt.id) > 0  # Must have at least one attempt
+    )
+
+def get_leaderboard_from_db(start_date, limit, subject_id=None, quiz_id=None):
+    """SQL top-N and ranked user count, used when the Redis rankings are unavailable"""
+    # Query to get user rankings based on average score and total attempts
+    leaderboard_data = leaderboard_ranking_query(
+        start_date, subject_id, quiz_id,
+        db.func.max(QuizAttempt.score * 100.0 / QuizAttempt.total_questions).label('best_score'),
+        db.func.sum(QuizAttempt.score).label('total_score')
+    ).order_by(
+        db.func.avg(QuizAttempt.score * 100.0 / QuizAttempt.total_questions).desc(),
+        db.func.count(QuizAttempt.id).desc()
+    ).limit(limit).all()
+    
+    total_users = db.session.query(db.func.count()).select_from(
+        leaderboard_ranking_query(start_date, subject_id, quiz_id).subquery()
+    ).scalar()
+    
+    # Format leaderboard data; users with equal average and attempt count share a rank
+    leaderboard = []
+    for idx, user_data in enumerate(leaderboard_data):
+        previous = leaderboard_data[idx - 1] if idx else None
+        tied = previous and (previous.avg_percentage, previous.total_attempts) == (user_data.avg_percentage, user_data.total_attempts)
+        leaderboard.append({
+            'rank': leaderboard[-1]['rank'] if tied else idx + 1,
+            'user_id': user_data.id,
+            'username': user_data.username,
+            'total_attempts': user_data.total_attempts,
+            'avg_percentage': round(float(user_data.avg_percentage or 0), 1),
+            'best_score': round(float(user_data.best_score or 0), 1),
+            'total_score': int(user_data.total_score or 0)
+        })
+    
+    return leaderboard, total_users
+
+def get_user_rank_from_db(start_date, user_id, subject_id=None, quiz_id=None):
+    """SQL rank of one user: one plus the number of users ranked strictly above them"""
+    ranking = leaderboard_ranking_query(start_date, subject_id, quiz_id).subquery()
+    
+    user_data = db.session.query(ranking).filter(ranking.c.id == user_id).first()
+    if not user_data:
+        return None
+    
+    ahead = db.session.query(db.func.count()).select_from(ranking).filter(db.or_(
+        ranking.c.avg_percentage > user_data.avg_percentage,
+        db.and_(
+            ranking.c.avg_percentage == user_data.avg_percentage,
+            ranking.c.total_attempts > user_data.total_attempts
+        )
+    )).scalar()
+    
+    return {
+        'rank': ahead + 1,
+        'total_attempts': user_data.total_attempts,
+        'avg_percentage': round(float(user_data.avg_percentage or 0), 1)
+    }
+
+def leaderboard_rankings_ready(period, scope):
+    """Make sure the Redis rankings for a period and scope exist; False means use SQL"""
+    if period not in ('all', 'week', 'month'):
+        return False
+    try:
+        if not leaderboard_service.is_ready():
+            # Built once in the background; requests are served from SQL until then
+            if leaderboard_service.claim_build():
+                from tasks import rebuild_leaderboards
+                rebuild_leaderboards.delay()
+            return False
+        if period != 'all':
+            # Rolling windows are merged from per-day buckets
+            leaderboard_service.ensure_window(period, scope)
+        return True
+    except Exception as e:
+        print(f"Leaderboard cache error: {e}")
+        return False
+
+# Top-N sizes the leaderboard serves; other limits round up to the next one, so the
+# shared cache holds a handful of entries per period and scope
+LEADERBOARD_LIMITS = (5, 10, 25, 50, 100)
+
 @app.route('/api/leaderboard', methods=['GET'])
 @jwt_required()
-@cache.cached(timeout=300)  # Cache for 5 minutes
 def get_leaderboard():
     """Get leaderboard data based on user performance"""
     start_time = time.perf_counter()
     try:
         # Get time period from query params (default: week)
         period = request.args.get('period', 'week')
-        limit = int(request.args.get('limit', 10))
+        if period not in ('week', 'month', 'all'):
+            period = 'week'
+        requested = request.args.get('limit', 10, type=int) or 10
+        limit = next((size for size in LEADERBOARD_LIMITS if size >= requested), LEADERBOARD_LIMITS[-1])
+        rank_mode = 'percentile' if request.args.get('rank_mode') == 'percentile' else 'exact'
+        current_user_id = int(get_jwt_identity())
+        
+        # Optional scope: rankings within one subject or one quiz
+        subject_id = request.args.get('subject_id', type=int)
+        quiz_id = request.args.get('quiz_id', type=int)
+        if quiz_id is not None:
+            scope = f"quiz:{quiz_id}"
+        elif subject_id is not None:
+            scope = f"subject:{subject_id}"
+        else:
+            scope = 'global'
+        tags = ('leaderboard',) if scope == 'global' else ('leaderboard', scope)
         
         # Calculate date range based on period
         now = datetime.utcnow()
@@ -1767,97 +2389,62 @@ def get_leaderboard():
             start_date = now - timedelta(days=7)
         elif period == 'month':
             start_date = now - timedelta(days=30)
-        elif period == 'all':
-            start_date = datetime.min
         else:
-            start_date = now - timedelta(days=7)  # Default to week
-        
-        # Query to get user rankings based on average score and total attempts
-        leaderboard_query = db.session.query(
-            User.id,
-            User.username,
-            db.func.count(QuizAttempt.id).label('total_attempts'),
-            db.func.avg(QuizAttempt.score * 100.0 / QuizAttempt.total_questions).label('avg_percentage'),
-            db.func.max(QuizAttempt.score * 100.0 / QuizAttempt.total_questions).label('best_score'),
-            db.func.sum(QuizAttempt.score).label('total_score')
-        ).join(
-            QuizAttempt, User.id == QuizAttempt.user_id
-        ).filter(
-            QuizAttempt.completed_at >= start_date,
-            QuizAttempt.completed_at.isnot(None),
-            User.role == 'user'  # Only include regular users
-        ).group_by(
-            User.id, User.username
-        ).having(
-            db.func.count(QuizAttempt.id) > 0  # Must have at least one attempt
-        ).order_by(
-            db.func.avg(QuizAttempt.score * 100.0 / QuizAttempt.total_questions).desc(),
-            db.func.count(QuizAttempt.id).desc()
-        ).limit(limit)
-        
-        leaderboard_data = leaderboard_query.all()
+            start_date = datetime.min
         
-        # Get current user's rank
-        current_user_id = get_jwt_identity()
-        user_rank = None
+        redis_ready = leaderboard_rankings_ready(period, scope)
+        
+        # The top-N is the same for everyone, so it is cached once per period, scope and limit
+        cache_key = f"leaderboard_top:{period}:{scope}:{limit}"
+        shared, stamp = tagged_cache.get(cache_key, tags)
+        cache_status = 'HIT'
+        if shared is None:
+            cache_status = 'MISS'
+            if redis_ready:
+                try:
+                    shared = {
+                        'leaderboard': leaderboard_service.top(limit, scope, period),
+                        'total_users': leaderboard_service.count(scope, period)
+                    }
+                except Exception as e:
+                    print(f"Leaderboard cache error: {e}")
+            if shared is None:
+                leaderboard, total_users = get_leaderboard_from_db(start_date, limit, subject_id, quiz_id)
+                shared = {'leaderboard': leaderboard, 'total_users': total_users}
+            tagged_cache.set(cache_key, shared, stamp, timeout=app.config['LEADERBOARD_CACHE_TIMEOUT'])
+        
+        # The caller's own rank is never shared: a sorted-set lookup, or a single SQL count.
+        # In percentile mode users outside the top-N get an approximate "top X%" instead.
         user_stats = None
-        
-        # Find current user's position in the full ranking
-        full_ranking_query = db.session.query(
-            User.id,
-            User.username,
-            db.func.count(QuizAttempt.id).label('total_attempts'),
-            db.func.avg(QuizAttempt.score * 100.0 / QuizAttempt.total_questions).label('avg_percentage')
-        ).join(
-            QuizAttempt, User.id == QuizAttempt.user_id
-        ).filter(
-            QuizAttempt.completed_at >= start_date,
-            QuizAttempt.completed_at.isnot(None),
-            User.role == 'user'
-        ).group_by(
-            User.id, User.username
-        ).having(
-            db.func.count(QuizAttempt.id) > 0
-        ).order_by(
-            db.func.avg(QuizAttempt.score * 100.0 / QuizAttempt.total_questions).desc(),
-            db.func.count(QuizAttempt.id).desc()
-        ).all()
-        
-        # Find current user's rank
-        for idx, user_data in enumerate(full_ranking_query):
-            if user_data.id == current_user_id:
-                user_rank = idx + 1
-                user_stats = {
-                    'rank': user_rank,
-                    'total_attempts': user_data.total_attempts,
-                    'avg_percentage': round(float(user_data.avg_percentage or 0), 1)
-                }
-                break
-        
-        # Format leaderboard data
-        leaderboard = []
-        for idx, user_data in enumerate(leaderboard_data):
-            leaderboard.append({
-                'rank': idx + 1,
-                'user_id': user_data.id,
-                'username': user_data.username,
-                'total_attempts': user_data.total_attempts,
-                'avg_percentage': round(float(user_data.avg_percentage or 0), 1),
-                'best_score': round(float(user_data.best_score or 0), 1),
-                'total_score': int(user_data.total_score or 0)
-            })
+        rank_resolved = False
+        if redis_ready:
+            try:
+                if rank_mode == 'percentile':
+                    user_stats = next((
+                        {key: entry[key] for key in ('rank', 'total_attempts', 'avg_percentage')}
+                        for entry in shared['leaderboard'] if entry['user_id'] == current_user_id
+                    ), None) or leaderboard_service.get_user_percentile(current_user_id, scope, period)
+                else:
+                    user_stats = leaderboard_service.get_user_rank(current_user_id, scope, period)
+                rank_resolved = True
+            except Exception as e:
+                print(f"Leaderboard cache error: {e}")
+        if not rank_resolved:
+            user_stats = get_user_rank_from_db(start_date, current_user_id, subject_id, quiz_id)
         
         end_time = time.perf_counter()
         execution_time = (end_time - start_time) * 1000  # Convert to milliseconds
         app.logger.info(f"Leaderboard API execution time: {execution_time:.2f}ms")
         
         response = jsonify({
-            'leaderboard': leaderboard,
+            'leaderboard': shared['leaderboard'],
             'current_user': user_stats,
             'period': period,
-            'total_users': len(full_ranking_query)
+            'scope': scope,
+            'rank_mode': rank_mode,
+            'total_users': shared['total_users']
         })
-        response.headers['X-Cache-Status'] = 'MISS' if not hasattr(request, 'cache_hit') else 'HIT'
+        response.headers['X-Cache-Status'] = cache_status
         response.headers['X-Execution-Time'] = f"{execution_time:.2f}ms"
         return response
         
@@ -1872,154 +2459,54 @@ def get_leaderboard():
 @app.route('/api/user/achievements', methods=['GET'])
 @jwt_required()
 def get_user_achievements():
-    """Get user achievements based on quiz performance"""
+    """Get user achievements from the unlocks recorded as attempts complete"""
     try:
-        current_user_id = get_jwt_identity()
+        current_user_id = int(get_jwt_identity())
         
-        # Get user's quiz attempts
-        attempts = QuizAttempt.query.filter_by(
-            user_id=current_user_id
-        ).filter(
-            QuizAttempt.completed_at.isnot(None)
-        ).all()
-        
-        if not attempts:
-            return jsonify({
-                'achievements': [],
-                'locked_achievements': get_locked_achievements()
-            })
-        
-        # Calculate achievement criteria
-        total_attempts = len(attempts)
-        total_score = sum(attempt.score for attempt in attempts)
-        total_questions = sum(attempt.total_questions for attempt in attempts)
-        avg_percentage = (total_score / total_questions * 100) if total_questions > 0 else 0
-        best_score = max((attempt.score / attempt.total_questions * 100) for attempt in attempts)
-        
-        # Calculate streak (consecutive days with attempts)
-        attempt_dates = sorted(set(attempt.completed_at.date() for attempt in attempts))
-        current_streak = calculate_streak(attempt_dates)
-        
-        # Perfect scores count
-        perfect_scores = sum(1 for attempt in attempts if attempt.score == attempt.total_questions)
-        
-        # Subject diversity
-        unique_subjects = set()
-        for attempt in attempts:
-            quiz = Quiz.query.get(attempt.quiz_id)
-            if quiz and quiz.chapter:
-                unique_subjects.add(quiz.chapter.subject_id)
+        stats = db.session.get(UserStats, current_user_id)
+        unlocked_at = dict(db.session.query(UserAchievement.achievement_id, UserAchievement.unlocked_at).filter(
+            UserAchievement.user_id == current_user_id
+        ).all())
+        metrics = metrics_from_stats(stats)
         
         achievements = []
-        
-        # Define achievements and check if unlocked
-        achievement_definitions = [
-            {
-                'id': 'first_quiz',
-                'title': 'Getting Started',
-                'description': 'Complete your first quiz',
-                'icon': 'fas fa-play-circle',
-                'color': '#28a745',
-                'condition': total_attempts >= 1
-            },
-            {
-                'id': 'quiz_master',
-                'title': 'Quiz Master',
-                'description': 'Complete 10 quizzes',
-                'icon': 'fas fa-graduation-cap',
-                'color': '#007bff',
-                'condition': total_attempts >= 10
-            },
-            {
-                'id': 'perfectionist',
-                'title': 'Perfectionist',
-                'description': 'Score 100% on a quiz',
-                'icon': 'fas fa-star',
-                'color': '#ffc107',
-                'condition': perfect_scores >= 1
-            },
-            {
-                'id': 'high_achiever',
-                'title': 'High Achiever',
-                'description': 'Maintain 80% average score',
-                'icon': 'fas fa-trophy',
-                'color': '#fd7e14',
-                'condition': avg_percentage >= 80 and total_attempts >= 5
-            },
-            {
-                'id': 'dedicated_learner',
-                'title': 'Dedicated Learner',
-                'description': 'Complete quizzes for 7 consecutive days',
-                'icon': 'fas fa-calendar-check',
-                'color': '#6f42c1',
-                'condition': current_streak >= 7
-            },
-            {
-                'id': 'subject_explorer',
-                'title': 'Subject Explorer',
-                'description': 'Complete quizzes in 3 different subjects',
-                'icon': 'fas fa-compass',
-                'color': '#20c997',
-                'condition': len(unique_subjects) >= 3
-            },
-            {
-                'id': 'speed_demon',
-                'title': 'Speed Demon',
-                'description': 'Complete 25 quizzes',
-                'icon': 'fas fa-bolt',
-                'color': '#e83e8c',
-                'condition': total_attempts >= 25
-            },
-            {
-                'id': 'perfectionist_pro',
-                'title': 'Perfectionist Pro',
-                'description': 'Score 100% on 5 quizzes',
-                'icon': 'fas fa-crown',
-                'color': '#ffd700',
-                'condition': perfect_scores >= 5
-            }
-        ]
-        
-        # Filter unlocked achievements
-        for achievement in achievement_definitions:
-            if achievement['condition']:
+        locked_achievements = []
+        for achievement in ACHIEVEMENTS:
+            if achievement.id in unlocked_at:
                 achievements.append({
-                    'id': achievement['id'],
-                    'title': achievement['title'],
-                    'description': achievement['description'],
-                    'icon': achievement['icon'],
-                    'color': achievement['color'],
-                    'date': 'Recently Unlocked'  # Could be more specific with actual unlock date
+                    'id': achievement.id,
+                    'title': achievement.title,
+                    'description': achievement.description,
+                    'icon': achievement.icon,
+                    'color': achievement.color,
+                    'date': unlocked_at[achievement.id].isoformat()
                 })
-        
-        # Get locked achievements
-        locked_achievements = []
-        for achievement in achievement_definitions:
-            if not achievement['condition']:
+            else:
                 locked_achievements.append({
-                    'id': achievement['id'],
-                    'title': achievement['title'],
-                    'description': achievement['description'],
-                    'icon': achievement['icon'],
-                    'progress': get_achievement_progress(achievement['id'], {
-                        'total_attempts': total_attempts,
-                        'perfect_scores': perfect_scores,
-                        'avg_percentage': avg_percentage,
-                        'current_streak': current_streak,
-                        'unique_subjects': len(unique_subjects)
-                    })
+                    'id': achievement.id,
+                    'title': achievement.title,
+                    'description': achievement.description,
+                    'icon': achievement.icon,
+                    'progress': achievement.progress(metrics)
                 })
         
+        if not stats or not stats.attempts:
+            return jsonify({
+                'achievements': achievements,
+                'locked_achievements': locked_achievements
+            })
+        
         return jsonify({
             'achievements': achievements,
             'locked_achievements': locked_achievements,
             'stats': {
-                'total_attempts': total_attempts,
-                'avg_percentage': round(avg_percentage, 1),
-                'best_score': round(best_score, 1),
-                'current_streak': current_streak,
-                'perfect_scores': perfect_scores,
-                'subjects_explored': len(unique_subjects)
+                'total_attempts': metrics['attempts'],
+                'avg_percentage': round(metrics['avg_percentage'], 1),
+                'best_score': round(stats.best_pct, 1),
+                'current_streak': metrics['current_streak'],
+                'longest_streak': stats.best_streak_days,
+                'perfect_scores': metrics['perfect_scores'],
+                'subjects_explored': metrics['unique_subjects']
             }
         })
         
@@ -2027,133 +2514,74 @@ def get_user_achievements():
         print(f"Achievements error: {str(e)}")
         return jsonify({'error': 'Failed to fetch achievements'}), 500
 
-def calculate_streak(attempt_dates):
-    """Calculate consecutive days streak"""
-    if not attempt_dates:
-        return 0
+def build_community_stats():
+    """Community-wide statistics from the database, for when the live Redis stats are unavailable"""
+    # Total users
+    total_users = User.query.filter_by(role='user').count()
     
-    # Sort dates in descending order
-    sorted_dates = sorted(attempt_dates, reverse=True)
+    # Active users (users with attempts in last 30 days)
+    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    active_users = db.session.query(UserStats.user_id).join(
+        User, User.id == UserStats.user_id
+    ).filter(
+        UserStats.last_completed_at >= thirty_days_ago,
+        User.role == 'user'
+    ).count()
     
-    # Check if there's an attempt today or yesterday
-    today = datetime.utcnow().date()
-    yesterday = today - timedelta(days=1)
+    # Total quiz attempts and average community score, from the daily rollup
+    total_attempts, total_pct = db.session.query(
+        db.func.sum(DailyAttemptRollup.attempts), db.func.sum(DailyAttemptRollup.pct_sum)
+    ).one()
+    total_attempts = total_attempts or 0
     
-    if sorted_dates[0] not in [today, yesterday]:
-        return 0
+    avg_community_score = round(float(total_pct or 0) / total_attempts, 1) if total_attempts else 0.0
     
-    # Count consecutive days
-    streak = 1
-    current_date = sorted_dates[0]
+    # Most popular subject
+    popular_subject = db.session.query(
+        Subject.name,
+        SubjectAttemptRollup.attempts.label('attempt_count')
+    ).join(
+        SubjectAttemptRollup, Subject.id == SubjectAttemptRollup.subject_id
+    ).order_by(
+        SubjectAttemptRollup.attempts.desc()
+    ).first()
     
-    for i in range(1, len(sorted_dates)):
-        expected_date = current_date - timedelta(days=1)
-        if sorted_dates[i] == expected_date:
-            streak += 1
-            current_date = sorted_dates[i]
-        else:
-            break
-    
-    return streak
-
-def get_achievement_progress(achievement_id, stats):
-    """Get progress towards locked achievement"""
-    progress_map = {
-        'first_quiz': min(stats['total_attempts'], 1),
-        'quiz_master': min(stats['total_attempts'] / 10 * 100, 100),
-        'perfectionist': min(stats['perfect_scores'], 1) * 100,
-        'high_achiever': min(stats['avg_percentage'], 80) / 80 * 100 if stats['total_attempts'] >= 5 else 0,
-        'dedicated_learner': min(stats['current_streak'] / 7 * 100, 100),
-        'subject_explorer': min(stats['unique_subjects'] / 3 * 100, 100),
-        'speed_demon': min(stats['total_attempts'] / 25 * 100, 100),
-        'perfectionist_pro': min(stats['perfect_scores'] / 5 * 100, 100)
+    return {
+        'total_users': total_users,
+        'active_users': active_users,
+        'total_attempts': total_attempts,
+        'avg_community_score': avg_community_score,
+        'most_popular_subject': popular_subject.name if popular_subject else 'N/A'
+    }
+
+def read_community_stats():
+    """Community-wide statistics from the live Redis structures, or None if they are unavailable"""
+    try:
+        community_stats.ensure_built()
+        live = community_stats.read()
+    except Exception as e:
+        print(f"Cache read error: {e}")
+        return None
+    if live is None:
+        return None
+    
+    total_users, active_users, total_attempts, pct_sum, subject_ids = live
+    subject_names = get_names(Subject, 'name', subject_ids)
+    popular_subject = next((subject_names[s] for s in subject_ids if s in subject_names), 'N/A')
+    return {
+        'total_users': total_users,
+        'active_users': active_users,
+        'total_attempts': total_attempts,
+        'avg_community_score': round(pct_sum / total_attempts, 1) if total_attempts else 0.0,
+        'most_popular_subject': popular_subject
     }
-    
-    return round(progress_map.get(achievement_id, 0), 1)
-
-def get_locked_achievements():
-    """Get default locked achievements for users with no attempts"""
-    return [
-        {
-            'id': 'first_quiz',
-            'title': 'Getting Started',
-            'description': 'Complete your first quiz',
-            'icon': 'fas fa-play-circle',
-            'progress': 0
-        },
-        {
-            'id': 'quiz_master',
-            'title': 'Quiz Master',
-            'description': 'Complete 10 quizzes',
-            'icon': 'fas fa-graduation-cap',
-            'progress': 0
-        },
-        {
-            'id': 'perfectionist',
-            'title': 'Perfectionist',
-            'description': 'Score 100% on a quiz',
-            'icon': 'fas fa-star',
-            'progress': 0
-        }
-    ]
 
 @app.route('/api/community/stats', methods=['GET'])
 @jwt_required()
-@cache.cached(timeout=600)  # Cache for 10 minutes
 def get_community_stats():
     """Get community-wide statistics"""
     try:
-        # Total users
-        total_users = User.query.filter_by(role='user').count()
-        
-        # Active users (users with attempts in last 30 days)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        active_users = db.session.query(User.id).join(
-            QuizAttempt, User.id == QuizAttempt.user_id
-        ).filter(
-            QuizAttempt.completed_at >= thirty_days_ago,
-            User.role == 'user'
-        ).distinct().count()
-        
-        # Total quiz attempts
-        total_attempts = QuizAttempt.query.filter(
-            QuizAttempt.completed_at.isnot(None)
-        ).count()
-        
-        # Average community score
-        avg_score_result = db.session.query(
-            db.func.avg(QuizAttempt.score * 100.0 / QuizAttempt.total_questions)
-        ).filter(
-            QuizAttempt.completed_at.isnot(None)
-        ).scalar()
-        
-        avg_community_score = round(float(avg_score_result or 0), 1)
-        
-        # Most popular subject
-        popular_subject = db.session.query(
-            Subject.name,
-            db.func.count(QuizAttempt.id).label('attempt_count')
-        ).join(
-            Chapter, Subject.id == Chapter.subject_id
-        ).join(
-            Quiz, Chapter.id == Quiz.chapter_id
-        ).join(
-            QuizAttempt, Quiz.id == QuizAttempt.quiz_id
-        ).filter(
-            QuizAttempt.completed_at.isnot(None)
-        ).group_by(
-            Subject.id, Subject.name
-        ).order_by(
-            db.func.count(QuizAttempt.id).desc()
-        ).first()
-        
-        return jsonify({
-            'total_users': total_users,
-            'active_users': active_users,
-            'total_attempts': total_attempts,
-            'avg_community_score': avg_community_score,
-            'most_popular_subject': popular_subject.name if popular_subject else 'N/A'
-        })
+        return jsonify(read_community_stats() or build_community_stats())
         
     except Exception as e:
         print(f"Community stats error: {str(e)}")
@@ -2164,6 +2592,10 @@ def init_db():
     with app.app_context():
         db.create_all()
         
+        # create_all skips existing tables, so indexes added to them later are created here
+        for index in QuizAttempt.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+        
         # Create default admin user
         admin = User.query.filter_by(role='admin').first()
         if not admin:
@@ -2176,6 +2608,19 @@ def init_db():
             db.session.add(admin)
             db.session.commit()
             print("Default admin user created: admin/admin123")
+        
+        # Databases created before the rollup tables (or user_stats) existed get them filled once
+        rollups_missing = not DailyAttemptRollup.query.first() or not UserStats.query.first()
+        if rollups_missing and QuizAttempt.query.filter(QuizAttempt.completed_at.isnot(None)).first():
+            analytics_rollups.backfill()
+            db.session.commit()
+            print("Analytics rollups backfilled")
+        
+        # Databases created before achievements were persisted get them replayed once
+        if not UserAchievement.query.first() and UserStats.query.first():
+            unlocked = achievement_service.backfill()
+            db.session.commit()
+            print(f"Backfilled {unlocked} achievement unlocks")
 
 
 
@@ -2212,12 +2657,24 @@ def get_user_quiz_attempts():
         print(f"User quiz attempts error: {str(e)}")
         return jsonify({'error': 'Failed to fetch user quiz attempts'}), 500
 
+def attempt_detail_response(etag, payload):
+    """Serve encoded attempt details with a strong ETag, answering If-None-Match with 304"""
+    response = Response(payload, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f"private, max-age={app.config['ATTEMPT_DETAIL_MAX_AGE']}, immutable"
+    return response.make_conditional(request)
+
 @app.route('/api/user/quiz-attempt/<int:attempt_id>', methods=['GET'])
 @jwt_required()
 def get_quiz_attempt_details(attempt_id):
     """Get detailed information about a specific quiz attempt"""
     try:
-        user_id = get_jwt_identity()
+        user_id = int(get_jwt_identity())
+        
+        # Completed attempts never change, so their details are served from the cache
+        cached = attempt_details.get(attempt_id, user_id)
+        if cached:
+            return attempt_detail_response(*cached)
         
         attempt = QuizAttempt.query.filter_by(
             id=attempt_id,
@@ -2226,10 +2683,22 @@ def get_quiz_attempt_details(attempt_id):
         
         if not attempt:
             return jsonify({'error': 'Quiz attempt not found'}), 404
+        
+        completed = attempt.completed_at is not None
+        version = quiz_versions.get(attempt.quiz_id)  # Before the questions load, so edits orphan the entry
+        
+        # Read-your-writes: overlay a submission that is still queued for write-behind
+        if not completed:
+            pending = submission_pipeline.get_pending(attempt.id)
+            if pending:
+                db.session.expunge(attempt)
+                attempt.score = pending['score']
+                attempt.time_taken = pending['time_taken']
+                attempt.answers = pending['answers']
+                attempt.completed_at = datetime.fromisoformat(pending['completed_at'])
             
-        quiz = Quiz.query.get(attempt.quiz_id)
-        chapter = Chapter.query.get(quiz.chapter_id) if quiz else None
-        subject = Subject.query.get(chapter.subject_id) if chapter else None
+        # The quiz may have been deleted since; fall back to placeholders like the listings do
+        hierarchy = get_quiz_hierarchy([attempt.quiz_id]).get(attempt.quiz_id) or {}
         
         # Get questions and user answers
         questions = Question.query.filter_by(quiz_id=attempt.quiz_id).all()
@@ -2239,7 +2708,7 @@ def get_quiz_attempt_details(attempt_id):
         for question in questions:
             question_details.append({
                 'id': question.id,
-                'question_text': question.question_text,
+                'question_text': question.text,
                 'options': {
                     'A': question.option_a,
                     'B': question.option_b,
@@ -2251,20 +2720,20 @@ def get_quiz_attempt_details(attempt_id):
                 'is_correct': user_answers.get(str(question.id)) == question.correct_option
             })
         
-        return jsonify({
+        details = {
             'id': attempt.id,
             'quiz': {
-                'id': quiz.id,
-                'title': quiz.title,
-                'description': quiz.description
+                'id': attempt.quiz_id,
+                'title': hierarchy.get('quiz_title') or 'Unknown Quiz',
+                'description': hierarchy.get('quiz_description')
             },
             'subject': {
-                'id': subject.id if subject else None,
-                'name': subject.name if subject else 'Unknown'
+                'id': hierarchy.get('subject_id'),
+                'name': hierarchy.get('subject_name') or 'Unknown'
             },
             'chapter': {
-                'id': chapter.id if chapter else None,
-                'name': chapter.name if chapter else 'Unknown'
+                'id': hierarchy.get('chapter_id'),
+                'name': hierarchy.get('chapter_name') or 'Unknown'
             },
             'score': attempt.score,
             'total_questions': attempt.total_questions,
@@ -2273,68 +2742,110 @@ def get_quiz_attempt_details(attempt_id):
             'started_at': attempt.started_at.isoformat() if attempt.started_at else None,
             'completed_at': attempt.completed_at.isoformat() if attempt.completed_at else None,
             'questions': question_details
-        })
+        }
+        if not completed:
+            return jsonify(details)
+        return attempt_detail_response(*attempt_details.put(attempt.id, user_id, attempt.quiz_id, version, details))
         
     except Exception as e:
         print(f"Quiz attempt details error: {str(e)}")
         return jsonify({'error': 'Failed to fetch quiz attempt details'}), 500
 
+def encode_cursor(values):
+    """Opaque pagination cursor for the sort key values of the last row of a page"""
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode()
+
+def decode_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+
+def score_history_page(query, sort_by, cursor, limit):
+    """
+    One page of completed attempts after cursor, by keyset on (completed_at, id) or
+    (percentage, id). Returns (attempts, next cursor or None).
+    """
+    descending = sort_by in ('date_desc', 'score_desc')
+    beyond = operator.lt if descending else operator.gt
+    if sort_by.startswith('score'):
+        if cursor:
+            # Percentages compared by cross-multiplying, so cursors round-trip exactly
+            score, total, attempt_id = int(cursor[0]), int(cursor[1]), int(cursor[2])
+            mine, theirs = QuizAttempt.score * total, score * QuizAttempt.total_questions
+            query = query.filter(db.or_(
+                beyond(mine, theirs),
+                db.and_(mine == theirs, beyond(QuizAttempt.id, attempt_id))
+            ))
+        order = [QuizAttempt.score * 100.0 / QuizAttempt.total_questions, QuizAttempt.id]
+        key = lambda a: [a.score, a.total_questions, a.id]
+    else:
+        if cursor:
+            completed_at, attempt_id = datetime.fromisoformat(cursor[0]), int(cursor[1])
+            query = query.filter(db.or_(
+                beyond(QuizAttempt.completed_at, completed_at),
+                db.and_(QuizAttempt.completed_at == completed_at, beyond(QuizAttempt.id, attempt_id))
+            ))
+        order = [QuizAttempt.completed_at, QuizAttempt.id]
+        key = lambda a: [a.completed_at.isoformat(), a.id]
+    
+    attempts = query.order_by(*[column.desc() if descending else column.asc() for column in order]).limit(limit + 1).all()
+    if len(attempts) > limit:
+        return attempts[:limit], encode_cursor(key(attempts[limit - 1]))
+    return attempts, None
+
 @app.route('/api/user/scores', methods=['GET'])
 @jwt_required()
 def get_user_scores():
-    """Get comprehensive user score history with pagination and filtering"""
+    """Get comprehensive user score history with cursor pagination and filtering"""
     try:
-        user_id = get_jwt_identity()
+        user_id = int(get_jwt_identity())
         
         # Get query parameters
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+        cursor = request.args.get('cursor')
         subject_filter = request.args.get('subject')
         sort_by = request.args.get('sort', 'date_desc')  # date_desc, date_asc, score_desc, score_asc
+        if sort_by not in ('date_desc', 'date_asc', 'score_desc', 'score_asc'):
+            sort_by = 'date_desc'
         
-        # Base query
-        query = QuizAttempt.query.filter_by(
-            user_id=user_id
-        ).filter(
-            QuizAttempt.completed_at.isnot(None)
+        # Statistics from the user's statistics record
+        stats = db.session.get(UserStats, user_id)
+        total = stats.attempts if stats else 0
+        
+        # Base query; attempts of quizzes without questions have no percentage to order by
+        # (and are not counted in the statistics either)
+        query = QuizAttempt.query.filter(
+            QuizAttempt.user_id == user_id,
+            QuizAttempt.completed_at.isnot(None),
+            QuizAttempt.total_questions > 0
         )
         
-        # Apply subject filter if provided
+        # Apply subject filter if provided, by the quizzes of the subject rather than joins
         if subject_filter:
-            query = query.join(Quiz).join(Chapter).join(Subject).filter(
-                Subject.name == subject_filter
-            )
+            hierarchy = get_quiz_hierarchy()
+            quiz_ids = [quiz_id for quiz_id, quiz in hierarchy.items() if quiz['subject_name'] == subject_filter]
+            subject_ids = {hierarchy[quiz_id]['subject_id'] for quiz_id in quiz_ids}
+            query = query.filter(QuizAttempt.quiz_id.in_(quiz_ids))
+            total = db.session.query(db.func.coalesce(db.func.sum(UserSubjectRollup.attempts), 0)).filter(
+                UserSubjectRollup.user_id == user_id,
+                UserSubjectRollup.subject_id.in_(subject_ids)
+            ).scalar() if subject_ids else 0
         
-        # Apply sorting
-        if sort_by == 'date_asc':
-            query = query.order_by(QuizAttempt.completed_at.asc())
-        elif sort_by == 'score_desc':
-            query = query.order_by((QuizAttempt.score * 100.0 / QuizAttempt.total_questions).desc())
-        elif sort_by == 'score_asc':
-            query = query.order_by((QuizAttempt.score * 100.0 / QuizAttempt.total_questions).asc())
-        else:  # date_desc (default)
-            query = query.order_by(QuizAttempt.completed_at.desc())
-        
-        # Paginate
-        paginated_attempts = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
+        try:
+            attempts, next_cursor = score_history_page(query, sort_by, decode_cursor(cursor) if cursor else None, per_page)
+        except (TypeError, ValueError, IndexError, KeyError):
+            return jsonify({'error': 'Invalid cursor'}), 400
         
         # Format results
+        hierarchy = get_quiz_hierarchy([attempt.quiz_id for attempt in attempts])
         attempts_list = []
-        for attempt in paginated_attempts.items:
-            quiz = Quiz.query.get(attempt.quiz_id)
-            chapter = Chapter.query.get(quiz.chapter_id) if quiz else None
-            subject = Subject.query.get(chapter.subject_id) if chapter else None
+        for attempt in attempts:
+            quiz = hierarchy.get(attempt.quiz_id)
             
             attempts_list.append({
                 'id': attempt.id,
                 'quiz_id': attempt.quiz_id,
-                'quiz_title': quiz.title if quiz else 'Unknown Quiz',
-                'subject_name': subject.name if subject else 'Unknown Subject',
-                'chapter_name': chapter.name if chapter else 'Unknown Chapter',
+                'quiz_title': quiz['quiz_title'] if quiz else 'Unknown Quiz',
+                'subject_name': (quiz['subject_name'] if quiz else None) or 'Unknown Subject',
+                'chapter_name': (quiz['chapter_name'] if quiz else None) or 'Unknown Chapter',
                 'score': attempt.score,
                 'total_questions': attempt.total_questions,
                 'percentage': round((attempt.score / attempt.total_questions * 100), 1) if attempt.total_questions > 0 else 0,
@@ -2343,22 +2854,19 @@ def get_user_scores():
                 'completed_at': attempt.completed_at.isoformat() if attempt.completed_at else None
             })
         
-        # Calculate statistics
-        all_attempts = QuizAttempt.query.filter_by(
-            user_id=user_id
-        ).filter(
-            QuizAttempt.completed_at.isnot(None)
-        ).all()
-        
-        total_attempts = len(all_attempts)
-        if total_attempts > 0:
-            scores = [round((a.score / a.total_questions * 100), 1) for a in all_attempts if a.total_questions > 0]
-            average_score = round(sum(scores) / len(scores), 1) if scores else 0
-            best_score = max(scores) if scores else 0
+        if stats and stats.attempts > 0:
+            average_score = round(stats.pct_sum / stats.attempts, 1)
+            best_score = round(stats.best_pct, 1)
             
             # Calculate improvement trend (last 5 vs previous 5)
-            recent_scores = scores[:5] if len(scores) >= 5 else scores
-            older_scores = scores[5:10] if len(scores) >= 10 else scores[len(recent_scores):]
+            latest_attempts = db.session.query(QuizAttempt.score, QuizAttempt.total_questions).filter(
+                QuizAttempt.user_id == user_id,
+                QuizAttempt.completed_at.isnot(None),
+                QuizAttempt.total_questions > 0
+            ).order_by(QuizAttempt.completed_at.desc()).limit(10).all()
+            scores = [round((a.score / a.total_questions * 100), 1) for a in latest_attempts]
+            recent_scores = scores[:5]
+            older_scores = scores[5:]
             
             if len(older_scores) > 0:
                 recent_avg = sum(recent_scores) / len(recent_scores)
@@ -2374,15 +2882,13 @@ def get_user_scores():
         return jsonify({
             'attempts': attempts_list,
             'pagination': {
-                'page': page,
                 'per_page': per_page,
-                'total': paginated_attempts.total,
-                'pages': paginated_attempts.pages,
-                'has_next': paginated_attempts.has_next,
-                'has_prev': paginated_attempts.has_prev
+                'total': total,
+                'has_next': next_cursor is not None,
+                'next_cursor': next_cursor
             },
             'statistics': {
-                'total_attempts': total_attempts,
+                'total_attempts': stats.attempts if stats else 0,
                 'average_score': average_score,
                 'best_score': best_score,
                 'improvement_trend': trend
@@ -2393,6 +2899,27 @@ def get_user_scores():
         print(f"User scores error: {str(e)}")
         return jsonify({'error': 'Failed to fetch user scores'}), 500
 
+@app.cli.command('backfill-rollups')
+def backfill_rollups_command():
+    """Recompute the analytics rollup tables from the quiz_attempt table"""
+    analytics_rollups.backfill()
+    db.session.commit()
+    print(f"Backfilled rollups for {UserStats.query.count()} users")
+
+@app.cli.command('backfill-achievements')
+def backfill_achievements_command():
+    """Unlock achievements earned by existing attempts, dated by the attempt that earned them"""
+    unlocked = achievement_service.backfill()
+    db.session.commit()
+    print(f"Backfilled {unlocked} achievement unlocks")
+
+@app.cli.command('rebuild-leaderboards')
+def rebuild_leaderboards_command():
+    """Recompute the Redis leaderboards from the quiz_attempt table"""
+    ranked = leaderboard_service.rebuild()
+    invalidate_rankings()
+    print(f"Rebuilt leaderboards for {ranked} users")
+
 if __name__ == '__main__':
     init_db()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Analytics Engine Benchmark
+
+Compares the attempt analytics backends on a synthetic dataset:
+1. SQL over quiz_attempt (what date-range queries run)
+2. SQL over the rollup tables (what the all-time admin overview runs)
+3. The columnar NumPy snapshot (cold load, incremental refresh and queries)
+
+The data goes into a throwaway SQLite database, so nothing touches the real one:
+    python benchmark_analytics.py --attempts 1000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'benchmark_analytics.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+
+from app import (app, db, User, Subject, Chapter, Quiz, QuizAttempt,  # noqa: E402
+                 analytics_rollups)
+from models.analytics import SQLAttemptAnalytics, ColumnarAttemptAnalytics  # noqa: E402
+
+
+def setup_data(n_attempts, n_users, n_subjects, quizzes_per_subject, days):
+    """Create users, a subject/chapter/quiz hierarchy and n_attempts completed attempts"""
+    db.create_all()
+    db.session.execute(db.insert(User), [
+        {'username': f"bench_{i}", 'email': f"bench_{i}@example.com", 'password_hash': '-'}
+        for i in range(n_users)
+    ])
+    quiz_ids = []
+    for s in range(n_subjects):
+        subject = Subject(name=f"Subject {s}")
+        db.session.add(subject)
+        db.session.flush()
+        chapter = Chapter(name=f"Chapter {s}", subject_id=subject.id)
+        db.session.add(chapter)
+        db.session.flush()
+        for q in range(quizzes_per_subject):
+            quiz = Quiz(title=f"Quiz {s}.{q}", chapter_id=chapter.id)
+            db.session.add(quiz)
+            db.session.flush()
+            quiz_ids.append(quiz.id)
+    user_ids = [user_id for (user_id,) in db.session.query(User.id).all()]
+
+    now = datetime.utcnow()
+    rng = random.Random(42)
+    batch = []
+    for _ in range(n_attempts):
+        completed_at = now - timedelta(seconds=rng.randrange(days * 86400))
+        total_questions = rng.choice((10, 15, 20))
+        batch.append({
+            'user_id': rng.choice(user_ids),
+            'quiz_id': rng.choice(quiz_ids),
+            'score': rng.randint(0, total_questions),
+            'total_questions': total_questions,
+            'time_taken': rng.randint(60, 1800),
+            'started_at': completed_at - timedelta(minutes=10),
+            'completed_at': completed_at
+        })
+        if len(batch) == 50000:
+            db.session.execute(db.insert(QuizAttempt), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(QuizAttempt), batch)
+    db.session.commit()
+
+    analytics_rollups.backfill()
+    db.session.commit()
+    return quiz_ids, user_ids
+
+
+def comparable(result):
+    """Reduce a result to what both backends must agree on: float sums up to rounding,
+    and no best score (the subject rollup does not carry one)"""
+    if isinstance(result, dict):
+        return tuple(round(value, 6) if isinstance(value, float) else value
+                     for key, value in sorted(result.items()) if key != 'best_pct')
+    if isinstance(result, list):
+        return sorted(comparable(row) for row in result)
+    return result
+
+
+def timed(label, func, repeat):
+    """Run func repeat times and print the best wall time"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<28} {best * 1000:>10.1f} ms")
+    return result
+
+
+def run_queries(engine, since, far_past, repeat):
+    """The queries the admin overview, monthly report and CSV export issue"""
+    now = datetime.utcnow()
+    return {
+        'totals': timed('totals()', lambda: engine.totals(), repeat),
+        'totals_range': timed('totals(range)', lambda: engine.totals(far_past, now), repeat),
+        'subjects': timed("group_totals('subject')", lambda: engine.group_totals('subject'), repeat),
+        'subjects_range': timed("group_totals('subject', range)",
+                                lambda: engine.group_totals('subject', far_past, now), repeat),
+        # Users tied at the cut-off may differ between backends, so compare the ranked values
+        'top_users': [row['attempts'] for row in timed(
+            "top('user', 'attempts')", lambda: engine.top('user', 'attempts', 10), repeat)],
+        'top_scores': [round(row['pct_sum'] / row['attempts'], 6) for row in timed(
+            "top('user', 'avg_percentage')", lambda: engine.top('user', 'avg_percentage', 10), repeat)],
+        'active': timed('active_users(7 days)', lambda: engine.active_users(since), repeat),
+        'daily': timed('daily_counts(30 days)', lambda: engine.daily_counts(now - timedelta(days=30)), repeat)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the attempt analytics backends')
+    parser.add_argument('--attempts', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--subjects', type=int, default=20)
+    parser.add_argument('--quizzes-per-subject', type=int, default=25)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("Attempt Analytics Benchmark")
+    print("=" * 50)
+    with app.app_context():
+        start = time.perf_counter()
+        setup_data(args.attempts, args.users, args.subjects, args.quizzes_per_subject, args.days)
+        print(f"Seeded {args.attempts} attempts into {DB_PATH} in {time.perf_counter() - start:.1f}s")
+
+        since = datetime.utcnow() - timedelta(days=7)
+        far_past = datetime.utcnow() - timedelta(days=args.days + 1)
+
+        print("\nSQL (rollups without a range, quiz_attempt with one)")
+        sql_results = run_queries(SQLAttemptAnalytics(db), since, far_past, args.repeat)
+
+        print("\nColumnar (NumPy snapshot)")
+        columnar = ColumnarAttemptAnalytics(db)
+        timed('cold load', lambda: columnar.refresh(force=True), 1)
+        db.session.add(QuizAttempt(user_id=1, quiz_id=1, score=5, total_questions=10,
+                                   completed_at=datetime.utcnow()))
+        db.session.commit()
+        timed('incremental refresh (+1)', lambda: columnar.refresh(force=True), 1)
+        db.session.query(QuizAttempt).filter(QuizAttempt.id > args.attempts).delete()
+        db.session.commit()
+        columnar.invalidate()
+        columnar.refresh(force=True)
+        columnar_results = run_queries(columnar, since, far_past, args.repeat)
+
+    mismatched = [name for name in sql_results if comparable(sql_results[name]) != comparable(columnar_results[name])]
+    if mismatched:
+        print(f"\n⚠ Backends disagree on: {', '.join(mismatched)}")
+    else:
+        print("\n✓ Both backends returned identical results")
+
+
+if __name__ == '__main__':
+    main()
@@ -20,6 +20,15 @@ task_routes = {
     'tasks.send_daily_reminder': {'queue': 'reminders'},
     'tasks.generate_monthly_report': {'queue': 'reports'},
     'tasks.export_quiz_data_csv': {'queue': 'exports'},
+    'tasks.regrade_quiz_attempts': {'queue': 'grading'},
+    'tasks.flush_submission_stream': {'queue': 'grading'},
+    'tasks.finalize_abandoned_attempts': {'queue': 'grading'},
+    'tasks.prewarm_upcoming_quizzes': {'queue': 'grading'},
+    'tasks.refresh_available_quizzes': {'queue': 'grading'},
+    'tasks.reconcile_community_stats': {'queue': 'grading'},
+    'tasks.rebuild_leaderboards': {'queue': 'grading'},
+    'tasks.rebuild_user_stats': {'queue': 'grading'},
+    'tasks.backfill_achievements': {'queue': 'grading'},
 }
 
 # Worker settings
@@ -18,6 +18,37 @@ class Config:
     CACHE_TYPE = 'redis'
     CACHE_REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/1'
     
+    # Quiz submission write-behind (acknowledge from Redis, persist in batches via Celery)
+    SUBMIT_WRITE_BEHIND = os.environ.get('SUBMIT_WRITE_BEHIND', 'false').lower() == 'true'
+    # Submits and autosaves arriving this long after the deadline are still graded (timers, latency)
+    SUBMIT_GRACE_SECONDS = int(os.environ.get('SUBMIT_GRACE_SECONDS') or 30)
+    
+    # Admission control for scheduled quiz starts (waiting room in Redis, opt-in)
+    ADMISSION_CONTROL_ENABLED = os.environ.get('ADMISSION_CONTROL_ENABLED', 'false').lower() == 'true'
+    ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT') or 50)
+    ADMISSION_RATE = int(os.environ.get('ADMISSION_RATE') or 25)  # starts per second, for ETAs
+    ADMISSION_MAX_WAIT = int(os.environ.get('ADMISSION_MAX_WAIT') or 60)  # seconds
+    
+    # Warm caches of quizzes starting within this many minutes (Celery beat)
+    PREWARM_WINDOW_MINUTES = int(os.environ.get('PREWARM_WINDOW_MINUTES') or 10)
+    
+    # Shared leaderboard top-N cache (the caller's own rank is always looked up live)
+    LEADERBOARD_CACHE_TIMEOUT = int(os.environ.get('LEADERBOARD_CACHE_TIMEOUT') or 30)  # seconds
+    
+    # Analytics engine: 'sql' (rollup tables) or 'columnar' (in-memory NumPy snapshot)
+    ANALYTICS_BACKEND = os.environ.get('ANALYTICS_BACKEND') or 'sql'
+    ANALYTICS_FANOUT_WORKERS = int(os.environ.get('ANALYTICS_FANOUT_WORKERS') or 4)
+    ANALYTICS_SECTION_TIMEOUT = float(os.environ.get('ANALYTICS_SECTION_TIMEOUT') or 5)  # seconds per section
+    
+    # Browser caching of completed attempt details (ETag-validated; re-grades reach browsers after this)
+    ATTEMPT_DETAIL_MAX_AGE = int(os.environ.get('ATTEMPT_DETAIL_MAX_AGE') or 86400)  # seconds
+    
+    # Timezone whose calendar days count towards daily streaks (IANA name)
+    STREAK_TIMEZONE = os.environ.get('STREAK_TIMEZONE') or 'UTC'
+    
+    # Rate limiting (disable only for local load tests)
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'true').lower() == 'true'
+    
     # Celery Configuration
     broker_url = os.environ.get('CELERY_BROKER_URL') or 'redis://localhost:6379/0'
     result_backend = os.environ.get('CELERY_RESULT_BACKEND') or 'redis://localhost:6379/0'
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Flash-Crowd Load Test for Scheduled Quiz Starts
+
+Simulates every enrolled user calling /api/user/quiz/<id>/start at the same
+moment a scheduled quiz opens, and reports how the admission gate behaves:
+1. Time until every user was admitted (must be before the quiz closes)
+2. Latency percentiles of the start requests
+3. How many waiting-room responses (429) users received
+
+Start the API with rate limiting disabled so a single IP can play all users:
+    RATELIMIT_ENABLED=false python app.py
+Then run:
+    python load_test_quiz_start.py --users 500
+"""
+
+import argparse
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+from app import (app, db, User, Subject, Chapter, Quiz, Question, QuizAttempt,
+                 invalidate_quiz_caches, invalidate_subject_caches)
+from flask_jwt_extended import create_access_token
+
+BASE_URL = 'http://localhost:5000/api'
+
+
+def setup_quiz(n_users, starts_in, duration_minutes):
+    """Create load-test users and a scheduled quiz directly in the database"""
+    with app.app_context():
+        subject = Subject(name='Load Test', description='Flash-crowd load test')
+        db.session.add(subject)
+        db.session.flush()
+        chapter = Chapter(name='Load Test', subject_id=subject.id)
+        db.session.add(chapter)
+        db.session.flush()
+        quiz = Quiz(
+            title=f"Load Test {datetime.utcnow():%H:%M:%S}",
+            chapter_id=chapter.id,
+            duration_minutes=duration_minutes,
+            start_time=datetime.utcnow() + timedelta(seconds=starts_in)
+        )
+        db.session.add(quiz)
+        db.session.flush()
+        for i in range(20):
+            db.session.add(Question(
+                text=f"Load test question {i + 1}",
+                option_a='A', option_b='B', option_c='C', option_d='D',
+                correct_option='a', quiz_id=quiz.id
+            ))
+
+        tokens = []
+        for i in range(n_users):
+            username = f"loadtest_{i}"
+            user = User.query.filter_by(username=username).first()
+            if not user:
+                user = User(username=username, email=f"{username}@example.com", password_hash='-')
+                db.session.add(user)
+                db.session.flush()
+            tokens.append(create_access_token(identity=str(user.id), additional_claims={'role': 'user'}))
+
+        db.session.commit()
+        # Written behind the API's back, so bump the schedule and listing versions it would have
+        invalidate_subject_caches(subject.id)
+        invalidate_quiz_caches(quiz.id)
+        return quiz.id, quiz.start_time, tokens
+
+
+def start_until_admitted(quiz_id, token, results, deadline):
+    """Call the start endpoint, honouring Retry-After, until admitted or the quiz closes"""
+    headers = {'Authorization': f'Bearer {token}'}
+    waits = 0
+    first_call = time.perf_counter()
+    latencies = []
+
+    while time.perf_counter() < deadline:
+        request_start = time.perf_counter()
+        response = requests.post(f"{BASE_URL}/user/quiz/{quiz_id}/start", headers=headers)
+        latencies.append((time.perf_counter() - request_start) * 1000)
+
+        if response.status_code == 429:
+            waits += 1
+            time.sleep(float(response.headers.get('Retry-After', 1)))
+            continue
+
+        results.append({
+            'status': response.status_code,
+            'waits': waits,
+            'admitted_after': time.perf_counter() - first_call,
+            'latencies': latencies
+        })
+        return
+
+    results.append({'status': None, 'waits': waits, 'admitted_after': None, 'latencies': latencies})
+
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Flash-crowd load test for scheduled quiz starts')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--starts-in', type=int, default=10, help='seconds until the quiz opens')
+    parser.add_argument('--duration', type=int, default=5, help='quiz duration in minutes')
+    args = parser.parse_args()
+
+    print("Scheduled Quiz Start Load Test")
+    print("=" * 50)
+    quiz_id, start_time, tokens = setup_quiz(args.users, args.starts_in, args.duration)
+    print(f"Quiz {quiz_id} opens at {start_time.isoformat()} with {len(tokens)} users")
+
+    # Everyone fires at the scheduled start time
+    time.sleep(max(0, (start_time - datetime.utcnow()).total_seconds()))
+    deadline = time.perf_counter() + args.duration * 60
+
+    results = []
+    threads = [
+        threading.Thread(target=start_until_admitted, args=(quiz_id, token, results, deadline))
+        for token in tokens
+    ]
+    burst_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total_time = time.perf_counter() - burst_start
+
+    admitted = [r for r in results if r['status'] == 200]
+    latencies = [latency for r in results for latency in r['latencies']]
+    admit_times = [r['admitted_after'] for r in admitted]
+
+    print(f"\nAdmitted: {len(admitted)}/{len(results)} in {total_time:.2f}s")
+    print(f"Other responses: {sorted(set(r['status'] for r in results if r['status'] != 200), key=str)}")
+    print(f"Waiting-room responses: {sum(r['waits'] for r in results)}")
+    print(f"Request latency p50/p95/p99: {percentile(latencies, 50):.1f} / "
+          f"{percentile(latencies, 95):.1f} / {percentile(latencies, 99):.1f} ms")
+    print(f"Time to admission p50/p95/max: {percentile(admit_times, 50):.2f} / "
+          f"{percentile(admit_times, 95):.2f} / {max(admit_times or [0]):.2f} s")
+
+    with app.app_context():
+        created = QuizAttempt.query.filter_by(quiz_id=quiz_id).count()
+    print(f"Attempts created: {created}")
+
+    if len(admitted) == len(results):
+        print("✓ Every user got in before the quiz window closed")
+    else:
+        print("⚠ Some users were not admitted before the quiz window closed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Achievements Module for Quiz Master V2
+Declarative achievement rules over the per-user statistics counters, evaluated
+for the users whose attempts just completed; unlocks are persisted with the time
+of the attempt that earned them
+"""
+
+from collections import defaultdict
+
+from models.streaks import NO_STREAK, extend_streak, local_day, streak_zone
+
+
+class Achievement:
+    """A rule unlocked once metric reaches target (and the user has min_attempts attempts)"""
+
+    def __init__(self, id, title, description, icon, color, metric, target, min_attempts=0):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.icon = icon
+        self.color = color
+        self.metric = metric
+        self.target = target
+        self.min_attempts = min_attempts
+
+    def is_met(self, metrics):
+        return metrics['attempts'] >= self.min_attempts and metrics[self.metric] >= self.target
+
+    def progress(self, metrics):
+        """Percentage of the way to unlocking, 0 while the attempt requirement is unmet"""
+        if metrics['attempts'] < self.min_attempts:
+            return 0
+        return round(min(metrics[self.metric] / self.target, 1) * 100, 1)
+
+
+ACHIEVEMENTS = [
+    Achievement('first_quiz', 'Getting Started', 'Complete your first quiz',
+                'fas fa-play-circle', '#28a745', 'attempts', 1),
+    Achievement('quiz_master', 'Quiz Master', 'Complete 10 quizzes',
+                'fas fa-graduation-cap', '#007bff', 'attempts', 10),
+    Achievement('perfectionist', 'Perfectionist', 'Score 100% on a quiz',
+                'fas fa-star', '#ffc107', 'perfect_scores', 1),
+    Achievement('high_achiever', 'High Achiever', 'Maintain 80% average score',
+                'fas fa-trophy', '#fd7e14', 'avg_percentage', 80, min_attempts=5),
+    Achievement('dedicated_learner', 'Dedicated Learner', 'Complete quizzes for 7 consecutive days',
+                'fas fa-calendar-check', '#6f42c1', 'current_streak', 7),
+    Achievement('subject_explorer', 'Subject Explorer', 'Complete quizzes in 3 different subjects',
+                'fas fa-compass', '#20c997', 'unique_subjects', 3),
+    Achievement('speed_demon', 'Speed Demon', 'Complete 25 quizzes',
+                'fas fa-bolt', '#e83e8c', 'attempts', 25),
+    Achievement('perfectionist_pro', 'Perfectionist Pro', 'Score 100% on 5 quizzes',
+                'fas fa-crown', '#ffd700', 'perfect_scores', 5),
+]
+
+
+def metrics_from_stats(stats):
+    """The values achievement rules are written against, from a UserStats record (or None)"""
+    if stats is None:
+        return {'attempts': 0, 'perfect_scores': 0, 'avg_percentage': 0, 'current_streak': 0, 'unique_subjects': 0}
+    return {
+        'attempts': stats.attempts,
+        'perfect_scores': stats.perfect_count,
+        'avg_percentage': (stats.score_sum / stats.questions_sum * 100) if stats.questions_sum > 0 else 0,
+        'current_streak': stats.current_streak(),
+        'unique_subjects': stats.subject_count
+    }
+
+
+class AchievementService:
+    """Service class that unlocks achievements from the per-user statistics records"""
+
+    def __init__(self, db, achievements=ACHIEVEMENTS):
+        self.db = db
+        self.achievements = achievements
+
+    def _unlocked_ids(self, user_ids=None):
+        """Ids of the achievements each user already unlocked, for some or all users"""
+        from app import UserAchievement
+
+        query = self.db.session.query(UserAchievement.user_id, UserAchievement.achievement_id)
+        if user_ids is not None:
+            query = query.filter(UserAchievement.user_id.in_(user_ids))
+        unlocked = defaultdict(set)
+        for user_id, achievement_id in query.all():
+            unlocked[user_id].add(achievement_id)
+        return unlocked
+
+    def _insert(self, rows):
+        """Insert unlocks, skipping any a concurrent evaluation already recorded"""
+        from app import UserAchievement
+
+        if not rows:
+            return
+        table = UserAchievement.__table__
+        dialect = self.db.engine.dialect.name
+
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(table).on_conflict_do_nothing(index_elements=['user_id', 'achievement_id'])
+            self.db.session.execute(stmt, rows)
+            return
+
+        # Other databases: insert only the unlocks that are not there yet
+        existing = self._unlocked_ids({row['user_id'] for row in rows})
+        rows = [row for row in rows if row['achievement_id'] not in existing[row['user_id']]]
+        if rows:
+            self.db.session.execute(self.db.insert(table), rows)
+
+    def evaluate(self, attempts):
+        """
+        Unlock whatever the users of newly completed attempts now qualify for. Call after
+        the rollups took the attempts in, inside the same transaction (caller commits).
+        """
+        from app import UserStats
+
+        completed_at = {}
+        for attempt in attempts:
+            if attempt.completed_at and attempt.total_questions:
+                completed_at[attempt.user_id] = max(completed_at.get(attempt.user_id, attempt.completed_at),
+                                                    attempt.completed_at)
+        if not completed_at:
+            return []
+
+        # The rollups updated the records in SQL, so reload rather than trust the identity map
+        stats = self.db.session.query(UserStats).filter(
+            UserStats.user_id.in_(completed_at)
+        ).execution_options(populate_existing=True).all()
+        unlocked = self._unlocked_ids(list(completed_at))
+
+        rows = []
+        for record in stats:
+            metrics = metrics_from_stats(record)
+            for achievement in self.achievements:
+                if achievement.id not in unlocked[record.user_id] and achievement.is_met(metrics):
+                    rows.append({'user_id': record.user_id, 'achievement_id': achievement.id,
+                                 'unlocked_at': completed_at[record.user_id]})
+        self._insert(rows)
+        return rows
+
+    def backfill(self):
+        """
+        Replay every user's completed attempts in order and unlock what they earned along
+        the way, dated by the attempt that earned it. Existing unlocks are kept (caller commits).
+        """
+        from app import QuizAttempt, Quiz, Chapter
+
+        db = self.db
+        history = db.session.query(
+            QuizAttempt.user_id, QuizAttempt.score, QuizAttempt.total_questions,
+            QuizAttempt.completed_at, Chapter.subject_id
+        ).outerjoin(
+            Quiz, QuizAttempt.quiz_id == Quiz.id
+        ).outerjoin(
+            Chapter, Quiz.chapter_id == Chapter.id
+        ).filter(
+            QuizAttempt.completed_at.isnot(None), QuizAttempt.total_questions > 0
+        ).order_by(QuizAttempt.user_id, QuizAttempt.completed_at, QuizAttempt.id)
+
+        unlocked = self._unlocked_ids()
+        zone = streak_zone()
+        rows, user_id = [], None
+        for attempt in history.yield_per(1000):
+            if attempt.user_id != user_id:
+                user_id = attempt.user_id
+                attempts = perfect = score_sum = questions_sum = 0
+                streak, subjects = NO_STREAK, set()
+
+            attempts += 1
+            perfect += attempt.score == attempt.total_questions
+            score_sum += attempt.score
+            questions_sum += attempt.total_questions
+            if attempt.subject_id is not None:
+                subjects.add(attempt.subject_id)
+            streak = extend_streak(streak, local_day(attempt.completed_at, zone))
+
+            metrics = {
+                'attempts': attempts,
+                'perfect_scores': perfect,
+                'avg_percentage': score_sum / questions_sum * 100,
+                'current_streak': streak[1],
+                'unique_subjects': len(subjects)
+            }
+            for achievement in self.achievements:
+                if achievement.id not in unlocked[user_id] and achievement.is_met(metrics):
+                    unlocked[user_id].add(achievement.id)
+                    rows.append({'user_id': user_id, 'achievement_id': achievement.id,
+                                 'unlocked_at': attempt.completed_at})
+        self._insert(rows)
+        return len(rows)
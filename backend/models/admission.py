@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Admission Control Module for Quiz Master V2
+Bounded concurrency gate with a Redis-backed waiting room that smooths the burst
+of starts at a scheduled quiz's start_time
+"""
+
+import math
+import time
+
+# KEYS: in-flight counter, waiting room (member -> arrival time), last poll (member -> time)
+# ARGV: user, now, max_concurrent, slot_ttl, stale_after, max_wait, bypass
+ACQUIRE_SCRIPT = """
+local user = ARGV[1]
+local now = tonumber(ARGV[2])
+
+redis.call('ZADD', KEYS[2], 'NX', now, user)
+redis.call('ZADD', KEYS[3], now, user)
+
+-- Drop waiters that stopped polling so they do not hold up the queue
+local stale = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now - tonumber(ARGV[5]), 'LIMIT', 0, 100)
+for _, member in ipairs(stale) do
+    redis.call('ZREM', KEYS[2], member)
+    redis.call('ZREM', KEYS[3], member)
+end
+redis.call('EXPIRE', KEYS[2], 3600)
+redis.call('EXPIRE', KEYS[3], 3600)
+
+local rank = redis.call('ZRANK', KEYS[2], user)
+local free = tonumber(ARGV[3]) - tonumber(redis.call('GET', KEYS[1]) or '0')
+local waited = now - tonumber(redis.call('ZSCORE', KEYS[2], user))
+
+if rank < free or ARGV[7] == '1' or waited >= tonumber(ARGV[6]) then
+    redis.call('ZREM', KEYS[2], user)
+    redis.call('ZREM', KEYS[3], user)
+    redis.call('INCR', KEYS[1])
+    redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+    return {1, 0}
+end
+
+return {0, rank - math.max(free, 0) + 1}
+"""
+
+RELEASE_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') > 0 then
+    return redis.call('DECR', KEYS[1])
+end
+return 0
+"""
+
+
+class AdmissionGate:
+    """Per-quiz concurrency gate: admits up to max_concurrent starts at a time, queues the rest"""
+
+    def __init__(self, redis_client, max_concurrent=50, admit_rate=25, max_wait=60,
+                 bypass_seconds=60, slot_ttl=30, stale_after=15):
+        self.redis_client = redis_client
+        self.max_concurrent = max_concurrent
+        self.admit_rate = admit_rate  # Starts per second the backend sustains, used for ETAs
+        self.max_wait = max_wait  # Nobody waits longer than this
+        self.bypass_seconds = bypass_seconds  # Gate opens fully this close to the quiz end
+        self.slot_ttl = slot_ttl  # Safety expiry for slots leaked by crashed requests
+        self.stale_after = stale_after  # Waiters that stop polling lose their place
+        self._acquire_script = redis_client.register_script(ACQUIRE_SCRIPT)
+        self._release_script = redis_client.register_script(RELEASE_SCRIPT)
+
+    def _get_keys(self, quiz_id):
+        prefix = f"admission:{quiz_id}"
+        return [f"{prefix}:inflight", f"{prefix}:queue", f"{prefix}:seen"]
+
+    def try_acquire(self, quiz_id, user_id, remaining_time=None):
+        """
+        Try to take a start slot. Returns {'admitted': True} or the caller's
+        waiting-room position with an ETA and a suggested retry delay.
+        """
+        bypass = remaining_time is not None and remaining_time <= self.bypass_seconds
+        admitted, position = self._acquire_script(
+            keys=self._get_keys(quiz_id),
+            args=[user_id, time.time(), self.max_concurrent, self.slot_ttl,
+                  self.stale_after, self.max_wait, '1' if bypass else '0']
+        )
+        if admitted:
+            return {'admitted': True}
+
+        eta_seconds = min(math.ceil(position / self.admit_rate), self.max_wait)
+        return {
+            'admitted': False,
+            'position': int(position),
+            'eta_seconds': eta_seconds,
+            'retry_after': max(1, min(eta_seconds, self.stale_after // 3))
+        }
+
+    def release(self, quiz_id):
+        """Give a start slot back once the request finished"""
+        self._release_script(keys=self._get_keys(quiz_id)[:1])
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Attempt Analytics Module for Quiz Master V2
+Aggregates over completed quiz attempts for the analytics views, either from SQL
+(rollup tables, or quiz_attempt for a date range) or from a columnar in-memory
+snapshot of attempts held as NumPy arrays
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+GROUP_KEYS = ('user', 'quiz', 'chapter', 'subject')
+EPOCH = datetime(1970, 1, 1)
+
+
+def _timestamp(moment):
+    return int((moment - EPOCH).total_seconds())
+
+
+class SQLAttemptAnalytics:
+    """Attempt aggregates read from the rollup tables, or from quiz_attempt when a date range is given"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def refresh(self):
+        pass
+
+    def invalidate(self):
+        pass
+
+    def _rollup_model(self, key):
+        from app import SubjectAttemptRollup, QuizAttemptRollup, UserStats
+        return {
+            'user': (UserStats, 'user_id'),
+            'quiz': (QuizAttemptRollup, 'quiz_id'),
+            'subject': (SubjectAttemptRollup, 'subject_id')
+        }.get(key, (None, None))
+
+    def _group_query(self, key, start=None, end=None):
+        """Grouped aggregate query labelled id, attempts, pct_sum, score_sum, questions_sum, best_pct"""
+        from app import QuizAttempt, Quiz, Chapter
+
+        db = self.db
+        model, id_column = self._rollup_model(key)
+        if model is not None and start is None and end is None:
+            best = model.best_pct if hasattr(model, 'best_pct') else db.null()
+            return db.session.query(
+                getattr(model, id_column).label('id'),
+                model.attempts.label('attempts'),
+                model.pct_sum.label('pct_sum'),
+                model.score_sum.label('score_sum'),
+                model.questions_sum.label('questions_sum'),
+                best.label('best_pct')
+            ).filter(model.attempts > 0)
+
+        percentage = QuizAttempt.score * 100.0 / QuizAttempt.total_questions
+        group_column = {
+            'user': QuizAttempt.user_id,
+            'quiz': QuizAttempt.quiz_id,
+            'chapter': Quiz.chapter_id,
+            'subject': Chapter.subject_id
+        }[key]
+        query = db.session.query(
+            group_column.label('id'),
+            db.func.count(QuizAttempt.id).label('attempts'),
+            db.func.sum(percentage).label('pct_sum'),
+            db.func.sum(QuizAttempt.score).label('score_sum'),
+            db.func.sum(QuizAttempt.total_questions).label('questions_sum'),
+            db.func.max(percentage).label('best_pct')
+        )
+        if key in ('chapter', 'subject'):
+            query = query.join(Quiz, QuizAttempt.quiz_id == Quiz.id)
+        if key == 'subject':
+            query = query.join(Chapter, Quiz.chapter_id == Chapter.id)
+        return self._filter_completed(query, start, end).group_by(group_column)
+
+    def _filter_completed(self, query, start=None, end=None):
+        from app import QuizAttempt
+
+        query = query.filter(QuizAttempt.completed_at.isnot(None), QuizAttempt.total_questions > 0)
+        if start is not None:
+            query = query.filter(QuizAttempt.completed_at >= start)
+        if end is not None:
+            query = query.filter(QuizAttempt.completed_at < end)
+        return query
+
+    @staticmethod
+    def _row(row):
+        return {
+            'id': row.id,
+            'attempts': int(row.attempts),
+            'pct_sum': float(row.pct_sum or 0),
+            'score_sum': int(row.score_sum or 0),
+            'questions_sum': int(row.questions_sum or 0),
+            'best_pct': float(row.best_pct) if row.best_pct is not None else None
+        }
+
+    def totals(self, start=None, end=None):
+        """Attempts, distinct users and sums of completed attempts, optionally in [start, end)"""
+        from app import QuizAttempt, DailyAttemptRollup, UserStats
+
+        db = self.db
+        if start is None and end is None:
+            attempts, pct_sum, score_sum, questions_sum = db.session.query(
+                db.func.sum(DailyAttemptRollup.attempts), db.func.sum(DailyAttemptRollup.pct_sum),
+                db.func.sum(DailyAttemptRollup.score_sum), db.func.sum(DailyAttemptRollup.questions_sum)
+            ).one()
+            users = UserStats.query.filter(UserStats.attempts > 0).count()
+        else:
+            attempts, users, pct_sum, score_sum, questions_sum = self._filter_completed(db.session.query(
+                db.func.count(QuizAttempt.id),
+                db.func.count(db.distinct(QuizAttempt.user_id)),
+                db.func.sum(QuizAttempt.score * 100.0 / QuizAttempt.total_questions),
+                db.func.sum(QuizAttempt.score),
+                db.func.sum(QuizAttempt.total_questions)
+            ), start, end).one()
+
+        return {
+            'attempts': int(attempts or 0),
+            'users': int(users or 0),
+            'pct_sum': float(pct_sum or 0),
+            'score_sum': int(score_sum or 0),
+            'questions_sum': int(questions_sum or 0)
+        }
+
+    def group_totals(self, key, start=None, end=None):
+        """Per-group sums for key in GROUP_KEYS; best_pct is only tracked per user without a range"""
+        return [self._row(row) for row in self._group_query(key, start, end).all()]
+
+    def top(self, key, by='attempts', limit=10, start=None, end=None):
+        """Top groups by attempt count or average percentage"""
+        query = self._group_query(key, start, end)
+        # Order by the aggregate expressions of the query's own columns
+        columns = {c['name']: c['expr'] for c in query.column_descriptions}
+        order = columns['attempts'] if by == 'attempts' else columns['pct_sum'] / columns['attempts']
+        return [self._row(row) for row in query.order_by(order.desc()).limit(limit).all()]
+
+    def active_users(self, since):
+        """Number of users with a completed attempt since the given time"""
+        from app import UserStats
+        return UserStats.query.filter(UserStats.last_completed_at >= since).count()
+
+    def daily_counts(self, since):
+        """[(date, attempts)] per whole day since the given time"""
+        from app import DailyAttemptRollup
+        return [(row.date, row.attempts) for row in DailyAttemptRollup.query.filter(
+            DailyAttemptRollup.date >= since.date()
+        ).order_by(DailyAttemptRollup.date).all()]
+
+
+class _Snapshot:
+    """Immutable set of attempt columns; refreshes build a new one and swap it in"""
+
+    COLUMNS = ('id', 'user_id', 'quiz_id', 'score', 'total_questions', 'time_taken', 'completed_at')
+
+    def __init__(self, columns, quiz_chapter, chapter_subject):
+        self.id = columns['id']
+        self.user_id = columns['user_id']
+        self.quiz_id = columns['quiz_id']
+        self.score = columns['score']
+        self.total_questions = columns['total_questions']
+        self.time_taken = columns['time_taken']  # NaN when unknown
+        self.completed_at = columns['completed_at']  # epoch seconds
+        # Attempts of deleted quizzes map to chapter 0 / subject 0
+        if self.quiz_id.size and self.quiz_id.max() >= quiz_chapter.size:
+            quiz_chapter = np.pad(quiz_chapter, (0, int(self.quiz_id.max()) + 1 - quiz_chapter.size))
+        if quiz_chapter.max(initial=0) >= chapter_subject.size:
+            chapter_subject = np.pad(chapter_subject, (0, int(quiz_chapter.max()) + 1 - chapter_subject.size))
+        # Derived once per snapshot
+        self.chapter_id = quiz_chapter[self.quiz_id]
+        self.subject_id = chapter_subject[self.chapter_id]
+        self.percentage = self.score * 100.0 / self.total_questions
+
+
+class ColumnarAttemptAnalytics:
+    """
+    Attempt aggregates computed vectorized over a columnar in-memory snapshot of
+    completed attempts, refreshed incrementally by attempt id
+    """
+
+    VERSION_KEY = 'analytics_columns:version'
+
+    def __init__(self, db, redis_client=None, refresh_interval=5, chunk_size=100000):
+        self.db = db
+        self.redis_client = redis_client
+        self.refresh_interval = refresh_interval  # Seconds between checks for new attempts
+        self.chunk_size = chunk_size
+        self._snapshot = None
+        self._max_id = 0
+        self._open_ids = set()  # Attempts seen while still in progress
+        self._loaded_version = None
+        self._local_version = 0  # Stands in for the shared version without Redis
+        self._refreshed_at = 0
+        self._lock = threading.Lock()
+
+    def _get_version(self):
+        if self.redis_client:
+            try:
+                version = self.redis_client.get(self.VERSION_KEY)
+                return int(version) if version else 0
+            except Exception as e:
+                print(f"Cache read error: {e}")
+        return self._local_version
+
+    def invalidate(self):
+        """Force every process to reload its snapshot, e.g. after scores changed in place"""
+        self._loaded_version = None
+        self._local_version += 1
+        self._refreshed_at = 0
+        if self.redis_client:
+            try:
+                self.redis_client.incr(self.VERSION_KEY)
+            except Exception as e:
+                print(f"Cache write error: {e}")
+
+    def _load_hierarchy(self):
+        """Lookup arrays quiz_id -> chapter_id and chapter_id -> subject_id (0 when unknown)"""
+        from app import Quiz, Chapter
+
+        quizzes = self.db.session.query(Quiz.id, Quiz.chapter_id).all()
+        chapters = self.db.session.query(Chapter.id, Chapter.subject_id).all()
+        quiz_chapter = np.zeros(max([quiz_id for quiz_id, _ in quizzes], default=0) + 1, dtype=np.int32)
+        chapter_subject = np.zeros(max([chapter_id for chapter_id, _ in chapters], default=0) + 1, dtype=np.int32)
+        for quiz_id, chapter_id in quizzes:
+            quiz_chapter[quiz_id] = chapter_id
+        for chapter_id, subject_id in chapters:
+            chapter_subject[chapter_id] = subject_id
+        return quiz_chapter, chapter_subject
+
+    def _fetch(self, condition):
+        """Read attempts matching condition in id-ordered chunks into column arrays"""
+        from app import QuizAttempt
+
+        db = self.db
+        chunks = []
+        last_id = 0
+        while True:
+            rows = db.session.query(
+                QuizAttempt.id, QuizAttempt.user_id, QuizAttempt.quiz_id, QuizAttempt.score,
+                QuizAttempt.total_questions, QuizAttempt.time_taken, QuizAttempt.completed_at
+            ).filter(condition, QuizAttempt.id > last_id).order_by(QuizAttempt.id).limit(self.chunk_size).all()
+            if not rows:
+                break
+            chunks.append(rows)
+            last_id = rows[-1].id
+            if len(rows) < self.chunk_size:
+                break
+
+        rows = [row for chunk in chunks for row in chunk]
+        completed = [row for row in rows if row.completed_at is not None and row.total_questions]
+        columns = {
+            'id': np.fromiter((r.id for r in completed), dtype=np.int64, count=len(completed)),
+            'user_id': np.fromiter((r.user_id for r in completed), dtype=np.int32, count=len(completed)),
+            'quiz_id': np.fromiter((r.quiz_id for r in completed), dtype=np.int32, count=len(completed)),
+            'score': np.fromiter((r.score for r in completed), dtype=np.int32, count=len(completed)),
+            'total_questions': np.fromiter((r.total_questions for r in completed), dtype=np.int32, count=len(completed)),
+            'time_taken': np.fromiter(
+                (r.time_taken if r.time_taken is not None else np.nan for r in completed),
+                dtype=np.float64, count=len(completed)
+            ),
+            'completed_at': np.fromiter((_timestamp(r.completed_at) for r in completed), dtype=np.int64, count=len(completed))
+        }
+        open_ids = {row.id for row in rows if row.completed_at is None}
+        max_id = rows[-1].id if rows else 0
+        return columns, open_ids, max_id
+
+    def refresh(self, force=False):
+        """Append attempts completed since the last refresh; reload fully when the version changed"""
+        from app import QuizAttempt
+
+        if not force and self._snapshot is not None and time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        with self._lock:
+            version = self._get_version()
+            hierarchy = self._load_hierarchy()
+
+            if self._snapshot is None or version != self._loaded_version:
+                columns, open_ids, max_id = self._fetch(QuizAttempt.id > 0)
+                self._open_ids = open_ids
+                self._max_id = max_id
+            else:
+                condition = QuizAttempt.id > self._max_id
+                if self._open_ids:
+                    condition = self.db.or_(condition, QuizAttempt.id.in_(self._open_ids))
+                # Previously open attempts are read again, so what is still open is exactly open_ids
+                new_columns, open_ids, max_id = self._fetch(condition)
+                self._open_ids = open_ids
+                self._max_id = max(self._max_id, max_id)
+                current = self._snapshot
+                columns = {
+                    name: np.concatenate([getattr(current, name), new_columns[name]])
+                    for name in _Snapshot.COLUMNS
+                }
+
+            self._snapshot = _Snapshot(columns, *hierarchy)
+            self._loaded_version = version
+            self._refreshed_at = time.monotonic()
+
+    def _current(self, start=None, end=None):
+        """The snapshot plus a boolean mask for [start, end), or None for all rows"""
+        self.refresh()
+        snapshot = self._snapshot
+        mask = None
+        if start is not None:
+            mask = snapshot.completed_at >= _timestamp(start)
+        if end is not None:
+            before_end = snapshot.completed_at < _timestamp(end)
+            mask = before_end if mask is None else mask & before_end
+        return snapshot, mask
+
+    def totals(self, start=None, end=None):
+        """Attempts, distinct users and sums of completed attempts, optionally in [start, end)"""
+        snapshot, mask = self._current(start, end)
+        select = (lambda column: column) if mask is None else (lambda column: column[mask])
+        users = select(snapshot.user_id)
+        return {
+            'attempts': int(users.size),
+            'users': int(np.unique(users).size),
+            'pct_sum': float(select(snapshot.percentage).sum()),
+            'score_sum': int(select(snapshot.score).sum()),
+            'questions_sum': int(select(snapshot.total_questions).sum())
+        }
+
+    def _group_arrays(self, key, start=None, end=None):
+        """Dense per-group arrays indexed by group id: attempts, pct_sum, score_sum, questions_sum, best_pct"""
+        snapshot, mask = self._current(start, end)
+        select = (lambda column: column) if mask is None else (lambda column: column[mask])
+        ids = select(getattr(snapshot, f"{key}_id"))
+        percentage = select(snapshot.percentage)
+
+        size = int(ids.max()) + 1 if ids.size else 0
+        best = np.full(size, -1.0)
+        np.maximum.at(best, ids, percentage)
+        return {
+            'attempts': np.bincount(ids, minlength=size),
+            'pct_sum': np.bincount(ids, weights=percentage, minlength=size),
+            'score_sum': np.bincount(ids, weights=select(snapshot.score), minlength=size),
+            'questions_sum': np.bincount(ids, weights=select(snapshot.total_questions), minlength=size),
+            'best_pct': best
+        }
+
+    @staticmethod
+    def _rows(groups, group_ids):
+        return [{
+            'id': int(group_id),
+            'attempts': int(groups['attempts'][group_id]),
+            'pct_sum': float(groups['pct_sum'][group_id]),
+            'score_sum': int(groups['score_sum'][group_id]),
+            'questions_sum': int(groups['questions_sum'][group_id]),
+            'best_pct': float(groups['best_pct'][group_id])
+        } for group_id in group_ids]
+
+    def group_totals(self, key, start=None, end=None):
+        """Per-group sums for key in GROUP_KEYS"""
+        groups = self._group_arrays(key, start, end)
+        return self._rows(groups, np.flatnonzero(groups['attempts']))
+
+    def top(self, key, by='attempts', limit=10, start=None, end=None):
+        """Top groups by attempt count or average percentage, via argpartition"""
+        groups = self._group_arrays(key, start, end)
+        group_ids = np.flatnonzero(groups['attempts'])
+        if by == 'attempts':
+            metric = groups['attempts'][group_ids].astype(np.float64)
+        else:
+            metric = groups['pct_sum'][group_ids] / groups['attempts'][group_ids]
+
+        if group_ids.size > limit:
+            candidates = np.argpartition(-metric, limit - 1)[:limit]
+        else:
+            candidates = np.arange(group_ids.size)
+        ordered = candidates[np.argsort(-metric[candidates], kind='stable')]
+        return self._rows(groups, group_ids[ordered])
+
+    def active_users(self, since):
+        """Number of users with a completed attempt since the given time"""
+        snapshot, mask = self._current(start=since)
+        return int(np.unique(snapshot.user_id[mask]).size)
+
+    def daily_counts(self, since):
+        """[(date, attempts)] per whole day since the given time, from a bincount over day offsets"""
+        midnight = datetime.combine(since.date(), datetime.min.time())
+        snapshot, mask = self._current(start=midnight)
+        first_day = _timestamp(midnight) // 86400
+        counts = np.bincount(snapshot.completed_at[mask] // 86400 - first_day)
+        return [
+            (since.date() + timedelta(days=int(offset)), int(counts[offset]))
+            for offset in np.flatnonzero(counts)
+        ]
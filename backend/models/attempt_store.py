@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Attempt Store Module for Quiz Master V2
+Keeps in-progress quiz attempts (metadata and autosaved answers) in Redis hashes
+that expire shortly after the attempt's deadline
+"""
+
+from datetime import datetime, timedelta
+
+
+class AttemptStore:
+    """Redis-backed store of in-progress attempts, keyed by attempt id"""
+
+    def __init__(self, redis_client=None, grace_seconds=3600):
+        self.redis_client = redis_client
+        self.grace_seconds = grace_seconds  # Keep answers around long enough for the sweeper
+
+    def _get_meta_key(self, attempt_id):
+        return f"attempt:{attempt_id}:meta"
+
+    def _get_answers_key(self, attempt_id):
+        return f"attempt:{attempt_id}:answers"
+
+    def _expire_at(self, deadline):
+        return int((deadline + timedelta(seconds=self.grace_seconds) - datetime(1970, 1, 1)).total_seconds())
+
+    def open(self, attempt_id, user_id, quiz_id, deadline):
+        """Register a started attempt so autosaves can be validated without the database"""
+        if not self.redis_client:
+            return
+        try:
+            meta_key = self._get_meta_key(attempt_id)
+            pipe = self.redis_client.pipeline()
+            pipe.hset(meta_key, mapping={
+                'user_id': user_id,
+                'quiz_id': quiz_id,
+                'deadline': deadline.isoformat()
+            })
+            pipe.expireat(meta_key, self._expire_at(deadline))
+            pipe.execute()
+        except Exception as e:
+            print(f"Cache write error: {e}")
+
+    def get_meta(self, attempt_id):
+        """Return {'user_id', 'quiz_id', 'deadline'} for an open attempt, or None"""
+        meta = self.redis_client.hgetall(self._get_meta_key(attempt_id))
+        if not meta:
+            return None
+        return {
+            'user_id': int(meta[b'user_id']),
+            'quiz_id': int(meta[b'quiz_id']),
+            'deadline': datetime.fromisoformat(meta[b'deadline'].decode())
+        }
+
+    def save_answers(self, attempt_id, answers, deadline):
+        """Record {question_id: selected_option}; later saves for a question overwrite earlier ones"""
+        answers_key = self._get_answers_key(attempt_id)
+        pipe = self.redis_client.pipeline()
+        pipe.hset(answers_key, mapping={str(question_id): option for question_id, option in answers.items()})
+        pipe.expireat(answers_key, self._expire_at(deadline))
+        pipe.execute()
+
+    def get_answers(self, attempt_id):
+        """Return the autosaved answers of an attempt as {str(question_id): option}"""
+        if not self.redis_client:
+            return {}
+        try:
+            answers = self.redis_client.hgetall(self._get_answers_key(attempt_id))
+            return {question_id.decode(): option.decode() for question_id, option in answers.items()}
+        except Exception as e:
+            print(f"Cache read error: {e}")
+            return {}
+
+    def close(self, *attempt_ids):
+        """Forget attempts once they are graded"""
+        if not self.redis_client or not attempt_ids:
+            return
+        try:
+            keys = []
+            for attempt_id in attempt_ids:
+                keys.extend([self._get_meta_key(attempt_id), self._get_answers_key(attempt_id)])
+            self.redis_client.delete(*keys)
+        except Exception as e:
+            print(f"Cache write error: {e}")
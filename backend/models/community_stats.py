@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Community Stats Module for Quiz Master V2
+Live community statistics in Redis: counters for users and attempts, a running sum
+of percentages for the average score, per-day HyperLogLogs of active users and a
+sorted set of subject popularity, reconciled periodically against the database
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+ACTIVE_DAYS = 30
+EPOCH = datetime(1970, 1, 1)
+# Replays of one completion (a retried flush, a submit racing the sweeper) arrive well within this
+RECORDED_TTL = 86400
+
+
+class CommunityStats:
+    """Community-wide counters updated on register and submit, read in one round trip"""
+
+    def __init__(self, db, redis_client):
+        self.db = db
+        self.redis_client = redis_client
+
+    def _get_keys(self):
+        return {
+            'users': 'community:users',
+            'attempts': 'community:attempts',
+            'pct_sum': 'community:pct_sum',
+            'subjects': 'community:subjects'
+        }
+
+    def _get_active_key(self, day):
+        return f"community:active:{day.strftime('%Y%m%d')}"
+
+    def _get_ready_key(self):
+        return 'community:ready'
+
+    def _get_recorded_key(self, attempt_id):
+        return f"community:recorded:{attempt_id}"
+
+    def _active_expire_at(self, day):
+        """Day HyperLogLogs live as long as they can fall inside the window"""
+        return int((datetime.combine(day + timedelta(days=ACTIVE_DAYS + 1), datetime.min.time()) - EPOCH).total_seconds())
+
+    def record_users(self, delta):
+        """Adjust the number of regular users after one registered, was deleted or changed role"""
+        self.redis_client.incrby(self._get_keys()['users'], delta)
+
+    def record_attempts(self, attempts):
+        """Count completed attempts of regular users towards attempts, average, activity and subjects"""
+        from app import User, Quiz, Chapter
+
+        attempts = [a for a in attempts if a.completed_at and a.total_questions]
+        if not attempts:
+            return
+
+        # Claim each attempt first so a replayed completion is not counted twice; counts
+        # lost if the update below fails after the claim are restored by the reconcile task
+        pipe = self.redis_client.pipeline(transaction=False)
+        for attempt in attempts:
+            pipe.set(self._get_recorded_key(attempt.id), 1, nx=True, ex=RECORDED_TTL)
+        attempts = [attempt for attempt, claimed in zip(attempts, pipe.execute()) if claimed]
+        if not attempts:
+            return
+
+        regular_users = {user_id for (user_id,) in self.db.session.query(User.id).filter(
+            User.id.in_({a.user_id for a in attempts}),
+            User.role == 'user'
+        ).all()}
+        subject_by_quiz = dict(self.db.session.query(Quiz.id, Chapter.subject_id).join(
+            Chapter, Quiz.chapter_id == Chapter.id
+        ).filter(Quiz.id.in_({a.quiz_id for a in attempts})).all())
+
+        keys = self._get_keys()
+        earliest = datetime.utcnow().date() - timedelta(days=ACTIVE_DAYS - 1)
+        pipe = self.redis_client.pipeline()
+        for attempt in attempts:
+            pipe.incr(keys['attempts'])
+            pipe.incrbyfloat(keys['pct_sum'], attempt.score * 100.0 / attempt.total_questions)
+            if attempt.quiz_id in subject_by_quiz:
+                pipe.zincrby(keys['subjects'], 1, subject_by_quiz[attempt.quiz_id])
+            day = attempt.completed_at.date()
+            if attempt.user_id in regular_users and day >= earliest:
+                pipe.pfadd(self._get_active_key(day), attempt.user_id)
+                pipe.expireat(self._get_active_key(day), self._active_expire_at(day))
+        pipe.execute()
+
+    def record_score_changes(self, pct_delta):
+        """Shift the running sum of percentages after attempts were re-graded in place"""
+        if pct_delta:
+            self.redis_client.incrbyfloat(self._get_keys()['pct_sum'], pct_delta)
+
+    def rebuild(self):
+        """Recompute every structure from the database and swap them in atomically"""
+        from app import User, QuizAttempt, DailyAttemptRollup, SubjectAttemptRollup
+
+        db = self.db
+        total_users = User.query.filter_by(role='user').count()
+        total_attempts, total_pct = db.session.query(
+            db.func.sum(DailyAttemptRollup.attempts), db.func.sum(DailyAttemptRollup.pct_sum)
+        ).one()
+        subjects = db.session.query(SubjectAttemptRollup.subject_id, SubjectAttemptRollup.attempts).filter(
+            SubjectAttemptRollup.attempts > 0
+        ).all()
+
+        today = datetime.utcnow().date()
+        earliest = today - timedelta(days=ACTIVE_DAYS - 1)
+        day = db.func.date(QuizAttempt.completed_at).label('day')
+        active = db.session.query(day, QuizAttempt.user_id).join(
+            User, User.id == QuizAttempt.user_id
+        ).filter(
+            QuizAttempt.completed_at >= datetime.combine(earliest, datetime.min.time()),
+            User.role == 'user'
+        ).group_by(day, QuizAttempt.user_id).all()
+        active_by_day = {}
+        for row in active:
+            active_by_day.setdefault(datetime.strptime(str(row.day)[:10], '%Y-%m-%d').date(), []).append(row.user_id)
+
+        keys = self._get_keys()
+        suffix = uuid.uuid4().hex
+        write_pipe = self.redis_client.pipeline(transaction=False)
+        swap_pipe = self.redis_client.pipeline(transaction=True)
+        swap_pipe.set(keys['users'], total_users)
+        swap_pipe.set(keys['attempts'], total_attempts or 0)
+        swap_pipe.set(keys['pct_sum'], float(total_pct or 0))
+        if subjects:
+            write_pipe.zadd(f"{keys['subjects']}:{suffix}", dict(subjects))
+            swap_pipe.rename(f"{keys['subjects']}:{suffix}", keys['subjects'])
+        else:
+            swap_pipe.delete(keys['subjects'])
+        for offset in range(ACTIVE_DAYS):
+            active_day = today - timedelta(days=offset)
+            active_key = self._get_active_key(active_day)
+            if active_by_day.get(active_day):
+                write_pipe.pfadd(f"{active_key}:{suffix}", *active_by_day[active_day])
+                swap_pipe.rename(f"{active_key}:{suffix}", active_key)
+                swap_pipe.expireat(active_key, self._active_expire_at(active_day))
+            else:
+                swap_pipe.delete(active_key)
+        write_pipe.execute()
+
+        swap_pipe.set(self._get_ready_key(), 1)
+        swap_pipe.execute()
+
+    def ensure_built(self):
+        """Build the structures from the database the first time they are needed"""
+        if self.redis_client.exists(self._get_ready_key()):
+            return
+        if self.redis_client.set(f"{self._get_ready_key()}:lock", 1, nx=True, ex=60):
+            self.rebuild()
+
+    def read(self):
+        """
+        Return (total_users, active_users, total_attempts, pct_sum, subject ids by
+        popularity) in one round trip, or None before the first build
+        """
+        keys = self._get_keys()
+        today = datetime.utcnow().date()
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.exists(self._get_ready_key())
+        pipe.mget(keys['users'], keys['attempts'], keys['pct_sum'])
+        pipe.pfcount(*[self._get_active_key(today - timedelta(days=offset)) for offset in range(ACTIVE_DAYS)])
+        pipe.zrevrange(keys['subjects'], 0, 4)  # A few, in case the top subject was deleted
+        ready, (users, attempts, pct_sum), active_users, subject_ids = pipe.execute()
+        if not ready:
+            return None
+        return (int(users or 0), active_users, int(attempts or 0), float(pct_sum or 0),
+                [int(subject_id) for subject_id in subject_ids])
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Query Fanout Module for Quiz Master V2
+Runs independent read-only sections of a request in parallel on a bounded thread
+pool, each in its own app context and therefore its own database session
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+
+def server_timing_header(timings):
+    """Format {name: (milliseconds, description or None)} as a Server-Timing header value"""
+    metrics = []
+    for name, (duration, description) in timings.items():
+        metric = f"{name};dur={duration:.1f}"
+        if description:
+            metric += f';desc="{description}"'
+        metrics.append(metric)
+    return ', '.join(metrics)
+
+
+class QueryFanout:
+    """Bounded pool that runs named sections concurrently, each with its own timeout"""
+
+    def __init__(self, app, db, max_workers=4, default_timeout=5):
+        self.app = app
+        self.db = db
+        self.default_timeout = default_timeout  # Seconds, counted from when the fanout starts
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='query-fanout')
+
+    def _run_section(self, func, timeout):
+        """Run one section in a fresh app context; returns (ok, result or error, milliseconds)"""
+        start = time.perf_counter()
+        with self.app.app_context():
+            try:
+                if self.db.engine.dialect.name == 'postgresql':
+                    # Let the database give up on the section too, not just the caller
+                    self.db.session.execute(
+                        self.db.text(f"SET LOCAL statement_timeout = {max(1, int(timeout * 1000))}")
+                    )
+                return True, func(), (time.perf_counter() - start) * 1000
+            except Exception as e:
+                return False, e, (time.perf_counter() - start) * 1000
+
+    def run(self, sections, timeouts=None):
+        """
+        Run {name: callable} concurrently. Callables must return plain data, since their
+        session is closed once they finish. Returns (results, failed, timings): results
+        maps each section that succeeded to its return value, failed lists the sections
+        that raised or timed out, and timings maps every section to (milliseconds, description)
+        """
+        timeouts = timeouts or {}
+        started = time.perf_counter()
+        futures = {
+            name: self._executor.submit(self._run_section, func, timeouts.get(name, self.default_timeout))
+            for name, func in sections.items()
+        }
+
+        results, failed, timings = {}, [], {}
+        for name, future in futures.items():
+            timeout = timeouts.get(name, self.default_timeout)
+            try:
+                ok, result, duration = future.result(timeout=max(0, started + timeout - time.perf_counter()))
+            except FutureTimeout:
+                future.cancel()  # Drops it if still queued; a running section finishes in the background
+                failed.append(name)
+                timings[name] = (timeout * 1000, 'timeout')
+                continue
+            if ok:
+                results[name] = result
+                timings[name] = (duration, None)
+            else:
+                print(f"Query section {name} failed: {result}")
+                failed.append(name)
+                timings[name] = (duration, 'error')
+        return results, failed, timings
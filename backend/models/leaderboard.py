@@ -0,0 +1,568 @@
+#!/usr/bin/env python3
+"""
+Leaderboard Module for Quiz Master V2
+Keeps rankings in Redis sorted sets (plus per-user hashes for attempts, sums and
+best score) updated incrementally on every completed attempt. Rolling week/month
+rankings are merged from per-day buckets that expire on their own. A histogram of
+user averages per ranking answers approximate "top X%" queries in O(1).
+"""
+
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+# Rolling windows in days, counting today
+WINDOW_DAYS = {'week': 7, 'month': 30}
+# Day buckets outlive the longest window by a day
+BUCKET_RETENTION_DAYS = max(WINDOW_DAYS.values()) + 2
+# Merged windows are recomputed at least this often and always at midnight
+WINDOW_TTL = 60
+# Replays of one completion (a retried flush, a submit racing the sweeper) arrive well within this
+RECORDED_TTL = 86400
+
+# Ranking order matches the SQL leaderboard: average percentage desc, then attempts desc.
+# Both are packed into one sorted-set score: avg (4 decimals) * 1e6 + attempts.
+# KEYS[6] is the attempt's set of rankings it was already recorded in, so that each attempt
+# counts once per ranking however often its completion is replayed. Merged windows are
+# rebuilt from the day buckets, so they are patched only while ARGV[7], the rank key of
+# the attempt's day bucket, is not in the set yet (record windows before the bucket).
+# KEYS[7], when given, is the ranking's histogram: users per whole average percentage (0-100).
+# ARGV: user, percentage, score, expire-at timestamp (0 for none), only-if-exists flag,
+# recorded TTL, day bucket rank key (windows only)
+RECORD_SCRIPT = """
+local user = ARGV[1]
+local ttl = 0
+if ARGV[5] == '1' then
+    -- Merged windows are only patched while they exist, and must expire together
+    ttl = redis.call('PTTL', KEYS[1])
+    if ttl < 0 then
+        return 0
+    end
+end
+if ARGV[7] then
+    if redis.call('SISMEMBER', KEYS[6], ARGV[7]) == 1 then
+        return 0
+    end
+elseif redis.call('SADD', KEYS[6], KEYS[1]) == 0 then
+    return 0
+end
+redis.call('EXPIRE', KEYS[6], ARGV[6])
+local previous_attempts = tonumber(redis.call('HGET', KEYS[2], user) or '0')
+local previous_sum = tonumber(redis.call('HGET', KEYS[3], user) or '0')
+local attempts = redis.call('HINCRBY', KEYS[2], user, 1)
+local pct_sum = tonumber(redis.call('HINCRBYFLOAT', KEYS[3], user, ARGV[2]))
+redis.call('HINCRBY', KEYS[4], user, ARGV[3])
+local best = tonumber(redis.call('HGET', KEYS[5], user) or '-1')
+if tonumber(ARGV[2]) > best then
+    redis.call('HSET', KEYS[5], user, ARGV[2])
+end
+local avg = pct_sum / attempts
+redis.call('ZADD', KEYS[1], math.floor(avg * 10000 + 0.5) * 1000000 + math.min(attempts, 999999), user)
+if KEYS[7] then
+    -- Move the user from the bucket of their previous average to the new one
+    if previous_attempts > 0 then
+        redis.call('HINCRBY', KEYS[7], math.floor(math.floor(previous_sum / previous_attempts * 10000 + 0.5) / 10000), -1)
+    end
+    redis.call('HINCRBY', KEYS[7], math.floor(math.floor(avg * 10000 + 0.5) / 10000), 1)
+end
+for i = 1, #KEYS do
+    if i == 6 then
+        -- The recorded set keeps its own TTL
+    elseif tonumber(ARGV[4]) > 0 then
+        redis.call('EXPIREAT', KEYS[i], ARGV[4])
+    elseif ttl > 0 then
+        redis.call('PEXPIRE', KEYS[i], ttl)
+    end
+end
+return attempts
+"""
+
+# Drops a user from one ranking. KEYS: rank, attempts, pct_sum, score_sum, best, and the
+# histogram when the ranking has one. ARGV: user
+REMOVE_SCRIPT = """
+local user = ARGV[1]
+local attempts = tonumber(redis.call('HGET', KEYS[2], user) or '0')
+if attempts == 0 then
+    return 0
+end
+if KEYS[6] then
+    local pct_sum = tonumber(redis.call('HGET', KEYS[3], user) or '0')
+    redis.call('HINCRBY', KEYS[6], math.floor(math.floor(pct_sum / attempts * 10000 + 0.5) / 10000), -1)
+end
+redis.call('ZREM', KEYS[1], user)
+for i = 2, 5 do
+    redis.call('HDEL', KEYS[i], user)
+end
+return 1
+"""
+
+# Overwrites a user's totals in one ranking. KEYS as for REMOVE_SCRIPT.
+# ARGV: user, attempts, pct_sum, score_sum, best, expire-at timestamp (0 to leave as is)
+SET_SCRIPT = """
+local user = ARGV[1]
+local previous_attempts = tonumber(redis.call('HGET', KEYS[2], user) or '0')
+local previous_sum = tonumber(redis.call('HGET', KEYS[3], user) or '0')
+local attempts = tonumber(ARGV[2])
+local avg = tonumber(ARGV[3]) / attempts
+redis.call('HSET', KEYS[2], user, ARGV[2])
+redis.call('HSET', KEYS[3], user, ARGV[3])
+redis.call('HSET', KEYS[4], user, ARGV[4])
+redis.call('HSET', KEYS[5], user, ARGV[5])
+redis.call('ZADD', KEYS[1], math.floor(avg * 10000 + 0.5) * 1000000 + math.min(attempts, 999999), user)
+if KEYS[6] then
+    if previous_attempts > 0 then
+        redis.call('HINCRBY', KEYS[6], math.floor(math.floor(previous_sum / previous_attempts * 10000 + 0.5) / 10000), -1)
+    end
+    redis.call('HINCRBY', KEYS[6], math.floor(math.floor(avg * 10000 + 0.5) / 10000), 1)
+end
+if tonumber(ARGV[6]) > 0 then
+    for i = 1, #KEYS do
+        redis.call('EXPIREAT', KEYS[i], ARGV[6])
+    end
+end
+return 1
+"""
+
+
+def rank_score(avg_percentage, attempts):
+    """Sorted-set score for a user, see RECORD_SCRIPT"""
+    return int(avg_percentage * 10000 + 0.5) * 1000000 + min(attempts, 999999)
+
+
+def histogram_bucket(avg_percentage):
+    """Histogram bucket of an average, rounded the same way as rank_score"""
+    return int(avg_percentage * 10000 + 0.5) // 10000
+
+
+def _timestamp(moment):
+    return int((moment - datetime(1970, 1, 1)).total_seconds())
+
+
+class _Aggregate:
+    """Per-user totals merged from several rows, shaped like an aggregate query row"""
+
+    def __init__(self, user_id):
+        self.id = user_id
+        self.attempts = 0
+        self.pct_sum = 0.0
+        self.score_sum = 0
+        self.best = 0.0
+
+    def add(self, attempts, pct_sum, score_sum, best):
+        self.attempts += int(attempts)
+        self.pct_sum += float(pct_sum or 0)
+        self.score_sum += int(float(score_sum or 0))
+        self.best = max(self.best, float(best or 0))
+
+
+class LeaderboardService:
+    """Service class for Redis-backed leaderboards with O(log n) rank lookup"""
+
+    FIELDS = ('attempts', 'pct_sum', 'score_sum', 'best')
+
+    def __init__(self, db, redis_client):
+        self.db = db
+        self.redis_client = redis_client
+        self._record_script = redis_client.register_script(RECORD_SCRIPT)
+        self._remove_script = redis_client.register_script(REMOVE_SCRIPT)
+        self._set_script = redis_client.register_script(SET_SCRIPT)
+
+    def _get_keys(self, scope='global', period='all'):
+        prefix = f"leaderboard:{scope}:{period}"
+        return {
+            'rank': f"{prefix}:rank",
+            'attempts': f"{prefix}:attempts",
+            'pct_sum': f"{prefix}:pct_sum",
+            'score_sum': f"{prefix}:score_sum",
+            'best': f"{prefix}:best",
+            'histogram': f"{prefix}:histogram"
+        }
+
+    def _get_day_keys(self, day, scope='global'):
+        # Day buckets are only ever merged, never ranked on their own, so they need no histogram
+        keys = self._get_keys(scope, f"day:{day:%Y%m%d}")
+        del keys['histogram']
+        return keys
+
+    def _get_recorded_key(self, attempt_id):
+        return f"leaderboard:recorded:{attempt_id}"
+
+    def _key_list(self, keys, attempt_id):
+        """KEYS of RECORD_SCRIPT for recording an attempt into the ranking of keys"""
+        names = ('rank', 'attempts', 'pct_sum', 'score_sum', 'best')
+        return [keys[name] for name in names] + [self._get_recorded_key(attempt_id)] + (
+            [keys['histogram']] if 'histogram' in keys else []
+        )
+
+    def _bucket_expire_at(self, day):
+        return _timestamp(datetime.combine(day, datetime.min.time()) + timedelta(days=BUCKET_RETENTION_DAYS))
+
+    def _get_username_key(self):
+        return 'leaderboard:usernames'
+
+    def _get_scopes_key(self):
+        return 'leaderboard:scopes'
+
+    def _get_ready_key(self):
+        return 'leaderboard:ready'
+
+    def _scopes_for_quizzes(self, quiz_ids):
+        """Map each quiz id to the rankings its attempts count towards"""
+        from app import Quiz, Chapter
+
+        rows = self.db.session.query(Quiz.id, Chapter.subject_id).join(
+            Chapter, Quiz.chapter_id == Chapter.id
+        ).filter(Quiz.id.in_(quiz_ids)).all()
+        return {quiz_id: ['global', f"subject:{subject_id}", f"quiz:{quiz_id}"] for quiz_id, subject_id in rows}
+
+    def record_username(self, user_id, username):
+        """Show a renamed user under the new name (rankings only store ids)"""
+        self.redis_client.hset(self._get_username_key(), user_id, username)
+
+    def quizzes_of_user(self, user_id):
+        """Ids of the quizzes whose rankings the user's completed attempts count towards"""
+        from app import QuizAttempt
+
+        return [quiz_id for (quiz_id,) in self.db.session.query(QuizAttempt.quiz_id).filter(
+            QuizAttempt.user_id == user_id,
+            QuizAttempt.completed_at.isnot(None)
+        ).distinct().all()]
+
+    def remove_user(self, user_id, quiz_ids):
+        """
+        Drop a deleted or demoted user from every ranking their attempts at quiz_ids
+        (from quizzes_of_user) count towards, including the retained day buckets
+        """
+        scopes = {'global'}
+        for quiz_scopes in self._scopes_for_quizzes(quiz_ids).values():
+            scopes.update(quiz_scopes)
+
+        names = ('rank', 'attempts', 'pct_sum', 'score_sum', 'best', 'histogram')
+        today = datetime.utcnow().date()
+        pipe = self.redis_client.pipeline()
+        for scope in scopes:
+            rankings = [self._get_keys(scope)] + [self._get_keys(scope, period) for period in WINDOW_DAYS]
+            rankings += [self._get_day_keys(today - timedelta(days=offset), scope)
+                         for offset in range(BUCKET_RETENTION_DAYS)]
+            for keys in rankings:
+                self._remove_script(keys=[keys[name] for name in names if name in keys], args=[user_id],
+                                    client=pipe)
+        pipe.hdel(self._get_username_key(), user_id)
+        pipe.execute()
+
+    def record_attempts(self, attempts):
+        """Add completed attempts of regular users to the global, subject and quiz rankings"""
+        from app import User
+
+        attempts = [a for a in attempts if a.completed_at and a.total_questions]
+        if not attempts:
+            return
+
+        users = dict(self.db.session.query(User.id, User.username).filter(
+            User.id.in_({a.user_id for a in attempts}),
+            User.role == 'user'
+        ).all())
+        scopes_by_quiz = self._scopes_for_quizzes({a.quiz_id for a in attempts})
+
+        today = datetime.utcnow().date()
+        pipe = self.redis_client.pipeline()
+        for attempt in attempts:
+            if attempt.user_id not in users:
+                continue
+            percentage = attempt.score * 100.0 / attempt.total_questions
+            args = [attempt.user_id, percentage, attempt.score]
+            day = attempt.completed_at.date()
+            scopes = scopes_by_quiz.get(attempt.quiz_id, ['global'])
+
+            for scope in scopes:
+                self._record_script(keys=self._key_list(self._get_keys(scope), attempt.id),
+                                    args=args + [0, 0, RECORDED_TTL], client=pipe)
+                day_keys = self._get_day_keys(day, scope)
+                for period, days in WINDOW_DAYS.items():
+                    if 0 <= (today - day).days < days:
+                        self._record_script(keys=self._key_list(self._get_keys(scope, period), attempt.id),
+                                            args=args + [0, 1, RECORDED_TTL, day_keys['rank']], client=pipe)
+                if (today - day).days < BUCKET_RETENTION_DAYS:
+                    self._record_script(keys=self._key_list(day_keys, attempt.id),
+                                        args=args + [self._bucket_expire_at(day), 0, RECORDED_TTL], client=pipe)
+
+            pipe.sadd(self._get_scopes_key(), *scopes)
+            pipe.hset(self._get_username_key(), attempt.user_id, users[attempt.user_id])
+        pipe.execute()
+
+    def _aggregate_from_db(self, since=None, user_ids=None):
+        """
+        Aggregates of completed attempts of regular users (or of user_ids among them) per
+        user and quiz, and per day as well when since is given
+        """
+        from app import User, QuizAttempt
+
+        day = self.db.func.date(QuizAttempt.completed_at).label('day')
+        group_by = [User.id, User.username, QuizAttempt.quiz_id] + ([day] if since else [])
+        query = self.db.session.query(
+            *group_by,
+            self.db.func.count(QuizAttempt.id).label('attempts'),
+            self.db.func.sum(QuizAttempt.score * 100.0 / QuizAttempt.total_questions).label('pct_sum'),
+            self.db.func.sum(QuizAttempt.score).label('score_sum'),
+            self.db.func.max(QuizAttempt.score * 100.0 / QuizAttempt.total_questions).label('best')
+        ).join(
+            QuizAttempt, User.id == QuizAttempt.user_id
+        ).filter(
+            QuizAttempt.completed_at.isnot(None),
+            User.role == 'user'
+        )
+        if since:
+            query = query.filter(QuizAttempt.completed_at >= since)
+        if user_ids is not None:
+            query = query.filter(User.id.in_(user_ids))
+        return query.group_by(*group_by).all()
+
+    @staticmethod
+    def _merge(rows, scopes_by_quiz):
+        """Fold per-quiz rows into {scope: [_Aggregate per user]}"""
+        merged = {}
+        for row in rows:
+            for scope in scopes_by_quiz.get(row.quiz_id, ['global']):
+                total = merged.setdefault(scope, {}).setdefault(row.id, _Aggregate(row.id))
+                total.add(row.attempts, row.pct_sum, row.score_sum, row.best)
+        return {scope: list(totals.values()) for scope, totals in merged.items()}
+
+    def _stage(self, write_pipe, swap_pipe, keys, rows, expire=None):
+        """
+        Queue rankings for rows on write_pipe under temporary keys, and the atomic
+        replacement of keys on swap_pipe
+        """
+        suffix = f"rebuild:{uuid.uuid4().hex}"  # Concurrent rebuilds must not share temporary keys
+        if rows:
+            write_pipe.zadd(f"{keys['rank']}:{suffix}", {
+                row.id: rank_score(row.pct_sum / row.attempts, row.attempts) for row in rows
+            })
+            for field in self.FIELDS:
+                write_pipe.hset(f"{keys[field]}:{suffix}", mapping={row.id: getattr(row, field) for row in rows})
+            if 'histogram' in keys:
+                write_pipe.hset(f"{keys['histogram']}:{suffix}", mapping=Counter(
+                    histogram_bucket(row.pct_sum / row.attempts) for row in rows
+                ))
+
+        for key in keys.values():
+            if rows:
+                swap_pipe.rename(f"{key}:{suffix}", key)
+                if expire:
+                    swap_pipe.expireat(key, expire)
+            else:
+                swap_pipe.delete(key)
+
+    def rebuild(self):
+        """Recompute all rankings and day buckets from the database and swap them in atomically"""
+        rows = self._aggregate_from_db()
+        today = datetime.utcnow().date()
+        first_day = today - timedelta(days=BUCKET_RETENTION_DAYS - 1)
+        day_rows = self._aggregate_from_db(since=datetime.combine(first_day, datetime.min.time()))
+        scopes_by_quiz = self._scopes_for_quizzes({row.quiz_id for row in rows})
+
+        all_time = self._merge(rows, scopes_by_quiz)
+        by_day = {first_day + timedelta(days=offset): [] for offset in range(BUCKET_RETENTION_DAYS)}
+        for row in day_rows:
+            day = datetime.strptime(str(row.day)[:10], '%Y-%m-%d').date()
+            if day in by_day:
+                by_day[day].append(row)
+
+        # Rankings of scopes that no longer have attempts are cleared too
+        scopes = {scope.decode() for scope in self.redis_client.smembers(self._get_scopes_key())}
+        scopes.update(all_time, ['global'])
+
+        write_pipe = self.redis_client.pipeline(transaction=False)
+        swap_pipe = self.redis_client.pipeline(transaction=True)
+        for day, rows_of_day in by_day.items():
+            merged = self._merge(rows_of_day, scopes_by_quiz)
+            for scope in scopes:
+                self._stage(write_pipe, swap_pipe, self._get_day_keys(day, scope), merged.get(scope, []),
+                            expire=self._bucket_expire_at(day))
+        for scope in scopes:
+            self._stage(write_pipe, swap_pipe, self._get_keys(scope), all_time.get(scope, []))
+            for period in WINDOW_DAYS:
+                # Merged windows are recomputed from the fresh buckets on next read
+                swap_pipe.delete(*self._get_keys(scope, period).values())
+
+        if rows:
+            write_pipe.hset(self._get_username_key(), mapping={row.id: row.username for row in rows})
+        write_pipe.execute()
+
+        swap_pipe.delete(self._get_scopes_key())
+        swap_pipe.sadd(self._get_scopes_key(), *all_time, 'global')
+        swap_pipe.set(self._get_ready_key(), 1)
+        swap_pipe.execute()
+        return len(all_time.get('global', []))
+
+    def refresh_users(self, user_ids, quiz_id, days):
+        """
+        Recompute from the database the totals of user_ids in the rankings of quiz_id
+        (global, its subject and the quiz) and in their day buckets for days, after their
+        scores changed in place (re-grading). Merged windows of those rankings are dropped
+        and re-merged from the buckets on next read.
+        """
+        if not self.is_ready():
+            return  # The pending full build reads the new scores anyway
+
+        user_ids = list(user_ids)
+        today = datetime.utcnow().date()
+        days = {day for day in days if 0 <= (today - day).days < BUCKET_RETENTION_DAYS}
+        scopes = self._scopes_for_quizzes([quiz_id]).get(quiz_id, ['global'])
+
+        rows = self._aggregate_from_db(user_ids=user_ids)
+        scopes_by_quiz = self._scopes_for_quizzes({row.quiz_id for row in rows})
+        all_time = self._merge(rows, scopes_by_quiz)
+        by_day = {day: [] for day in days}
+        if days:
+            since = datetime.combine(min(days), datetime.min.time())
+            for row in self._aggregate_from_db(since=since, user_ids=user_ids):
+                day = datetime.strptime(str(row.day)[:10], '%Y-%m-%d').date()
+                if day in by_day:
+                    by_day[day].append(row)
+        by_day = {day: self._merge(rows_of_day, scopes_by_quiz) for day, rows_of_day in by_day.items()}
+
+        pipe = self.redis_client.pipeline()
+        for scope in scopes:
+            self._set_users(pipe, self._get_keys(scope), user_ids, all_time.get(scope, []))
+            for day, merged in by_day.items():
+                self._set_users(pipe, self._get_day_keys(day, scope), user_ids, merged.get(scope, []),
+                                expire=self._bucket_expire_at(day))
+            for period in WINDOW_DAYS:
+                pipe.delete(*self._get_keys(scope, period).values())
+        pipe.execute()
+
+    def _set_users(self, pipe, keys, user_ids, rows, expire=0):
+        """Queue overwriting the totals of user_ids in one ranking with rows, removing users without any"""
+        names = ('rank', 'attempts', 'pct_sum', 'score_sum', 'best', 'histogram')
+        key_list = [keys[name] for name in names if name in keys]
+        totals = {row.id: row for row in rows}
+        for user_id in user_ids:
+            row = totals.get(user_id)
+            if row is None:
+                self._remove_script(keys=key_list, args=[user_id], client=pipe)
+            else:
+                self._set_script(keys=key_list, args=[user_id, row.attempts, row.pct_sum, row.score_sum,
+                                                      row.best, expire], client=pipe)
+
+    def ensure_window(self, period, scope='global'):
+        """Merge the day buckets of a rolling window into one ranking, O(days) round trips"""
+        keys = self._get_keys(scope, period)
+        if self.redis_client.exists(keys['rank']):
+            return
+
+        today = datetime.utcnow().date()
+        days = [self._get_day_keys(today - timedelta(days=offset), scope) for offset in range(WINDOW_DAYS[period])]
+        pipe = self.redis_client.pipeline()
+        for day_keys in days:
+            for field in self.FIELDS:
+                pipe.hgetall(day_keys[field])
+        buckets = pipe.execute()
+
+        totals = {}
+        for i in range(0, len(buckets), len(self.FIELDS)):
+            attempts, pct_sums, score_sums, bests = buckets[i:i + len(self.FIELDS)]
+            for user_id, count in attempts.items():
+                total = totals.setdefault(user_id, _Aggregate(int(user_id)))
+                total.add(count, pct_sums.get(user_id), score_sums.get(user_id), bests.get(user_id))
+
+        tomorrow = datetime.combine(today + timedelta(days=1), datetime.min.time())
+        expire = min(_timestamp(datetime.utcnow()) + WINDOW_TTL, _timestamp(tomorrow))
+        write_pipe = self.redis_client.pipeline(transaction=False)
+        swap_pipe = self.redis_client.pipeline(transaction=True)
+        self._stage(write_pipe, swap_pipe, keys, list(totals.values()), expire=expire)
+        write_pipe.execute()
+        swap_pipe.execute()
+
+    def claim_build(self):
+        """
+        True for the one caller that should schedule the first build of the rankings
+        (a full rebuild, too slow for a request); retried after ten minutes if it never lands
+        """
+        if self.redis_client.exists(self._get_ready_key()):
+            return False
+        return bool(self.redis_client.set(f"{self._get_ready_key()}:lock", 1, nx=True, ex=600))
+
+    def is_ready(self):
+        return bool(self.redis_client.exists(self._get_ready_key()))
+
+    def _user_stats(self, keys, user_ids):
+        """Read attempts, sums, best score and username for several users in one round trip"""
+        pipe = self.redis_client.pipeline()
+        for field in self.FIELDS:
+            pipe.hmget(keys[field], user_ids)
+        pipe.hmget(self._get_username_key(), user_ids)
+        attempts, pct_sums, score_sums, bests, usernames = pipe.execute()
+
+        stats = []
+        for i, user_id in enumerate(user_ids):
+            total_attempts = int(attempts[i] or 0)
+            stats.append({
+                'user_id': int(user_id),
+                'username': usernames[i].decode() if usernames[i] else None,
+                'total_attempts': total_attempts,
+                'avg_percentage': round(float(pct_sums[i] or 0) / total_attempts, 1) if total_attempts else 0,
+                'best_score': round(float(bests[i] or 0), 1),
+                'total_score': int(float(score_sums[i] or 0))
+            })
+        return stats
+
+    def top(self, limit=10, scope='global', period='all'):
+        """Top-N users via ZREVRANGE"""
+        keys = self._get_keys(scope, period)
+        ranked = self.redis_client.zrevrange(keys['rank'], 0, limit - 1, withscores=True)
+        if not ranked:
+            return []
+
+        leaderboard = self._user_stats(keys, [user_id for user_id, _ in ranked])
+        for idx, entry in enumerate(leaderboard):
+            # Users with equal average and attempt count share a rank
+            tied = idx and ranked[idx][1] == ranked[idx - 1][1]
+            entry['rank'] = leaderboard[idx - 1]['rank'] if tied else idx + 1
+        return leaderboard
+
+    def get_user_rank(self, user_id, scope='global', period='all'):
+        """Rank and stats of one user in O(log n), or None if unranked"""
+        keys = self._get_keys(scope, period)
+        score = self.redis_client.zscore(keys['rank'], user_id)
+        if score is None:
+            return None
+
+        # Counting strictly higher scores gives tied users the same rank
+        ahead = self.redis_client.zcount(keys['rank'], f"({score}", '+inf')
+        stats = self._user_stats(keys, [user_id])[0]
+        return {
+            'rank': ahead + 1,
+            'total_attempts': stats['total_attempts'],
+            'avg_percentage': stats['avg_percentage']
+        }
+
+    def count(self, scope='global', period='all'):
+        return self.redis_client.zcard(self._get_keys(scope, period)['rank'])
+
+    def get_user_percentile(self, user_id, scope='global', period='all'):
+        """
+        Approximate standing of one user as "top X%" from the ranking's histogram,
+        without locating the user in the sorted set. None if unranked.
+        """
+        keys = self._get_keys(scope, period)
+        pipe = self.redis_client.pipeline()
+        pipe.hgetall(keys['histogram'])
+        pipe.hmget(keys['attempts'], user_id)
+        pipe.hmget(keys['pct_sum'], user_id)
+        histogram, (attempts,), (pct_sum,) = pipe.execute()
+        if not attempts:
+            return None
+
+        attempts = int(attempts)
+        avg_percentage = float(pct_sum) / attempts
+        bucket = histogram_bucket(avg_percentage)
+        counts = {int(b): int(count) for b, count in histogram.items()}
+        total = sum(counts.values())
+        # Everyone in a higher bucket is ahead; the user's own bucket counts as level
+        at_or_above = sum(count for b, count in counts.items() if b >= bucket)
+        return {
+            'top_percent': round(min(100.0, 100.0 * at_or_above / total), 1) if total else 100.0,
+            'total_attempts': attempts,
+            'avg_percentage': round(avg_percentage, 1),
+            'approximate': True
+        }
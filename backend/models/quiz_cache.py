@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Quiz Content Cache Module for Quiz Master V2
+Keeps versioned, per-quiz derived content (answer keys, question payloads, completed
+attempt details) in process and in Redis
+"""
+
+import hashlib
+import json
+
+
+class QuizContentVersions:
+    """Per-quiz content version counters shared across processes through Redis"""
+
+    def __init__(self, redis_client=None):
+        self.redis_client = redis_client
+        self._local_versions = {}  # Fallback when Redis is unavailable
+
+    def _get_cache_key(self, quiz_id):
+        return f"quiz:{quiz_id}:version"
+
+    def get(self, quiz_id):
+        """Return the current content version of a quiz"""
+        if self.redis_client:
+            try:
+                version = self.redis_client.get(self._get_cache_key(quiz_id))
+                return int(version) if version else 0
+            except Exception as e:
+                print(f"Cache read error: {e}")
+        return self._local_versions.get(quiz_id, 0)
+
+    def bump(self, quiz_id):
+        """Move a quiz to a new content version, orphaning everything cached for the old one"""
+        self._local_versions[quiz_id] = self._local_versions.get(quiz_id, 0) + 1
+        if self.redis_client:
+            try:
+                return int(self.redis_client.incr(self._get_cache_key(quiz_id)))
+            except Exception as e:
+                print(f"Cache write error: {e}")
+        return self._local_versions[quiz_id]
+
+
+class AnswerKeyCache:
+    """Compact question id -> correct option map for each quiz content version"""
+
+    def __init__(self, db, redis_client=None, versions=None, cache_ttl=86400):
+        self.db = db
+        self.redis_client = redis_client
+        self.versions = versions or QuizContentVersions(redis_client)
+        self.cache_ttl = cache_ttl  # 24 hours default, entries are immutable per version
+        self._local_keys = {}  # quiz_id -> (version, answer key)
+
+    def _get_cache_key(self, quiz_id, version):
+        return f"answer_key:{quiz_id}:{version}"
+
+    def _load_from_db(self, quiz_id):
+        """Load only (id, correct_option) pairs instead of full question rows"""
+        from app import Question
+
+        rows = self.db.session.query(
+            Question.id, Question.correct_option
+        ).filter(
+            Question.quiz_id == quiz_id
+        ).order_by(Question.id).all()
+
+        return {
+            'ids': [question_id for question_id, _ in rows],
+            'options': ''.join(option for _, option in rows)
+        }
+
+    def get(self, quiz_id):
+        """Return the answer key of a quiz as {str(question_id): option}"""
+        version = self.versions.get(quiz_id)
+
+        local = self._local_keys.get(quiz_id)
+        if local and local[0] == version:
+            return local[1]
+
+        packed = None
+        cache_key = self._get_cache_key(quiz_id, version)
+        if self.redis_client:
+            try:
+                cached = self.redis_client.get(cache_key)
+                if cached:
+                    packed = json.loads(cached)
+            except Exception as e:
+                print(f"Cache read error: {e}")
+
+        if packed is None:
+            packed = self._load_from_db(quiz_id)
+            if self.redis_client:
+                try:
+                    self.redis_client.setex(cache_key, self.cache_ttl, json.dumps(packed))
+                except Exception as e:
+                    print(f"Cache write error: {e}")
+
+        answer_key = dict(zip((str(question_id) for question_id in packed['ids']), packed['options']))
+        self._local_keys[quiz_id] = (version, answer_key)
+        return answer_key
+
+    def grade(self, quiz_id, answers):
+        """Count correct answers in {question_id: selected_option} without touching the database"""
+        answer_key = self.get(quiz_id)
+        return sum(1 for question_id, option in answer_key.items() if answers.get(question_id) == option)
+
+    def invalidate(self, quiz_id):
+        """Drop the cached key of a quiz after its questions change"""
+        self._local_keys.pop(quiz_id, None)
+        return self.versions.bump(quiz_id)
+
+
+class QuestionPayloadCache:
+    """Pre-encoded, answer-free question list JSON for each quiz content version"""
+
+    def __init__(self, db, redis_client=None, versions=None, cache_ttl=86400):
+        self.db = db
+        self.redis_client = redis_client
+        self.versions = versions or QuizContentVersions(redis_client)
+        self.cache_ttl = cache_ttl  # 24 hours default, entries are immutable per version
+        self._local_payloads = {}  # quiz_id -> (version, question count, JSON bytes)
+
+    def _get_cache_key(self, quiz_id, version):
+        return f"question_payload:{quiz_id}:{version}"
+
+    def _build_from_db(self, quiz_id):
+        """Serialize the questions once, without correct options"""
+        from app import Question
+
+        rows = self.db.session.query(
+            Question.id, Question.text,
+            Question.option_a, Question.option_b, Question.option_c, Question.option_d
+        ).filter(
+            Question.quiz_id == quiz_id
+        ).order_by(Question.id).all()
+
+        payload = json.dumps([{
+            'id': q.id,
+            'text': q.text,
+            'option_a': q.option_a,
+            'option_b': q.option_b,
+            'option_c': q.option_c,
+            'option_d': q.option_d
+        } for q in rows], separators=(',', ':')).encode('utf-8')
+
+        return len(rows), payload
+
+    def get(self, quiz_id):
+        """Return (question count, JSON array bytes) for a quiz"""
+        version = self.versions.get(quiz_id)
+
+        local = self._local_payloads.get(quiz_id)
+        if local and local[0] == version:
+            return local[1], local[2]
+
+        cached = None
+        cache_key = self._get_cache_key(quiz_id, version)
+        if self.redis_client:
+            try:
+                cached = self.redis_client.hgetall(cache_key)
+            except Exception as e:
+                print(f"Cache read error: {e}")
+
+        if cached:
+            count, payload = int(cached[b'count']), cached[b'payload']
+        else:
+            count, payload = self._build_from_db(quiz_id)
+            if self.redis_client:
+                try:
+                    pipe = self.redis_client.pipeline()
+                    pipe.hset(cache_key, mapping={'count': count, 'payload': payload})
+                    pipe.expire(cache_key, self.cache_ttl)
+                    pipe.execute()
+                except Exception as e:
+                    print(f"Cache write error: {e}")
+
+        self._local_payloads[quiz_id] = (version, count, payload)
+        return count, payload
+
+    def forget(self, quiz_id):
+        """Drop the in-process copy; callers bump the shared version separately"""
+        self._local_payloads.pop(quiz_id, None)
+
+
+class AttemptDetailCache:
+    """Pre-encoded detail JSON of completed attempts, valid while their quiz content version lasts"""
+
+    def __init__(self, redis_client=None, versions=None, cache_ttl=604800):
+        self.redis_client = redis_client
+        self.versions = versions or QuizContentVersions(redis_client)
+        self.cache_ttl = cache_ttl  # 7 days default, entries never change once written
+
+    def _get_cache_key(self, attempt_id):
+        return f"attempt_detail:{attempt_id}"
+
+    def get(self, attempt_id, user_id):
+        """Return (ETag, JSON bytes) for an attempt of user_id, or None if not cached for the current version"""
+        if not self.redis_client:
+            return None
+        try:
+            cached = self.redis_client.hgetall(self._get_cache_key(attempt_id))
+        except Exception as e:
+            print(f"Cache read error: {e}")
+            return None
+
+        if not cached or int(cached[b'user_id']) != user_id:
+            return None
+        if int(cached[b'version']) != self.versions.get(int(cached[b'quiz_id'])):
+            return None  # Questions changed since the entry was built
+        return cached[b'etag'].decode(), cached[b'payload']
+
+    def put(self, attempt_id, user_id, quiz_id, version, details):
+        """
+        Encode and store the details of a completed attempt, built from quiz content
+        version (read before loading the questions). Returns (ETag, JSON bytes).
+        """
+        payload = json.dumps(details, separators=(',', ':')).encode('utf-8')
+        etag = hashlib.sha256(payload).hexdigest()[:32]
+        if self.redis_client:
+            try:
+                cache_key = self._get_cache_key(attempt_id)
+                pipe = self.redis_client.pipeline()
+                pipe.hset(cache_key, mapping={
+                    'user_id': user_id, 'quiz_id': quiz_id, 'version': version, 'etag': etag, 'payload': payload
+                })
+                pipe.expire(cache_key, self.cache_ttl)
+                pipe.execute()
+            except Exception as e:
+                print(f"Cache write error: {e}")
+        return etag, payload
+
+    def evict(self, attempt_ids):
+        """Drop the entries of attempts whose scores were changed in place (re-grading)"""
+        if not self.redis_client or not attempt_ids:
+            return
+        try:
+            self.redis_client.delete(*[self._get_cache_key(attempt_id) for attempt_id in attempt_ids])
+        except Exception as e:
+            print(f"Cache write error: {e}")
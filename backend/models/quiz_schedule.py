@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Quiz Schedule Index Module for Quiz Master V2
+Keeps an in-memory timeline of quiz start/end transitions so schedule status
+queries and transition-aware cache TTLs never touch the database
+"""
+
+import math
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+
+class QuizScheduleIndex:
+    """Sorted timeline of quiz schedule transitions, reloaded when the shared version changes"""
+
+    VERSION_KEY = 'quiz_schedule:version'
+
+    def __init__(self, db, redis_client=None):
+        self.db = db
+        self.redis_client = redis_client
+        self._quizzes = {}  # quiz_id -> schedule entry
+        self._transitions = []  # sorted start/end datetimes of scheduled active quizzes
+        self._loaded_version = None
+        self._local_version = 0  # Fallback when Redis is unavailable
+
+    def _get_version(self):
+        if self.redis_client:
+            try:
+                version = self.redis_client.get(self.VERSION_KEY)
+                return int(version) if version else 0
+            except Exception as e:
+                print(f"Cache read error: {e}")
+        return self._local_version
+
+    def invalidate(self):
+        """Force every process to rebuild its timeline after quiz schedule changes"""
+        self._local_version += 1
+        self._loaded_version = None
+        if self.redis_client:
+            try:
+                self.redis_client.incr(self.VERSION_KEY)
+            except Exception as e:
+                print(f"Cache write error: {e}")
+
+    def _load(self):
+        from app import Quiz
+
+        rows = self.db.session.query(
+            Quiz.id, Quiz.title, Quiz.is_active, Quiz.start_time, Quiz.duration_minutes
+        ).all()
+
+        quizzes = {}
+        transitions = set()
+        for row in rows:
+            end_time = row.start_time + timedelta(minutes=row.duration_minutes) if row.start_time else None
+            quizzes[row.id] = {
+                'id': row.id,
+                'title': row.title,
+                'is_active': row.is_active,
+                'start_time': row.start_time,
+                'end_time': end_time,
+                'duration_minutes': row.duration_minutes
+            }
+            if row.is_active and row.start_time:
+                transitions.add(row.start_time)
+                transitions.add(end_time)
+
+        self._quizzes = quizzes
+        self._transitions = sorted(transitions)
+
+    def _ensure_loaded(self):
+        version = self._get_version()
+        if version != self._loaded_version:
+            self._load()
+            self._loaded_version = version
+
+    @staticmethod
+    def _evaluate(entry, now):
+        """Same rules as Quiz.get_quiz_status / is_quiz_active / get_remaining_time"""
+        start_time, end_time = entry['start_time'], entry['end_time']
+
+        if not entry['is_active']:
+            status = 'inactive'
+        elif not start_time:
+            status = 'active'
+        elif now < start_time:
+            status = 'upcoming'
+        elif now <= end_time:
+            status = 'active'
+        else:
+            status = 'expired'
+
+        if not start_time:
+            remaining_time = None
+        elif now > end_time:
+            remaining_time = 0
+        else:
+            remaining_time = int((end_time - now).total_seconds())
+
+        return {
+            'status': status,
+            'is_active': bool(entry['is_active'] and start_time and start_time <= now <= end_time),
+            'remaining_time': remaining_time
+        }
+
+    def get_status(self, quiz_id, now=None):
+        """Return the schedule status of a quiz, or None if it does not exist"""
+        self._ensure_loaded()
+        entry = self._quizzes.get(quiz_id)
+        if entry is None:
+            return None
+
+        status = self._evaluate(entry, now or datetime.utcnow())
+        status.update({
+            'id': entry['id'],
+            'title': entry['title'],
+            'start_time': entry['start_time'],
+            'duration_minutes': entry['duration_minutes']
+        })
+        return status
+
+    def next_transition(self, now=None):
+        """Return the next moment any quiz opens or closes, in O(log n)"""
+        self._ensure_loaded()
+        now = now or datetime.utcnow()
+        idx = bisect_right(self._transitions, now)
+        return self._transitions[idx] if idx < len(self._transitions) else None
+
+    def ttl_until_next_transition(self, default=300, now=None):
+        """Cache timeout that expires no later than the next schedule transition"""
+        now = now or datetime.utcnow()
+        next_transition = self.next_transition(now)
+        if next_transition is None:
+            return default
+        # Quizzes close strictly after end_time, so expire one second past the transition
+        seconds = math.ceil((next_transition - now).total_seconds()) + 1
+        return max(1, min(default, seconds))
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Bulk Re-grading Module for Quiz Master V2
+Re-scores stored quiz attempts against the current answer key in one vectorized pass
+"""
+
+import time
+
+import numpy as np
+
+# Changed attempt ids listed in a report; the count covers all of them
+REPORTED_IDS_LIMIT = 100
+
+
+class RegradeService:
+    """Service class for re-grading every completed attempt of a quiz"""
+
+    def __init__(self, db, answer_keys):
+        self.db = db
+        self.answer_keys = answer_keys
+
+    def _load_attempts(self, quiz_id):
+        """Load only the columns needed for grading"""
+        from app import QuizAttempt
+
+        return self.db.session.query(
+            QuizAttempt.id, QuizAttempt.user_id, QuizAttempt.score, QuizAttempt.total_questions,
+            QuizAttempt.completed_at, QuizAttempt.answers
+        ).filter(
+            QuizAttempt.quiz_id == quiz_id,
+            QuizAttempt.completed_at.isnot(None)
+        ).order_by(QuizAttempt.id).all()
+
+    @staticmethod
+    def build_matrix(answers_list, question_ids, option_codes):
+        """Encode answers as an attempts x questions uint8 matrix (0 = unanswered/unknown option)"""
+        columns = {question_id: col for col, question_id in enumerate(question_ids)}
+        matrix = np.zeros((len(answers_list), len(question_ids)), dtype=np.uint8)
+
+        for row, answers in enumerate(answers_list):
+            for question_id, option in (answers or {}).items():
+                col = columns.get(str(question_id))
+                if col is not None:
+                    matrix[row, col] = option_codes.get(option, 0)
+
+        return matrix
+
+    @staticmethod
+    def summarize_deltas(deltas):
+        """Describe the distribution of score changes"""
+        if deltas.size == 0:
+            return {'min': 0, 'max': 0, 'mean': 0, 'distribution': {}}
+
+        values, counts = np.unique(deltas, return_counts=True)
+        return {
+            'min': int(deltas.min()),
+            'max': int(deltas.max()),
+            'mean': round(float(deltas.mean()), 3),
+            'distribution': {str(int(value)): int(count) for value, count in zip(values, counts)}
+        }
+
+    def regrade(self, quiz_id, dry_run=True):
+        """
+        Re-grade all completed attempts of a quiz and return (report, changes).
+        With dry_run the new scores are only reported; otherwise changed scores are bulk-updated
+        (caller commits, together with whatever it derives from changes). changes lists each changed attempt with its old and new score, for patching the
+        structures derived from scores. total_questions is left as recorded when each
+        attempt was started.
+        """
+        from app import QuizAttempt
+
+        start_time = time.perf_counter()
+
+        answer_key = self.answer_keys.get(quiz_id)
+        question_ids = list(answer_key.keys())
+
+        # Codes start at 1 so unanswered (0) never matches the key
+        option_codes = {}
+        for option in answer_key.values():
+            option_codes.setdefault(option, len(option_codes) + 1)
+        key_vector = np.array([option_codes[option] for option in answer_key.values()], dtype=np.uint8)
+
+        attempts = self._load_attempts(quiz_id)
+        attempt_ids = np.array([attempt.id for attempt in attempts], dtype=np.int64)
+        old_scores = np.array([attempt.score for attempt in attempts], dtype=np.int64)
+
+        matrix = self.build_matrix([attempt.answers for attempt in attempts], question_ids, option_codes)
+        new_scores = (matrix == key_vector).sum(axis=1, dtype=np.int64)
+
+        deltas = new_scores - old_scores
+        changed = np.nonzero(deltas)[0]
+
+        changes = [{
+            'id': int(attempt_ids[i]),
+            'user_id': attempts[i].user_id,
+            'quiz_id': quiz_id,
+            'total_questions': attempts[i].total_questions,
+            'completed_at': attempts[i].completed_at,
+            'old_score': int(old_scores[i]),
+            'new_score': int(new_scores[i])
+        } for i in changed]
+
+        if not dry_run and changes:
+            self.db.session.execute(
+                self.db.update(QuizAttempt),
+                [{'id': change['id'], 'score': change['new_score']} for change in changes]
+            )
+
+        report = {
+            'quiz_id': quiz_id,
+            'dry_run': dry_run,
+            'attempts': int(attempt_ids.size),
+            'questions': len(question_ids),
+            'changed': int(changed.size),
+            'changed_attempt_ids': [change['id'] for change in changes[:REPORTED_IDS_LIMIT]],
+            'score_delta': self.summarize_deltas(deltas),
+            'execution_time_ms': round((time.perf_counter() - start_time) * 1000, 2)
+        }
+        return report, changes
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Analytics Rollups Module for Quiz Master V2
+Keeps per-day, per-subject, per-quiz and per-user attempt totals (and the per-user
+statistics record) up to date inside the transaction that completes an attempt,
+so analytics read O(groups) rows
+"""
+
+from collections import defaultdict
+
+from models.streaks import NO_STREAK, extend_streak, local_day, streak_from_days, streak_zone
+
+
+class AnalyticsRollups:
+    """Service class for incrementally maintained analytics rollup tables"""
+
+    SUMS = ('attempts', 'pct_sum', 'score_sum', 'questions_sum')
+
+    def __init__(self, db):
+        self.db = db
+
+    def _models(self):
+        from app import DailyAttemptRollup, SubjectAttemptRollup, QuizAttemptRollup, UserStats
+        return DailyAttemptRollup, SubjectAttemptRollup, QuizAttemptRollup, UserStats
+
+    def _upsert(self, model, key, rows, add, greatest=(), replace=()):
+        """Insert rows, or add to / keep the greater of / overwrite the existing values on conflict"""
+        if not rows:
+            return
+        table = model.__table__
+        keys = (key,) if isinstance(key, str) else tuple(key)
+        dialect = self.db.engine.dialect.name
+
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(table)
+            set_ = {column: table.c[column] + stmt.excluded[column] for column in add}
+            for column in greatest:
+                set_[column] = self.db.case(
+                    (stmt.excluded[column] > table.c[column], stmt.excluded[column]),
+                    else_=table.c[column]
+                )
+            for column in replace:
+                set_[column] = stmt.excluded[column]
+            self.db.session.execute(stmt.on_conflict_do_update(index_elements=list(keys), set_=set_), rows)
+            return
+
+        # Other databases: read the existing rows, then update or insert
+        key_columns = self.db.tuple_(*[table.c[k] for k in keys])
+        existing = {tuple(getattr(row, k) for k in keys): row for row in model.query.filter(
+            key_columns.in_([tuple(row[k] for k in keys) for row in rows])
+        ).all()}
+        for row in rows:
+            current = existing.get(tuple(row[k] for k in keys))
+            if current is None:
+                self.db.session.add(model(**row))
+                continue
+            for column in add:
+                setattr(current, column, getattr(current, column) + row[column])
+            for column in greatest:
+                setattr(current, column, max(getattr(current, column), row[column]))
+            for column in replace:
+                setattr(current, column, row[column])
+
+    def _active_days(self, user_ids=None):
+        """{user_id: set of local days with a completed attempt} from quiz_attempt"""
+        from app import QuizAttempt
+
+        db = self.db
+        zone = streak_zone()
+        query = db.session.query(QuizAttempt.user_id, QuizAttempt.completed_at).filter(
+            QuizAttempt.completed_at.isnot(None), QuizAttempt.total_questions > 0
+        )
+        if user_ids is not None:
+            query = query.filter(QuizAttempt.user_id.in_(user_ids))
+        active_days = defaultdict(set)
+        for user_id, completed_at in query.yield_per(1000):
+            active_days[user_id].add(local_day(completed_at, zone))
+        return active_days
+
+    def _streaks(self, user_days):
+        """
+        Extend each user's streak with the days of their new attempts. A day before the
+        user's last active day can close a gap, so those users are recounted from scratch.
+        """
+        UserStats = self._models()[3]
+
+        current = {row.user_id: (row.last_active_date, row.streak_days, row.best_streak_days) for row in self.db.session.query(
+            UserStats.user_id, UserStats.last_active_date, UserStats.streak_days, UserStats.best_streak_days
+        ).filter(UserStats.user_id.in_(user_days)).all()}
+
+        streaks, recount = {}, []
+        for user_id, days in user_days.items():
+            state = current.get(user_id, NO_STREAK)
+            for day in sorted(days):
+                state = extend_streak(state, day)
+                if state is None:
+                    recount.append(user_id)
+                    break
+            streaks[user_id] = state
+
+        if recount:
+            history = self._active_days(recount)
+            for user_id in recount:
+                streaks[user_id] = streak_from_days(history[user_id] | user_days[user_id])
+        return streaks
+
+    def _count_subjects(self, user_ids=None):
+        """Set subject_count from the per-user subject rollup, for some or all users"""
+        from app import UserSubjectRollup
+        UserStats = self._models()[3]
+
+        db = self.db
+        count = db.select(db.func.count()).where(
+            UserSubjectRollup.user_id == UserStats.user_id
+        ).scalar_subquery()
+        stmt = db.update(UserStats).values(subject_count=count)
+        if user_ids is not None:
+            stmt = stmt.where(UserStats.user_id.in_(user_ids))
+        db.session.execute(stmt, execution_options={'synchronize_session': False})
+
+    def apply(self, attempts):
+        """Add completed attempts to every rollup (caller commits, together with the attempts)"""
+        from app import Quiz, Chapter, UserSubjectRollup
+        DailyAttemptRollup, SubjectAttemptRollup, QuizAttemptRollup, UserStats = self._models()
+
+        attempts = [a for a in attempts if a.completed_at and a.total_questions]
+        if not attempts:
+            return
+
+        subject_by_quiz = dict(self.db.session.query(Quiz.id, Chapter.subject_id).join(
+            Chapter, Quiz.chapter_id == Chapter.id
+        ).filter(Quiz.id.in_({a.quiz_id for a in attempts})).all())
+
+        def totals():
+            return {'attempts': 0, 'pct_sum': 0.0, 'score_sum': 0, 'questions_sum': 0}
+
+        daily, subjects, quizzes = defaultdict(totals), defaultdict(totals), defaultdict(totals)
+        users = defaultdict(lambda: dict(totals(), best_pct=0.0, last_completed_at=None, perfect_count=0, time_sum=0))
+        user_subjects = defaultdict(lambda: {'attempts': 0})
+        user_days = defaultdict(set)
+        zone = streak_zone()
+
+        for attempt in attempts:
+            percentage = attempt.score * 100.0 / attempt.total_questions
+            groups = [daily[attempt.completed_at.date()], quizzes[attempt.quiz_id], users[attempt.user_id]]
+            if attempt.quiz_id in subject_by_quiz:
+                groups.append(subjects[subject_by_quiz[attempt.quiz_id]])
+            for group in groups:
+                group['attempts'] += 1
+                group['pct_sum'] += percentage
+                group['score_sum'] += attempt.score
+                group['questions_sum'] += attempt.total_questions
+
+            user = users[attempt.user_id]
+            user['best_pct'] = max(user['best_pct'], percentage)
+            if not user['last_completed_at'] or attempt.completed_at > user['last_completed_at']:
+                user['last_completed_at'] = attempt.completed_at
+            user['perfect_count'] += attempt.score == attempt.total_questions
+            user['time_sum'] += attempt.time_taken or 0
+            user_days[attempt.user_id].add(local_day(attempt.completed_at, zone))
+            if attempt.quiz_id in subject_by_quiz:
+                user_subjects[(attempt.user_id, subject_by_quiz[attempt.quiz_id])]['attempts'] += 1
+
+        for user_id, (last_active_date, streak_days, best_streak_days) in self._streaks(user_days).items():
+            users[user_id].update(last_active_date=last_active_date, streak_days=streak_days,
+                                  best_streak_days=best_streak_days)
+
+        self._upsert(DailyAttemptRollup, 'date', [
+            dict(group, date=date) for date, group in daily.items()
+        ], add=self.SUMS)
+        self._upsert(SubjectAttemptRollup, 'subject_id', [
+            dict(group, subject_id=subject_id) for subject_id, group in subjects.items()
+        ], add=self.SUMS)
+        self._upsert(QuizAttemptRollup, 'quiz_id', [
+            dict(group, quiz_id=quiz_id) for quiz_id, group in quizzes.items()
+        ], add=self.SUMS)
+        self._upsert(UserStats, 'user_id', [
+            dict(group, user_id=user_id) for user_id, group in users.items()
+        ], add=self.SUMS + ('perfect_count', 'time_sum'), greatest=('best_pct', 'last_completed_at'),
+            replace=('last_active_date', 'streak_days', 'best_streak_days'))
+        self._upsert(UserSubjectRollup, ('user_id', 'subject_id'), [
+            dict(group, user_id=user_id, subject_id=subject_id) for (user_id, subject_id), group in user_subjects.items()
+        ], add=('attempts',))
+        self._count_subjects(list(users))
+
+    def apply_score_changes(self, changes):
+        """
+        Move the sums of re-graded attempts from their old to their new scores, given as
+        {'user_id', 'quiz_id', 'total_questions', 'completed_at', 'old_score', 'new_score'}.
+        Attempt counts, days and subjects are unchanged, so streaks are too; only the best
+        percentage of the affected users is recomputed (caller commits).
+        """
+        from app import QuizAttempt, Quiz, Chapter
+        DailyAttemptRollup, SubjectAttemptRollup, QuizAttemptRollup, UserStats = self._models()
+
+        changes = [c for c in changes if c['completed_at'] and c['total_questions']]
+        if not changes:
+            return
+
+        db = self.db
+        subject_by_quiz = dict(db.session.query(Quiz.id, Chapter.subject_id).join(
+            Chapter, Quiz.chapter_id == Chapter.id
+        ).filter(Quiz.id.in_({c['quiz_id'] for c in changes})).all())
+
+        def deltas():
+            return {'attempts': 0, 'pct_sum': 0.0, 'score_sum': 0, 'questions_sum': 0}
+
+        daily, subjects, quizzes = defaultdict(deltas), defaultdict(deltas), defaultdict(deltas)
+        users = defaultdict(lambda: dict(deltas(), perfect_count=0, time_sum=0))
+        for change in changes:
+            total = change['total_questions']
+            groups = [daily[change['completed_at'].date()], quizzes[change['quiz_id']], users[change['user_id']]]
+            if change['quiz_id'] in subject_by_quiz:
+                groups.append(subjects[subject_by_quiz[change['quiz_id']]])
+            for group in groups:
+                group['pct_sum'] += (change['new_score'] - change['old_score']) * 100.0 / total
+                group['score_sum'] += change['new_score'] - change['old_score']
+            users[change['user_id']]['perfect_count'] += (change['new_score'] == total) - (change['old_score'] == total)
+
+        self._upsert(DailyAttemptRollup, 'date', [
+            dict(group, date=date) for date, group in daily.items()
+        ], add=self.SUMS)
+        self._upsert(SubjectAttemptRollup, 'subject_id', [
+            dict(group, subject_id=subject_id) for subject_id, group in subjects.items()
+        ], add=self.SUMS)
+        self._upsert(QuizAttemptRollup, 'quiz_id', [
+            dict(group, quiz_id=quiz_id) for quiz_id, group in quizzes.items()
+        ], add=self.SUMS)
+        self._upsert(UserStats, 'user_id', [
+            dict(group, user_id=user_id) for user_id, group in users.items()
+        ], add=self.SUMS + ('perfect_count', 'time_sum'))
+
+        # A lowered score may have been the user's best, so take the maximum again
+        best = db.select(db.func.max(QuizAttempt.score * 100.0 / QuizAttempt.total_questions)).where(
+            QuizAttempt.user_id == UserStats.user_id,
+            QuizAttempt.completed_at.isnot(None),
+            QuizAttempt.total_questions > 0
+        ).scalar_subquery()
+        db.session.execute(
+            db.update(UserStats).where(UserStats.user_id.in_(list(users))).values(best_pct=db.func.coalesce(best, 0)),
+            execution_options={'synchronize_session': False}
+        )
+
+    def backfill(self):
+        """Recompute every rollup from quiz_attempt (caller commits)"""
+        from app import QuizAttempt, Quiz, Chapter
+        DailyAttemptRollup, SubjectAttemptRollup, QuizAttemptRollup, UserStats = self._models()
+
+        db = self.db
+        percentage = QuizAttempt.score * 100.0 / QuizAttempt.total_questions
+        completed = db.and_(QuizAttempt.completed_at.isnot(None), QuizAttempt.total_questions > 0)
+        day = db.func.date(QuizAttempt.completed_at)
+        sums = [
+            db.func.count(QuizAttempt.id), db.func.sum(percentage),
+            db.func.sum(QuizAttempt.score), db.func.sum(QuizAttempt.total_questions)
+        ]
+
+        for model in (DailyAttemptRollup, SubjectAttemptRollup, QuizAttemptRollup):
+            db.session.execute(db.delete(model))
+
+        db.session.execute(db.insert(DailyAttemptRollup).from_select(
+            ['date', *self.SUMS],
+            db.select(day, *sums).where(completed).group_by(day)
+        ))
+        db.session.execute(db.insert(SubjectAttemptRollup).from_select(
+            ['subject_id', *self.SUMS],
+            db.select(Chapter.subject_id, *sums).join(Quiz, QuizAttempt.quiz_id == Quiz.id).join(
+                Chapter, Quiz.chapter_id == Chapter.id
+            ).where(completed).group_by(Chapter.subject_id)
+        ))
+        db.session.execute(db.insert(QuizAttemptRollup).from_select(
+            ['quiz_id', *self.SUMS],
+            db.select(QuizAttempt.quiz_id, *sums).where(completed).group_by(QuizAttempt.quiz_id)
+        ))
+        self.rebuild_user_stats()
+
+    def rebuild_user_stats(self):
+        """Recompute the per-user statistics records from quiz_attempt (caller commits)"""
+        from app import QuizAttempt, Quiz, Chapter, UserSubjectRollup
+        UserStats = self._models()[3]
+
+        db = self.db
+        percentage = QuizAttempt.score * 100.0 / QuizAttempt.total_questions
+        completed = db.and_(QuizAttempt.completed_at.isnot(None), QuizAttempt.total_questions > 0)
+
+        db.session.execute(db.delete(UserSubjectRollup))
+        db.session.execute(db.delete(UserStats))
+
+        db.session.execute(db.insert(UserStats).from_select(
+            ['user_id', *self.SUMS, 'best_pct', 'last_completed_at', 'perfect_count', 'time_sum'],
+            db.select(
+                QuizAttempt.user_id, db.func.count(QuizAttempt.id), db.func.sum(percentage),
+                db.func.sum(QuizAttempt.score), db.func.sum(QuizAttempt.total_questions),
+                db.func.max(percentage), db.func.max(QuizAttempt.completed_at),
+                db.func.sum(db.case((QuizAttempt.score == QuizAttempt.total_questions, 1), else_=0)),
+                db.func.sum(db.func.coalesce(QuizAttempt.time_taken, 0))
+            ).where(completed).group_by(QuizAttempt.user_id)
+        ))
+        db.session.execute(db.insert(UserSubjectRollup).from_select(
+            ['user_id', 'subject_id', 'attempts'],
+            db.select(QuizAttempt.user_id, Chapter.subject_id, db.func.count(QuizAttempt.id)).join(
+                Quiz, QuizAttempt.quiz_id == Quiz.id
+            ).join(
+                Chapter, Quiz.chapter_id == Chapter.id
+            ).where(completed).group_by(QuizAttempt.user_id, Chapter.subject_id)
+        ))
+        self._count_subjects()
+
+        # Streaks need the ordered local active days of each user, so they are computed here
+        streaks = []
+        for user_id, days in self._active_days().items():
+            last_active_date, streak_days, best_streak_days = streak_from_days(days)
+            streaks.append({'user_id': user_id, 'last_active_date': last_active_date,
+                            'streak_days': streak_days, 'best_streak_days': best_streak_days})
+        if streaks:
+            db.session.execute(db.update(UserStats), streaks)
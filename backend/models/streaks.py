@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Streaks Module for Quiz Master V2
+Daily activity streaks kept as (last active day, current run, best run), where
+days are calendar days in the configured STREAK_TIMEZONE; a new attempt extends
+the state in O(1), and only a day older than the last active one needs the history
+"""
+
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from flask import current_app
+
+NO_STREAK = (None, 0, 0)
+
+
+def streak_zone():
+    """The timezone whose calendar days streaks are counted in"""
+    return ZoneInfo(current_app.config['STREAK_TIMEZONE'])
+
+
+def local_day(moment, zone):
+    """Calendar day in zone of a naive UTC datetime (as stored in the database)"""
+    return moment.replace(tzinfo=timezone.utc).astimezone(zone).date()
+
+
+def local_today(zone):
+    return datetime.now(zone).date()
+
+
+def extend_streak(state, day):
+    """
+    (last day, current run, best run) after activity on day, or None when day is
+    before the last active day, since it may close a gap only the history can show
+    """
+    last_day, current, best = state
+    if last_day is None or day > last_day + timedelta(days=1):
+        current = 1
+    elif day == last_day + timedelta(days=1):
+        current += 1
+    elif day < last_day:
+        return None
+    return max(day, last_day or day), current, max(best, current)
+
+
+def streak_from_days(days):
+    """(last day, current run, best run) for a collection of active days"""
+    state = NO_STREAK
+    for day in sorted(set(days)):
+        state = extend_streak(state, day)
+    return state
+
+
+def current_streak(last_day, current, today):
+    """The current run still counts while the user was active today or yesterday"""
+    if last_day and last_day >= today - timedelta(days=1):
+        return current
+    return 0
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Submission Pipeline Module for Quiz Master V2
+Write-behind queue for graded quiz submissions: results are acknowledged immediately,
+appended to a Redis stream and persisted to the database in batches by a Celery consumer
+"""
+
+import json
+from datetime import datetime
+
+# Atomically claim the attempt and append it to the stream, so a retried submit
+# can never enqueue the same attempt twice
+ENQUEUE_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'EX', ARGV[2]) then
+    redis.call('XADD', KEYS[2], '*', 'attempt_id', ARGV[3], 'payload', ARGV[1])
+    return 1
+end
+return 0
+"""
+
+
+class SubmissionPipeline:
+    """Write-behind queue of graded submissions backed by a Redis stream"""
+
+    def __init__(self, redis_client, stream_key='quiz:submissions', group='attempt-writers', result_ttl=86400):
+        self.redis_client = redis_client
+        self.stream_key = stream_key
+        self.group = group
+        self.result_ttl = result_ttl  # 24 hours default, read-your-writes window
+        self._enqueue_script = redis_client.register_script(ENQUEUE_SCRIPT)
+
+    def _get_result_key(self, attempt_id):
+        return f"submission:{attempt_id}"
+
+    def enqueue(self, result):
+        """
+        Queue a graded submission. Returns (result, created); when the attempt was already
+        submitted the originally stored result is returned instead. Redis errors propagate
+        so the caller can fall back to a synchronous write.
+        """
+        payload = json.dumps(result)
+        created = self._enqueue_script(
+            keys=[self._get_result_key(result['attempt_id']), self.stream_key],
+            args=[payload, self.result_ttl, result['attempt_id']]
+        )
+        if created:
+            return result, True
+        return self.get_pending(result['attempt_id']), False
+
+    def get_pending(self, attempt_id):
+        """Return the acknowledged result of an attempt, if one was queued"""
+        try:
+            cached = self.redis_client.get(self._get_result_key(attempt_id))
+            if cached:
+                return json.loads(cached)
+        except Exception as e:
+            print(f"Cache read error: {e}")
+        return None
+
+    def get_pending_ids(self, attempt_ids):
+        """Which of attempt_ids were queued, in one round trip; None when Redis is unavailable"""
+        attempt_ids = list(attempt_ids)
+        if not attempt_ids:
+            return set()
+        try:
+            found = self.redis_client.mget([self._get_result_key(attempt_id) for attempt_id in attempt_ids])
+        except Exception as e:
+            print(f"Cache read error: {e}")
+            return None
+        return {attempt_id for attempt_id, cached in zip(attempt_ids, found) if cached}
+
+    def _ensure_group(self):
+        try:
+            self.redis_client.xgroup_create(self.stream_key, self.group, id='0', mkstream=True)
+        except Exception as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    def read_batch(self, consumer, count=500, min_idle_ms=60000):
+        """Read up to count entries, first reclaiming entries a crashed consumer left unacknowledged"""
+        self._ensure_group()
+
+        _, entries, *_ = self.redis_client.xautoclaim(
+            self.stream_key, self.group, consumer, min_idle_ms, start_id='0-0', count=count
+        )
+        if len(entries) < count:
+            for _, stream_entries in self.redis_client.xreadgroup(
+                self.group, consumer, {self.stream_key: '>'}, count=count - len(entries)
+            ):
+                entries.extend(stream_entries)
+
+        return [
+            (entry_id, json.loads(fields[b'payload']))
+            for entry_id, fields in entries
+            if fields
+        ]
+
+    def ack(self, entry_ids):
+        if entry_ids:
+            self.redis_client.xack(self.stream_key, self.group, *entry_ids)
+            self.redis_client.xdel(self.stream_key, *entry_ids)
+
+    def write_batch(self, db, results, before_commit=None):
+        """
+        Persist a batch of results: bulk-update open attempts and bulk-insert missing ones.
+        Attempts that are already completed in the database are left untouched.
+        before_commit, if given, is called with the written results inside the transaction.
+        Returns the results that were written.
+        """
+        from app import QuizAttempt
+
+        # Last result wins if an attempt appears twice in one batch
+        by_attempt = {int(result['attempt_id']): result for result in results}
+        if not by_attempt:
+            return []
+
+        existing = dict(db.session.query(
+            QuizAttempt.id, QuizAttempt.completed_at
+        ).filter(QuizAttempt.id.in_(list(by_attempt))).all())
+
+        updates, inserts, written = [], [], []
+        for attempt_id, result in by_attempt.items():
+            row = {
+                'id': attempt_id,
+                'score': result['score'],
+                'time_taken': result['time_taken'],
+                'completed_at': datetime.fromisoformat(result['completed_at']),
+                'answers': result['answers']
+            }
+            if attempt_id not in existing:
+                row.update({
+                    'user_id': result['user_id'],
+                    'quiz_id': result['quiz_id'],
+                    'total_questions': result['total_questions'],
+                    'started_at': datetime.fromisoformat(result['started_at'])
+                })
+                inserts.append(row)
+                written.append(result)
+            elif existing[attempt_id] is None:
+                updates.append(row)
+                written.append(result)
+
+        if updates:
+            db.session.execute(db.update(QuizAttempt), updates)
+        if inserts:
+            db.session.execute(db.insert(QuizAttempt), inserts)
+        if before_commit and written:
+            before_commit(written)
+        db.session.commit()
+
+        return written
+
+    def flush(self, db, consumer='flusher', batch_size=500, max_batches=20, before_commit=None, on_written=None):
+        """
+        Drain the stream in batches; entries are acknowledged only after their batch commits.
+        before_commit and on_written, if given, are called with the results of each batch
+        inside its transaction and after it committed.
+        """
+        written = 0
+        for _ in range(max_batches):
+            batch = self.read_batch(consumer, batch_size)
+            if not batch:
+                break
+            results = self.write_batch(db, [result for _, result in batch], before_commit=before_commit)
+            if on_written and results:
+                on_written(results)
+            written += len(results)
+            self.ack([entry_id for entry_id, _ in batch])
+        return written
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Stale-While-Revalidate Cache Module for Quiz Master V2
+Caches expensive payloads in Redis with a soft TTL, after which the stale value is
+still served while a single background thread recomputes it, and a hard TTL, after
+which the value is gone and the next caller recomputes it (once, behind a lock)
+"""
+
+import json
+import threading
+import time
+from functools import wraps
+
+from redis.exceptions import WatchError
+
+
+class StaleWhileRevalidateCache:
+    """Decorator factory for cached payload builders that take no arguments"""
+
+    def __init__(self, app, redis_client, lock_timeout=60, wait_timeout=5):
+        self.app = app
+        self.redis_client = redis_client
+        self.lock_timeout = lock_timeout  # Bounds a refresh that crashed without unlocking
+        self.wait_timeout = wait_timeout  # How long a cold-cache caller waits for another's recompute
+
+    def _get_key(self, name):
+        return f"swr:{name}"
+
+    def _get_lock_key(self, name):
+        return f"swr:{name}:refresh"
+
+    def _get_generation_key(self, name):
+        return f"swr:{name}:generation"
+
+    def _get_generation(self, name):
+        try:
+            return int(self.redis_client.get(self._get_generation_key(name)) or 0)
+        except Exception as e:
+            print(f"Cache read error: {e}")
+            return None
+
+    def _read(self, name):
+        """Return (value, age in seconds) or None"""
+        try:
+            entry = self.redis_client.get(self._get_key(name))
+        except Exception as e:
+            print(f"Cache read error: {e}")
+            return None
+        if entry is None:
+            return None
+        entry = json.loads(entry)
+        return entry['value'], time.time() - entry['refreshed_at']
+
+    def _store(self, name, value, hard_ttl, generation):
+        """Store value unless the cache was invalidated since its computation started"""
+        key = self._get_key(name)
+        try:
+            with self.redis_client.pipeline() as pipe:
+                pipe.watch(self._get_generation_key(name))
+                if int(pipe.get(self._get_generation_key(name)) or 0) != generation:
+                    return
+                pipe.multi()
+                pipe.set(key, json.dumps({'value': value, 'refreshed_at': time.time()}), ex=hard_ttl)
+                pipe.execute()
+        except WatchError:
+            pass  # Invalidated while storing
+        except Exception as e:
+            print(f"Cache write error: {e}")
+
+    def _lock(self, name):
+        try:
+            return bool(self.redis_client.set(self._get_lock_key(name), 1, nx=True, ex=self.lock_timeout))
+        except Exception as e:
+            print(f"Cache write error: {e}")
+            return True  # Without Redis every caller just computes
+
+    def _unlock(self, name):
+        try:
+            self.redis_client.delete(self._get_lock_key(name))
+        except Exception as e:
+            print(f"Cache write error: {e}")
+
+    def _compute(self, name, func, hard_ttl, cache_if):
+        """Build the value and store it if cache_if accepts it; the caller holds the lock"""
+        try:
+            generation = self._get_generation(name)
+            value = func()
+            if generation is not None and (cache_if is None or cache_if(value)):
+                self._store(name, value, hard_ttl, generation)
+            return value
+        finally:
+            self._unlock(name)
+
+    def _refresh_in_background(self, name, func, hard_ttl, cache_if):
+        def refresh():
+            with self.app.app_context():
+                try:
+                    self._compute(name, func, hard_ttl, cache_if)
+                except Exception as e:
+                    print(f"Background refresh of {name} failed: {e}")
+
+        threading.Thread(target=refresh, name=f"swr-refresh-{name}", daemon=True).start()
+
+    def cached(self, name, soft_ttl, hard_ttl, cache_if=None):
+        """
+        Cache a JSON-serialisable payload builder under name. Values younger than
+        soft_ttl are served as is; older ones are served while one background refresh
+        runs; after hard_ttl the value expires. cache_if(value) can veto storing a value.
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper():
+                cached = self._read(name)
+                if cached is not None:
+                    value, age = cached
+                    if age >= soft_ttl and self._lock(name):
+                        self._refresh_in_background(name, func, hard_ttl, cache_if)
+                    return value
+
+                # Cold cache: one caller recomputes, the others wait briefly for its result
+                if self._lock(name):
+                    return self._compute(name, func, hard_ttl, cache_if)
+                deadline = time.monotonic() + self.wait_timeout
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    cached = self._read(name)
+                    if cached is not None:
+                        return cached[0]
+                return func()
+
+            return wrapper
+        return decorator
+
+    def invalidate(self, *names):
+        """Drop cached values so the next caller recomputes them (refreshes in flight are discarded)"""
+        try:
+            pipe = self.redis_client.pipeline()
+            for name in names:
+                pipe.incr(self._get_generation_key(name))
+                pipe.delete(self._get_key(name), self._get_lock_key(name))
+            pipe.execute()
+        except Exception as e:
+            print(f"Cache write error: {e}")
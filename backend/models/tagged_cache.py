@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tagged Cache Module for Quiz Master V2
+Cache entries record the versions of the tags they depend on (quizzes, quiz:<id>,
+subjects, subject:<id>, leaderboard, user:<id>); a write bumps its tags with one INCR each, and
+entries stamped with an older version are treated as misses, so TTLs only bound memory
+"""
+
+import json
+
+
+class TaggedCache:
+    """JSON values in Redis, valid while the versions of their tags are unchanged"""
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+
+    def _get_key(self, key):
+        return f"tagged:{key}"
+
+    def _get_tag_key(self, tag):
+        return f"tag:{tag}:version"
+
+    def get(self, key, tags):
+        """
+        Return (value or None, stamp). The stamp holds the tag versions read together with
+        the entry; pass it to set() so a bump during the recompute discards the new value.
+        """
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.get(self._get_key(key))
+            pipe.mget([self._get_tag_key(tag) for tag in tags])
+            entry, versions = pipe.execute()
+        except Exception as e:
+            print(f"Cache read error: {e}")
+            return None, None
+
+        stamp = {tag: int(version or 0) for tag, version in zip(tags, versions)}
+        if entry is None:
+            return None, stamp
+        entry = json.loads(entry)
+        if entry['tags'] != stamp:
+            return None, stamp
+        return entry['value'], stamp
+
+    def stamp(self, tags):
+        """Current versions of tags, for builders that recompute without reading the entry first"""
+        try:
+            versions = self.redis_client.mget([self._get_tag_key(tag) for tag in tags])
+        except Exception as e:
+            print(f"Cache read error: {e}")
+            return None
+        return {tag: int(version or 0) for tag, version in zip(tags, versions)}
+
+    def set(self, key, value, stamp, timeout):
+        """Store value under the tag versions of stamp (from get); timeout in seconds"""
+        if stamp is None:
+            return
+        try:
+            self.redis_client.set(self._get_key(key), json.dumps({'tags': stamp, 'value': value}), ex=timeout)
+        except Exception as e:
+            print(f"Cache write error: {e}")
+
+    def bump(self, *tags):
+        """Invalidate every entry depending on any of tags, in O(1) per tag"""
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for tag in tags:
+                pipe.incr(self._get_tag_key(tag))
+            pipe.execute()
+        except Exception as e:
+            print(f"Cache write error: {e}")
@@ -15,6 +15,7 @@ import requests
 from datetime import datetime, timedelta
 from jinja2 import Template
 import os
+import time
 
 # Initialize Celery
 celery = Celery('quiz_tasks')
@@ -32,21 +33,17 @@ GCHAT_WEBHOOK = os.getenv('GCHAT_WEBHOOK', 'https://chat.googleapis.com/v1/space
 @celery.task
 def send_daily_reminder():
     """Send daily reminder to inactive users"""
-    from app import app, db, User, QuizAttempt, Quiz
+    from app import app, db, User, Quiz, UserStats
+    from models.streaks import local_today, streak_zone
     
     with app.app_context():
-        # Find users who haven't attempted any quiz in the last 24 hours
-        yesterday = datetime.utcnow() - timedelta(days=1)
+        # Find users who haven't completed a quiz today (in the streak timezone)
+        today = local_today(streak_zone())
         
-        # Get users who haven't attempted any quiz recently
-        recent_attempts = db.session.query(QuizAttempt.user_id).filter(
-            QuizAttempt.started_at >= yesterday
-        ).distinct().subquery()
-        
-        inactive_users = User.query.filter(
+        inactive_users = User.query.outerjoin(UserStats, UserStats.user_id == User.id).filter(
             User.role == 'user',
             User.is_active == True,
-            ~User.id.in_(recent_attempts)
+            db.or_(UserStats.last_active_date.is_(None), UserStats.last_active_date < today)
         ).all()
         
         # Get latest active quiz
@@ -81,16 +78,13 @@ def send_email_reminder(email, username, quiz_title, quiz_id):
             template = Template(template_content)
             
             # Get user stats for personalization
-            from app import db, User, QuizAttempt
-            user = User.query.filter_by(email=email).first()
-            total_attempts = 0
-            best_score = 0
-            
-            if user:
-                attempts = QuizAttempt.query.filter_by(user_id=user.id).all()
-                total_attempts = len(attempts)
-                if attempts:
-                    best_score = max((attempt.score / attempt.total_questions) * 100 for attempt in attempts)
+            from app import db, User, UserStats
+            stats = db.session.query(UserStats).join(User, User.id == UserStats.user_id).filter(
+                User.email == email
+            ).first()
+            total_attempts = stats.attempts if stats else 0
+            best_score = stats.best_pct if stats else 0
+            current_streak = stats.current_streak() if stats else 0
             
             # Render template with data
             html_content = template.render(
@@ -99,6 +93,7 @@ def send_email_reminder(email, username, quiz_title, quiz_id):
                 quiz_id=quiz_id,
                 total_attempts=total_attempts,
                 best_score=round(best_score, 1),
+                current_streak=current_streak,
                 quiz_url=f"http://localhost:3000/quiz/{quiz_id}"
             )
             
@@ -137,41 +132,33 @@ def send_gchat_reminder(username, quiz_title):
 @celery.task
 def generate_monthly_report():
     """Generate and email monthly performance report"""
-    from app import app, db, User, QuizAttempt, Quiz, Chapter, Subject
+    from app import app, db, User, Subject, attempt_analytics
     
     with app.app_context():
         # Calculate monthly stats
         current_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         last_month = (current_month - timedelta(days=1)).replace(day=1)
         
-        # Get monthly attempts
-        monthly_attempts = QuizAttempt.query.filter(
-            QuizAttempt.completed_at >= last_month,
-            QuizAttempt.completed_at < current_month
-        ).all()
+        # Monthly totals and subject-wise performance from the analytics engine
+        totals = attempt_analytics.totals(start=last_month, end=current_month)
         
-        if not monthly_attempts:
+        if not totals['attempts']:
             return "No attempts found for last month"
         
         # Calculate statistics
-        total_attempts = len(monthly_attempts)
-        total_users = len(set(attempt.user_id for attempt in monthly_attempts))
-        avg_score = sum(attempt.score for attempt in monthly_attempts) / total_attempts
-        avg_percentage = sum((attempt.score / attempt.total_questions) * 100 for attempt in monthly_attempts) / total_attempts
+        total_attempts = totals['attempts']
+        total_users = totals['users']
+        avg_percentage = totals['pct_sum'] / total_attempts
         
-        # Subject-wise performance
+        subject_names = dict(db.session.query(Subject.id, Subject.name).all())
         subject_stats = {}
-        for attempt in monthly_attempts:
-            quiz = Quiz.query.get(attempt.quiz_id)
-            chapter = Chapter.query.get(quiz.chapter_id)
-            subject = Subject.query.get(chapter.subject_id)
-            
-            if subject.name not in subject_stats:
-                subject_stats[subject.name] = {'attempts': 0, 'total_score': 0, 'total_questions': 0}
-            
-            subject_stats[subject.name]['attempts'] += 1
-            subject_stats[subject.name]['total_score'] += attempt.score
-            subject_stats[subject.name]['total_questions'] += attempt.total_questions
+        for subject_stat in attempt_analytics.group_totals('subject', start=last_month, end=current_month):
+            if subject_stat['id'] in subject_names:
+                subject_stats[subject_names[subject_stat['id']]] = {
+                    'attempts': subject_stat['attempts'],
+                    'total_score': subject_stat['score_sum'],
+                    'total_questions': subject_stat['questions_sum']
+                }
         
         # Load and render HTML template
         template_path = os.path.join(os.path.dirname(__file__), 'templates', 'monthly_report_email.html')
@@ -240,7 +227,7 @@ def send_monthly_report_email(email, html_content, month_year):
 @celery.task
 def generate_admin_csv():
     """Generate CSV export for admin - user performance data"""
-    from app import app, db, User, QuizAttempt, Quiz, Chapter, Subject
+    from app import app, db, User, UserStats
     
     with app.app_context():
         try:
@@ -252,27 +239,23 @@ def generate_admin_csv():
             ])
             writer.writeheader()
             
-            # Get all users with their performance data
-            users = User.query.filter_by(role='user').all()
+            # Get all users with their statistics records in one query
+            users = db.session.query(User, UserStats).outerjoin(
+                UserStats, UserStats.user_id == User.id
+            ).filter(User.role == 'user').all()
             
-            for user in users:
-                attempts = QuizAttempt.query.filter_by(user_id=user.id).all()
-                
-                if attempts:
-                    total_score = sum(attempt.score for attempt in attempts)
-                    total_questions = sum(attempt.total_questions for attempt in attempts)
-                    total_time = sum(attempt.time_taken or 0 for attempt in attempts)
-                    avg_score = round((total_score / total_questions) * 100, 2) if total_questions > 0 else 0
-                    last_attempt = max(attempts, key=lambda x: x.completed_at or datetime.min)
+            for user, stats in users:
+                if stats and stats.attempts:
+                    avg_score = round((stats.score_sum / stats.questions_sum) * 100, 2) if stats.questions_sum > 0 else 0
                     
                     writer.writerow({
                         'user_id': user.id,
                         'username': user.username,
-                        'quizzes_taken': len(attempts),
+                        'quizzes_taken': stats.attempts,
                         'average_score': avg_score,
-                        'total_questions_answered': total_questions,
-                        'total_time_spent_minutes': round(total_time / 60, 2) if total_time else 0,
-                        'last_activity': last_attempt.completed_at.strftime('%Y-%m-%d %H:%M:%S') if last_attempt.completed_at else 'N/A'
+                        'total_questions_answered': stats.questions_sum,
+                        'total_time_spent_minutes': round(stats.time_sum / 60, 2) if stats.time_sum else 0,
+                        'last_activity': stats.last_completed_at.strftime('%Y-%m-%d %H:%M:%S') if stats.last_completed_at else 'N/A'
                     })
                 else:
                     writer.writerow({
@@ -508,6 +491,234 @@ def send_csv_export_email(email, csv_content, filename, export_type):
     except Exception as e:
         return f"Failed to email CSV to {email}: {str(e)}"
 
+@celery.task
+def regrade_quiz_attempts(quiz_id, dry_run=False):
+    """Re-grade all completed attempts of a quiz against its current answer key"""
+    from app import (app, db, QuizAttempt, answer_keys, attempt_details, leaderboard_service, analytics_rollups,
+                     achievement_service, attempt_analytics, community_stats, invalidate_quiz_caches,
+                     invalidate_user_caches, invalidate_rankings)
+    from models.regrade import RegradeService
+    
+    with app.app_context():
+        if not dry_run:
+            # Queued submissions were graded against the old key; persist them so they are re-graded too
+            drain_submission_stream()
+        
+        report, changes = RegradeService(db, answer_keys).regrade(quiz_id, dry_run=dry_run)
+        
+        if not dry_run and changes:
+            # Scores changed in place: patch what was derived from them for the attempts concerned
+            analytics_rollups.apply_score_changes(changes)
+            achievement_service.evaluate([  # Unlocks are kept; higher scores can earn new ones
+                QuizAttempt(user_id=change['user_id'], completed_at=change['completed_at'],
+                            total_questions=change['total_questions'])
+                for change in changes if change['new_score'] > change['old_score']
+            ])
+        db.session.commit()
+        
+        if not dry_run and changes:
+            attempt_details.evict([change['id'] for change in changes])
+            attempt_analytics.invalidate()
+            invalidate_quiz_caches(quiz_id)
+            invalidate_user_caches([change['user_id'] for change in changes])
+            try:
+                leaderboard_service.refresh_users({change['user_id'] for change in changes}, quiz_id,
+                                                  {change['completed_at'].date() for change in changes})
+                community_stats.record_score_changes(sum(
+                    (change['new_score'] - change['old_score']) * 100.0 / change['total_questions']
+                    for change in changes if change['total_questions']
+                ))
+            except Exception as e:
+                # Corrected by the next rebuild / reconcile
+                print(f"Leaderboard update error: {e}")
+            invalidate_rankings()
+        
+        return report
+
+@celery.task
+def flush_submission_stream(batch_size=500, max_batches=20):
+    """Persist write-behind quiz submissions from the Redis stream in batches"""
+    from app import app
+    
+    with app.app_context():
+        written = drain_submission_stream(batch_size, max_batches)
+        return f"Persisted {written} quiz submissions"
+
+def drain_submission_stream(batch_size=500, max_batches=20):
+    """Persist queued submissions and feed them to the derived structures (needs an app context)"""
+    from app import db, QuizAttempt, submission_pipeline, analytics_rollups, achievement_service, on_attempts_completed
+    
+    def completed(results):
+        return [
+            QuizAttempt(
+                id=int(result['attempt_id']),
+                user_id=result['user_id'],
+                quiz_id=result['quiz_id'],
+                score=result['score'],
+                total_questions=result['total_questions'],
+                time_taken=result['time_taken'],
+                completed_at=datetime.fromisoformat(result['completed_at'])
+            )
+            for result in results
+        ]
+    
+    def record(results):
+        attempts = completed(results)
+        analytics_rollups.apply(attempts)
+        achievement_service.evaluate(attempts)
+    
+    return submission_pipeline.flush(
+        db, batch_size=batch_size, max_batches=max_batches,
+        before_commit=record,
+        on_written=lambda results: on_attempts_completed(completed(results))
+    )
+
+@celery.task
+def finalize_abandoned_attempts():
+    """Grade attempts that were never submitted once their deadline has passed"""
+    from app import (app, db, QuizAttempt, Quiz, submission_pipeline, attempt_store, finalize_attempt,
+                     get_attempt_deadline, get_submit_cutoff, on_attempts_completed)
+    
+    with app.app_context():
+        now = datetime.utcnow()
+        
+        # Every deadline is at most the shortest quiz duration after the attempt (or its
+        # scheduled quiz) started, so attempts newer than that cannot have expired yet
+        shortest = db.session.query(db.func.min(Quiz.duration_minutes)).scalar()
+        if shortest is None:
+            return "Finalized 0 abandoned attempts"
+        cutoff = now - timedelta(minutes=shortest, seconds=app.config['SUBMIT_GRACE_SECONDS'])
+        
+        open_attempts = db.session.query(QuizAttempt, Quiz).join(
+            Quiz, QuizAttempt.quiz_id == Quiz.id
+        ).filter(
+            QuizAttempt.completed_at.is_(None),
+            db.or_(QuizAttempt.started_at < cutoff, Quiz.start_time < cutoff)
+        ).all()
+        # Submits are accepted for a grace period after the deadline, so wait for it to pass
+        expired = [(attempt, quiz) for attempt, quiz in open_attempts
+                   if get_submit_cutoff(quiz, attempt.started_at) < now]
+        
+        # Attempts already submitted through the write-behind queue are left to the flush
+        pending = submission_pipeline.get_pending_ids(attempt.id for attempt, _ in expired)
+        if pending is None:
+            return "Submission queue unavailable, skipped finalizing abandoned attempts"
+        
+        finalized = []
+        for attempt, quiz in expired:
+            if attempt.id in pending:
+                continue
+            deadline = get_attempt_deadline(quiz, attempt.started_at)
+            if finalize_attempt(attempt, deadline):
+                finalized.append(attempt)
+        
+        db.session.commit()
+        attempt_store.close(*[attempt.id for attempt in finalized])
+        on_attempts_completed(finalized)
+        
+        return f"Finalized {len(finalized)} abandoned attempts"
+
+@celery.task
+def prewarm_upcoming_quizzes(window_minutes=None):
+    """Build answer keys, question payloads and the listing refresh for quizzes about to start"""
+    from app import app, Quiz, answer_keys, question_payloads, redis_client
+    
+    with app.app_context():
+        start = time.perf_counter()
+        window_minutes = window_minutes or app.config['PREWARM_WINDOW_MINUTES']
+        now = datetime.utcnow()
+        
+        upcoming = Quiz.query.filter(
+            Quiz.is_active == True,
+            Quiz.start_time > now,
+            Quiz.start_time <= now + timedelta(minutes=window_minutes)
+        ).order_by(Quiz.start_time).all()
+        
+        warmed = []
+        refreshes_scheduled = 0
+        for quiz in upcoming:
+            quiz_start = time.perf_counter()
+            answer_keys.get(quiz.id)
+            questions_count, _ = question_payloads.get(quiz.id)
+            
+            # The listing cache expires at start_time, so rebuild it right after the quiz opens
+            # (once per start time, however many quizzes share it)
+            refresh_at = quiz.start_time + timedelta(seconds=1)
+            try:
+                claimed = redis_client.set(
+                    f"prewarm:listing:{refresh_at.isoformat()}", 1, nx=True,
+                    ex=int((refresh_at - now).total_seconds()) + 60
+                )
+            except Exception as e:
+                print(f"Cache write error: {e}")
+                claimed = False
+            if claimed:
+                refresh_available_quizzes.apply_async(eta=refresh_at)
+                refreshes_scheduled += 1
+            
+            warmed.append({
+                'quiz_id': quiz.id,
+                'title': quiz.title,
+                'start_time': quiz.start_time.isoformat(),
+                'questions': questions_count,
+                'time_ms': round((time.perf_counter() - quiz_start) * 1000, 2)
+            })
+        
+        return {
+            'window_minutes': window_minutes,
+            'quizzes_warmed': len(warmed),
+            'listing_refreshes_scheduled': refreshes_scheduled,
+            'warmed': warmed,
+            'execution_time_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+
+@celery.task
+def refresh_available_quizzes():
+    """Rebuild the cached available-quiz listing"""
+    from app import app, build_available_quizzes
+    
+    with app.app_context():
+        return f"Cached {len(build_available_quizzes())} available quizzes"
+
+@celery.task
+def rebuild_user_stats():
+    """Recompute every user's statistics record from their attempts"""
+    from app import app, db, analytics_rollups, UserStats
+    
+    with app.app_context():
+        analytics_rollups.rebuild_user_stats()
+        db.session.commit()
+        return f"Rebuilt statistics of {UserStats.query.count()} users"
+
+@celery.task
+def backfill_achievements():
+    """Unlock achievements earned by existing attempts, dated by the attempt that earned them"""
+    from app import app, db, achievement_service
+    
+    with app.app_context():
+        unlocked = achievement_service.backfill()
+        db.session.commit()
+        return f"Backfilled {unlocked} achievement unlocks"
+
+@celery.task
+def rebuild_leaderboards():
+    """Build the Redis leaderboards from the database, scheduled by the first leaderboard request"""
+    from app import app, leaderboard_service, invalidate_rankings
+    
+    with app.app_context():
+        ranked = leaderboard_service.rebuild()
+        invalidate_rankings()
+        return f"Rebuilt leaderboards for {ranked} users"
+
+@celery.task
+def reconcile_community_stats():
+    """Rebuild the live community stats from the database, correcting any drift"""
+    from app import app, community_stats
+    
+    with app.app_context():
+        community_stats.rebuild()
+        return "Community stats reconciled"
+
 # Celery Beat Schedule
 celery.conf.beat_schedule = {
     'daily-reminder': {
@@ -518,6 +729,22 @@ celery.conf.beat_schedule = {
         'task': 'tasks.generate_monthly_report',
         'schedule': crontab(0, 0, day_of_month=1),  # 1st day of month at midnight
     },
+    'flush-submissions': {
+        'task': 'tasks.flush_submission_stream',
+        'schedule': 5.0,  # Every 5 seconds, drains write-behind quiz submits
+    },
+    'finalize-abandoned-attempts': {
+        'task': 'tasks.finalize_abandoned_attempts',
+        'schedule': 60.0,  # Every minute
+    },
+    'prewarm-upcoming-quizzes': {
+        'task': 'tasks.prewarm_upcoming_quizzes',
+        'schedule': 60.0,  # Every minute, looks PREWARM_WINDOW_MINUTES ahead
+    },
+    'reconcile-community-stats': {
+        'task': 'tasks.reconcile_community_stats',
+        'schedule': crontab(minute='*/15'),  # Every 15 minutes
+    },
 }
 
 celery.conf.timezone = 'UTC'
\ No newline at end of file
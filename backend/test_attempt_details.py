@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Attempt Details Test Script for Quizmaster API
+
+Checks that a completed attempt cannot be submitted again, so its cached
+details and strong ETag stay valid:
+1. The first submit completes the attempt
+2. A second submit with different answers is rejected with 409
+3. /api/user/quiz-attempt/<id> serves the same body and ETag, and 304 on revalidation
+
+Runs in-process against a throwaway SQLite database:
+    python test_attempt_details.py
+"""
+
+import os
+import tempfile
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'test_attempt_details.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from app import app, db, limiter, User, Subject, Chapter, Quiz, Question  # noqa: E402
+
+
+def create_quiz_and_user():
+    """Create a one-question quiz and a user to take it, returning (auth headers, quiz id)"""
+    user = User(username='details_user', email='details_user@example.com', password_hash='-')
+    subject = Subject(name='Details subject')
+    db.session.add_all([user, subject])
+    db.session.flush()
+    chapter = Chapter(name='Details chapter', subject_id=subject.id)
+    db.session.add(chapter)
+    db.session.flush()
+    quiz = Quiz(title='Details quiz', chapter_id=chapter.id, duration_minutes=30)
+    db.session.add(quiz)
+    db.session.flush()
+    db.session.add(Question(text='Q', option_a='A', option_b='B', option_c='C', option_d='D',
+                            correct_option='a', quiz_id=quiz.id))
+    db.session.commit()
+    token = create_access_token(identity=str(user.id), additional_claims={'role': 'user'})
+    return {'Authorization': f'Bearer {token}'}, quiz.id
+
+
+def test_completed_attempt_is_immutable():
+    """Resubmitting must neither change the attempt nor its cached details"""
+    limiter.enabled = False
+    app.config['SUBMIT_WRITE_BEHIND'] = False
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        headers, quiz_id = create_quiz_and_user()
+
+    response = client.post(f'/api/user/quiz/{quiz_id}/start', headers=headers)
+    assert response.status_code == 200, f"start returned {response.status_code}"
+    attempt_id = response.get_json()['attempt_id']
+    question_id = str(response.get_json()['questions'][0]['id'])
+
+    response = client.post('/api/user/quiz/submit', headers=headers,
+                           json={'attempt_id': attempt_id, 'answers': {question_id: 'a'}})
+    assert response.status_code == 200, f"submit returned {response.status_code}"
+
+    details_url = f'/api/user/quiz-attempt/{attempt_id}'
+    before = client.get(details_url, headers=headers)
+    assert before.status_code == 200, f"details returned {before.status_code}"
+
+    response = client.post('/api/user/quiz/submit', headers=headers,
+                           json={'attempt_id': attempt_id, 'answers': {question_id: 'b'}})
+    assert response.status_code == 409, f"resubmit returned {response.status_code}"
+
+    after = client.get(details_url, headers=headers)
+    assert after.get_data() == before.get_data(), "details changed after a resubmit"
+    assert after.headers['ETag'] == before.headers['ETag'], "ETag changed after a resubmit"
+
+    revalidated = client.get(details_url, headers={**headers, 'If-None-Match': before.headers['ETag']})
+    assert revalidated.status_code == 304, f"revalidation returned {revalidated.status_code}"
+
+
+def main():
+    print("Attempt Details Test")
+    print("=" * 50)
+    try:
+        test_completed_attempt_is_immutable()
+    except AssertionError as e:
+        print(f"⚠ {e}")
+        raise SystemExit(1)
+    print("✓ Completed attempts and their ETags do not change on resubmit")
+
+
+if __name__ == '__main__':
+    main()
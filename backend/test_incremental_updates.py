@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Incremental Updates Test Script for Quizmaster API
+
+Checks that the structures patched as attempts complete agree with a full
+recompute from quiz_attempt:
+1. Redis leaderboard ranks and percentiles, against the SQL ranking
+2. Rollups and streaks, against a backfill
+3. Re-grade score deltas, in the attempts, the rollups and the rankings
+
+Runs in-process against a throwaway SQLite database and the Redis database at
+TEST_REDIS_URL (default redis://localhost:6379/15), which is flushed first:
+    python test_incremental_updates.py
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'test_incremental_updates.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+REDIS_URL = os.environ.get('TEST_REDIS_URL') or 'redis://localhost:6379/15'
+os.environ['REDIS_URL'] = REDIS_URL
+
+from app import (app, db, limiter, redis_client, leaderboard_service, analytics_rollups,  # noqa: E402
+                 complete_attempt, on_attempts_completed, get_user_rank_from_db,
+                 invalidate_quiz_content_caches, User, Subject, Chapter, Quiz, Question, QuizAttempt,
+                 UserStats, UserSubjectRollup)
+from tasks import regrade_quiz_attempts  # noqa: E402
+
+
+def create_quiz(name, correct_options):
+    """Create a quiz with one question per correct option, returning (quiz id, question ids)"""
+    subject = Subject(name=f"{name} subject")
+    db.session.add(subject)
+    db.session.flush()
+    chapter = Chapter(name=f"{name} chapter", subject_id=subject.id)
+    db.session.add(chapter)
+    db.session.flush()
+    quiz = Quiz(title=f"{name} quiz", chapter_id=chapter.id, duration_minutes=30)
+    db.session.add(quiz)
+    db.session.flush()
+    questions = [Question(text=f"Q{i}", option_a='A', option_b='B', option_c='C', option_d='D',
+                          correct_option=option, quiz_id=quiz.id) for i, option in enumerate(correct_options)]
+    db.session.add_all(questions)
+    db.session.commit()
+    return quiz.id, [question.id for question in questions]
+
+
+def create_users(prefix, count):
+    users = [User(username=f"{prefix}_{i}", email=f"{prefix}_{i}@example.com", password_hash='-')
+             for i in range(count)]
+    db.session.add_all(users)
+    db.session.commit()
+    return [user.id for user in users]
+
+
+def take_quiz(user_id, quiz_id, answers, score, completed_at):
+    """Complete an attempt the way submits do, feeding the rollups and the rankings"""
+    attempt = QuizAttempt(user_id=user_id, quiz_id=quiz_id, score=0, total_questions=len(answers),
+                          started_at=completed_at - timedelta(minutes=5))
+    db.session.add(attempt)
+    db.session.commit()
+    assert complete_attempt(attempt, completed_at, {str(k): v for k, v in answers.items()}, score)
+    db.session.commit()
+    on_attempts_completed([attempt])
+    return attempt
+
+
+def user_stats_snapshot():
+    """Every per-user statistics column, to compare incremental updates with a backfill"""
+    columns = [column.name for column in UserStats.__table__.columns]
+    stats = {row.user_id: tuple(getattr(row, column) for column in columns) for row in UserStats.query.all()}
+    subjects = {(row.user_id, row.subject_id): row.attempts for row in UserSubjectRollup.query.all()}
+    db.session.expire_all()
+    return stats, subjects
+
+
+def test_leaderboard_ranks_and_percentiles():
+    """Redis ranks equal the SQL ranks (ties included), and re-recording an attempt is a no-op"""
+    quiz_id, question_ids = create_quiz('Ranking', 'aaaa')
+    users = create_users('ranking', 4)
+    now = datetime.utcnow()
+    for user_id, score in zip(users, [4, 3, 3, 1]):
+        attempt = QuizAttempt(user_id=user_id, quiz_id=quiz_id, score=score, total_questions=4,
+                              started_at=now - timedelta(minutes=10), completed_at=now - timedelta(minutes=5))
+        db.session.add(attempt)
+    db.session.commit()
+    # Existing history is loaded the way a deploy does, then kept current incrementally
+    analytics_rollups.backfill()
+    db.session.commit()
+    leaderboard_service.rebuild()
+
+    top = leaderboard_service.top(10)
+    ranks = {entry['user_id']: entry['rank'] for entry in top}
+    assert ranks == dict(zip(users, [1, 2, 2, 4])), f"unexpected ranks {ranks}"
+
+    percentiles = [leaderboard_service.get_user_percentile(user_id)['top_percent'] for user_id in users]
+    assert percentiles == [25.0, 75.0, 75.0, 100.0], f"unexpected percentiles {percentiles}"
+
+    # The last user catches up, recorded incrementally (twice, as a retried flush would)
+    attempt = take_quiz(users[3], quiz_id, dict.fromkeys(question_ids, 'a'), 4, now)
+    on_attempts_completed([attempt])
+
+    for user_id in users:
+        redis_rank = leaderboard_service.get_user_rank(user_id)
+        sql_rank = get_user_rank_from_db(datetime.min, user_id)
+        assert redis_rank == sql_rank, f"user {user_id}: Redis {redis_rank} != SQL {sql_rank}"
+    assert leaderboard_service.get_user_rank(users[3])['total_attempts'] == 2, "attempt recorded twice"
+
+
+def test_rollups_and_streaks():
+    """Attempts on consecutive days extend the streak, and the records match a backfill"""
+    quiz_id, question_ids = create_quiz('Streak', 'ab')
+    user_id, = create_users('streak', 1)
+    now = datetime.utcnow()
+    answers = {question_ids[0]: 'a', question_ids[1]: 'a'}
+
+    # Three days in a row after a gap, the middle day twice and out of order
+    for days_ago in (6, 2, 0, 1, 1):
+        take_quiz(user_id, quiz_id, answers, 1, now - timedelta(days=days_ago))
+
+    stats = db.session.get(UserStats, user_id)
+    assert stats.attempts == 5, f"{stats.attempts} attempts recorded"
+    assert (stats.streak_days, stats.best_streak_days) == (3, 3), \
+        f"streak {stats.streak_days}, best {stats.best_streak_days}"
+    assert stats.current_streak() == 3, f"current streak {stats.current_streak()}"
+
+    incremental = user_stats_snapshot()
+    analytics_rollups.backfill()
+    db.session.commit()
+    backfilled = user_stats_snapshot()
+    assert backfilled == incremental, f"incremental statistics {incremental} differ from a backfill {backfilled}"
+
+
+def test_regrade_applies_deltas():
+    """A re-grade moves scores, rollups and rankings exactly as far as a full recompute"""
+    quiz_id, question_ids = create_quiz('Regrade', 'aa')
+    users = create_users('regrade', 2)
+    now = datetime.utcnow()
+    attempts = [
+        take_quiz(users[0], quiz_id, {question_ids[0]: 'a', question_ids[1]: 'b'}, 1, now),
+        take_quiz(users[1], quiz_id, {question_ids[0]: 'b', question_ids[1]: 'b'}, 0, now)
+    ]
+
+    # The second question's key was wrong
+    db.session.get(Question, question_ids[1]).correct_option = 'b'
+    db.session.commit()
+    invalidate_quiz_content_caches(quiz_id)
+
+    report = regrade_quiz_attempts(quiz_id)
+    assert report['changed'] == 2, f"{report['changed']} attempts changed"
+    db.session.expire_all()
+    scores = [db.session.get(QuizAttempt, attempt.id).score for attempt in attempts]
+    assert scores == [2, 1], f"re-graded scores {scores}"
+
+    ranks = [leaderboard_service.get_user_rank(user_id, scope=f"quiz:{quiz_id}") for user_id in users]
+
+    incremental = user_stats_snapshot()
+    analytics_rollups.backfill()
+    db.session.commit()
+    assert user_stats_snapshot() == incremental, "re-graded statistics differ from a backfill"
+
+    leaderboard_service.rebuild()
+    rebuilt = [leaderboard_service.get_user_rank(user_id, scope=f"quiz:{quiz_id}") for user_id in users]
+    assert ranks == rebuilt, f"re-graded ranks {ranks} differ from a rebuild {rebuilt}"
+    assert ranks[0]['avg_percentage'] == 100.0, f"re-graded ranking {ranks[0]}"
+
+
+CHECKS = [
+    (test_leaderboard_ranks_and_percentiles, "Leaderboard ranks and percentiles match the SQL ranking"),
+    (test_rollups_and_streaks, "Rollups and streaks match a backfill"),
+    (test_regrade_applies_deltas, "Re-grade deltas match a full recompute"),
+]
+
+
+def main():
+    print("Incremental Updates Test")
+    print("=" * 50)
+    try:
+        redis_client.ping()
+    except Exception as e:
+        print(f"⚠ Redis is not reachable at {REDIS_URL}, skipped: {e}")
+        return
+    redis_client.flushdb()
+
+    limiter.enabled = False
+    app.config['SUBMIT_WRITE_BEHIND'] = False
+    failed = False
+    with app.app_context():
+        db.create_all()
+        for check, description in CHECKS:
+            try:
+                check()
+            except AssertionError as e:
+                print(f"⚠ {e}")
+                failed = True
+            else:
+                print(f"✓ {description}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Query Count Test Script for Quizmaster API
+
+Checks that the per-user history endpoints issue a constant number of SQL
+queries however many attempts the user has:
+1. /api/user/performance
+2. /api/user/scores
+3. /api/user/quiz-attempt/<id>
+
+Runs in-process against a throwaway SQLite database:
+    python test_query_counts.py
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'test_query_counts.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+
+from sqlalchemy import event  # noqa: E402
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from app import app, db, limiter, User, Subject, Chapter, Quiz, Question, QuizAttempt  # noqa: E402
+
+HISTORY_SIZES = [5, 50]
+ENDPOINTS = ['/user/performance', '/user/scores', '/user/quiz-attempt/{attempt_id}']
+
+
+def create_user_with_attempts(n_attempts):
+    """Create a user with n_attempts completed attempts spread over several subjects"""
+    username = f"history_{n_attempts}"
+    user = User(username=username, email=f"{username}@example.com", password_hash='-')
+    db.session.add(user)
+    db.session.flush()
+
+    quiz_ids = []
+    for s in range(3):
+        subject = Subject(name=f"{username} subject {s}")
+        db.session.add(subject)
+        db.session.flush()
+        chapter = Chapter(name=f"Chapter {s}", subject_id=subject.id)
+        db.session.add(chapter)
+        db.session.flush()
+        quiz = Quiz(title=f"{username} quiz {s}", chapter_id=chapter.id)
+        db.session.add(quiz)
+        db.session.flush()
+        db.session.add(Question(text='Q', option_a='A', option_b='B', option_c='C', option_d='D',
+                                correct_option='a', quiz_id=quiz.id))
+        quiz_ids.append(quiz.id)
+
+    now = datetime.utcnow()
+    attempt = None
+    for i in range(n_attempts):
+        attempt = QuizAttempt(user_id=user.id, quiz_id=quiz_ids[i % len(quiz_ids)], score=i % 2,
+                              total_questions=1, started_at=now - timedelta(minutes=i + 1),
+                              completed_at=now - timedelta(minutes=i), answers={})
+        db.session.add(attempt)
+    db.session.commit()
+    return create_access_token(identity=str(user.id), additional_claims={'role': 'user'}), attempt.id
+
+
+def count_queries(client, engine, path, token):
+    """Issue a GET and return (status code, number of SQL statements it executed)"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(f"/api{path}", headers={'Authorization': f'Bearer {token}'})
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return response.status_code, len(statements)
+
+
+def test_history_endpoints_use_constant_queries():
+    """Query counts must not grow with the number of attempts"""
+    limiter.enabled = False
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        users = [create_user_with_attempts(n) for n in HISTORY_SIZES]
+        engine = db.engine
+
+    for endpoint in ENDPOINTS:
+        counts = []
+        for token, attempt_id in users:
+            status, queries = count_queries(client, engine, endpoint.format(attempt_id=attempt_id), token)
+            assert status == 200, f"{endpoint} returned {status}"
+            counts.append(queries)
+        print(f"{endpoint}: {' / '.join(map(str, counts))} queries for {' / '.join(map(str, HISTORY_SIZES))} attempts")
+        assert len(set(counts)) == 1, f"{endpoint} issues more queries as the history grows: {counts}"
+
+
+def main():
+    print("Query Count Test")
+    print("=" * 50)
+    try:
+        test_history_endpoints_use_constant_queries()
+    except AssertionError as e:
+        print(f"⚠ {e}")
+        raise SystemExit(1)
+    print("✓ Query counts are independent of history size")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Submissions Test Script for Quizmaster API
+
+Checks the paths that start, queue and finalize quiz attempts:
+1. Write-behind submits are acknowledged once and persisted once by the flush
+2. Admission control queues starts beyond the concurrency limit and admits them later
+3. The sweeper grades expired attempts from their autosaved answers, after the grace period
+
+Runs in-process against a throwaway SQLite database and the Redis database at
+TEST_REDIS_URL (default redis://localhost:6379/15), which is flushed first:
+    python test_submissions.py
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'test_submissions.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+REDIS_URL = os.environ.get('TEST_REDIS_URL') or 'redis://localhost:6379/15'
+os.environ['REDIS_URL'] = REDIS_URL
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from app import (app, db, limiter, redis_client, admission_gate, attempt_store, submission_pipeline,  # noqa: E402
+                 invalidate_quiz_caches, User, Subject, Chapter, Quiz, Question, QuizAttempt, UserStats)
+from tasks import flush_submission_stream, finalize_abandoned_attempts  # noqa: E402
+
+
+def create_quiz(name, start_time=None):
+    """Create a 30 minute two-question quiz (answers 'a'), returning (quiz id, question ids)"""
+    subject = Subject(name=f"{name} subject")
+    db.session.add(subject)
+    db.session.flush()
+    chapter = Chapter(name=f"{name} chapter", subject_id=subject.id)
+    db.session.add(chapter)
+    db.session.flush()
+    quiz = Quiz(title=f"{name} quiz", chapter_id=chapter.id, duration_minutes=30, start_time=start_time)
+    db.session.add(quiz)
+    db.session.flush()
+    questions = [Question(text=f"Q{i}", option_a='A', option_b='B', option_c='C', option_d='D',
+                          correct_option='a', quiz_id=quiz.id) for i in range(2)]
+    db.session.add_all(questions)
+    db.session.commit()
+    invalidate_quiz_caches(quiz.id)
+    return quiz.id, [question.id for question in questions]
+
+
+def create_user(username):
+    """Create a user, returning (user id, auth headers)"""
+    user = User(username=username, email=f"{username}@example.com", password_hash='-')
+    db.session.add(user)
+    db.session.commit()
+    token = create_access_token(identity=str(user.id), additional_claims={'role': 'user'})
+    return user.id, {'Authorization': f'Bearer {token}'}
+
+
+def test_write_behind_flush_and_dedup():
+    """A repeated submit gets the first result back, and the flush writes the attempt once"""
+    app.config['SUBMIT_WRITE_BEHIND'] = True
+    client = app.test_client()
+    quiz_id, question_ids = create_quiz('Write-behind')
+    user_id, headers = create_user('write_behind_user')
+
+    response = client.post(f'/api/user/quiz/{quiz_id}/start', headers=headers)
+    assert response.status_code == 200, f"start returned {response.status_code}"
+    attempt_id = response.get_json()['attempt_id']
+
+    first = client.post('/api/user/quiz/submit', headers=headers, json={
+        'attempt_id': attempt_id, 'answers': {str(question_id): 'a' for question_id in question_ids}})
+    assert first.status_code == 202, f"submit returned {first.status_code}"
+    retried = client.post('/api/user/quiz/submit', headers=headers, json={
+        'attempt_id': attempt_id, 'answers': {str(question_id): 'b' for question_id in question_ids}})
+    assert retried.status_code == 202, f"retried submit returned {retried.status_code}"
+    assert retried.get_json()['score'] == first.get_json()['score'] == 2, "retried submit was graded again"
+
+    assert flush_submission_stream() == "Persisted 1 quiz submissions"
+    assert flush_submission_stream() == "Persisted 0 quiz submissions"
+
+    db.session.expire_all()
+    attempt = db.session.get(QuizAttempt, attempt_id)
+    assert attempt.completed_at is not None and attempt.score == 2, f"persisted score {attempt.score}"
+    assert db.session.get(UserStats, user_id).attempts == 1, "attempt counted more than once"
+
+    response = client.post('/api/user/quiz/submit', headers=headers, json={'attempt_id': attempt_id, 'answers': {}})
+    assert response.status_code == 409, f"submit after the flush returned {response.status_code}"
+
+
+def test_admission_control_queues_starts():
+    """With every slot taken a start waits with a position, and is admitted once a slot frees up"""
+    app.config['SUBMIT_WRITE_BEHIND'] = False
+    app.config['ADMISSION_CONTROL_ENABLED'] = True
+    max_concurrent = admission_gate.max_concurrent
+    admission_gate.max_concurrent = 1
+    client = app.test_client()
+    try:
+        quiz_id, _ = create_quiz('Admission', start_time=datetime.utcnow() - timedelta(minutes=1))
+        other_id, _ = create_user('admission_other')
+        _, headers = create_user('admission_user')
+
+        # Someone else's start is in flight
+        assert admission_gate.try_acquire(quiz_id, other_id)['admitted'], "first start not admitted"
+
+        response = client.post(f'/api/user/quiz/{quiz_id}/start', headers=headers)
+        assert response.status_code == 429, f"start over the limit returned {response.status_code}"
+        body = response.get_json()
+        assert body['status'] == 'waiting' and body['position'] == 1, f"waiting room response {body}"
+        assert response.headers.get('Retry-After'), "no Retry-After header"
+
+        admission_gate.release(quiz_id)
+        response = client.post(f'/api/user/quiz/{quiz_id}/start', headers=headers)
+        assert response.status_code == 200, f"start after a slot freed up returned {response.status_code}"
+    finally:
+        admission_gate.max_concurrent = max_concurrent
+        app.config['ADMISSION_CONTROL_ENABLED'] = False
+
+
+def test_sweeper_finalizes_expired_attempts():
+    """Only attempts past their deadline and grace period, and not queued for write-behind, are graded"""
+    quiz_id, question_ids = create_quiz('Sweeper')
+    now = datetime.utcnow()
+    grace = timedelta(seconds=app.config['SUBMIT_GRACE_SECONDS'])
+
+    attempts, users = {}, {}
+    for name, started_at in [('expired', now - timedelta(minutes=31) - grace),
+                             ('in_grace', now - timedelta(minutes=30) - grace / 2),
+                             ('queued', now - timedelta(minutes=31) - grace)]:
+        user_id, _ = create_user(f"sweeper_{name}")
+        attempt = QuizAttempt(user_id=user_id, quiz_id=quiz_id, score=0, total_questions=2, started_at=started_at)
+        db.session.add(attempt)
+        db.session.commit()
+        deadline = started_at + timedelta(minutes=30)
+        attempt_store.open(attempt.id, user_id, quiz_id, deadline)
+        attempt_store.save_answers(attempt.id, {question_ids[0]: 'a', question_ids[1]: 'c'}, deadline)
+        attempts[name], users[name] = attempt.id, user_id
+
+    submission_pipeline.enqueue({
+        'attempt_id': attempts['queued'], 'user_id': users['queued'], 'quiz_id': quiz_id, 'score': 2, 'total_questions': 2,
+        'time_taken': 60, 'started_at': now.isoformat(), 'completed_at': now.isoformat(), 'answers': {}
+    })
+
+    assert finalize_abandoned_attempts() == "Finalized 1 abandoned attempts"
+    assert finalize_abandoned_attempts() == "Finalized 0 abandoned attempts"
+
+    db.session.expire_all()
+    expired = db.session.get(QuizAttempt, attempts['expired'])
+    assert expired.score == 1, f"expired attempt graded {expired.score}"
+    assert expired.completed_at == expired.started_at + timedelta(minutes=30), "not completed at its deadline"
+    assert db.session.get(QuizAttempt, attempts['in_grace']).completed_at is None, "finalized within the grace period"
+    assert db.session.get(QuizAttempt, attempts['queued']).completed_at is None, "finalized a queued submission"
+
+
+CHECKS = [
+    (test_write_behind_flush_and_dedup, "Write-behind submits are deduplicated and flushed once"),
+    (test_admission_control_queues_starts, "Admission control queues and then admits starts"),
+    (test_sweeper_finalizes_expired_attempts, "The sweeper grades only expired, unqueued attempts"),
+]
+
+
+def main():
+    print("Submissions Test")
+    print("=" * 50)
+    try:
+        redis_client.ping()
+    except Exception as e:
+        print(f"⚠ Redis is not reachable at {REDIS_URL}, skipped: {e}")
+        return
+    redis_client.flushdb()
+
+    limiter.enabled = False
+    failed = False
+    with app.app_context():
+        db.create_all()
+        for check, description in CHECKS:
+            try:
+                check()
+            except AssertionError as e:
+                print(f"⚠ {e}")
+                failed = True
+            else:
+                print(f"✓ {description}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
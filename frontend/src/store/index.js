@@ -468,6 +468,20 @@ const store = createStore({
       }
     },
     
+    async autosaveAnswer(_, { attemptId, questionId, selectedOption }) {
+      try {
+        await api.post(`/user/quiz-attempt/${attemptId}/answers`, {
+          question_id: questionId,
+          selected_option: selectedOption
+        })
+        return { success: true }
+      } catch (error) {
+        // The answer is still sent with the submit; autosave only covers a submit that never arrives
+        console.error('Error autosaving answer:', error)
+        return { success: false, message: error.response?.data?.error || 'Autosave failed' }
+      }
+    },
+    
     async submitQuiz({ commit }, { attemptId, answers }) {
       try {
         const response = await api.post('/user/quiz/submit', { attempt_id: attemptId, answers })
@@ -721,14 +735,17 @@ const store = createStore({
        }
      },
      
-     async fetchUserScores({ commit }, { page = 1, perPage = 20, subject = null, sort = 'date_desc' } = {}) {
+     async fetchUserScores({ commit }, { cursor = null, perPage = 20, subject = null, sort = 'date_desc' } = {}) {
        try {
          const params = new URLSearchParams({
-           page: page.toString(),
            per_page: perPage.toString(),
            sort
          })
          
+         if (cursor) {
+           params.append('cursor', cursor)
+         }
+         
          if (subject) {
            params.append('subject', subject)
          }